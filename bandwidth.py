@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Общий лимит скорости для всех одновременных загрузок процесса
+
+Лимит делится между выполняемыми задачами поровну, задача с собственным
+ограничением (cap) ниже равной доли отдает остаток остальным. Доли
+пересчитываются при старте и завершении задач и при смене профиля по
+времени суток. Каждая задача держится в своей доле через token bucket:
+yt_dlp внутри процесса ждет в progress hook, процесс yt-dlp
+приостанавливается (SIGSTOP/SIGCONT группы) на время долга.
+
+    YTDL_BANDWIDTH_LIMIT=4M
+    YTDL_BANDWIDTH_PROFILE="09:00-18:00=1M,23:00-07:00=0"   (0 - без лимита)
+"""
+
+import datetime
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# Сколько секунд доли задача может выбрать разом после простоя
+BURST_SECONDS = 1.0
+# Как часто проверяется профиль по времени суток (сек)
+REFRESH_INTERVAL = 1.0
+# Окно измерения скорости задачи: несколько циклов "блок данных - пауза" (сек)
+RATE_WINDOW = 3.0
+
+_RATE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+_PROFILE_RE = re.compile(r'^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*=\s*(\S+)\s*$')
+
+
+def parse_rate(text: str) -> Optional[int]:
+    """Скорость вида 500K, 2M, 1.5M, 100000 в байтах/с; 0 - без лимита (None)"""
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMG]?)(?:i?B)?(?:/s)?\s*', text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Неверная скорость: {text}")
+    rate = int(float(match.group(1)) * _RATE_UNITS[match.group(2).upper()])
+    return rate or None
+
+
+def format_rate(rate: Optional[float]) -> str:
+    """Скорость для сообщений: 1.5 MB/s"""
+    if not rate:
+        return "без лимита"
+    if rate >= 1024 * 1024:
+        return f"{rate / 1024 / 1024:.1f} MB/s"
+    return f"{rate / 1024:.0f} KB/s"
+
+
+def parse_profiles(text: str) -> List[Tuple[int, int, Optional[int]]]:
+    """Профили "ЧЧ:ММ-ЧЧ:ММ=скорость" через запятую -> [(начало, конец в минутах, скорость)]
+
+    Интервал может переходить через полночь (23:00-07:00).
+    """
+    profiles = []
+    for part in filter(None, (p.strip() for p in text.split(','))):
+        match = _PROFILE_RE.match(part)
+        if not match:
+            raise ValueError(f"Неверный профиль скорости: {part} (ожидается ЧЧ:ММ-ЧЧ:ММ=скорость)")
+        start_h, start_m, end_h, end_m, rate = match.groups()
+        start, end = int(start_h) * 60 + int(start_m), int(end_h) * 60 + int(end_m)
+        if max(start, end) > 24 * 60:
+            raise ValueError(f"Неверное время в профиле: {part}")
+        profiles.append((start, end, parse_rate(rate)))
+    return profiles
+
+
+class JobBandwidth:
+    """Доля полосы одной задачи: token bucket со скоростью share"""
+
+    def __init__(self, governor: 'BandwidthGovernor', key: str, cap: Optional[int]):
+        self.governor = governor
+        self.key = key
+        self.cap = cap
+        self.share: Optional[float] = cap  # байт/с, None - без лимита
+        self.rate = 0.0  # измеренная скорость за последний интервал
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._window_bytes = 0
+        self._window_start = self._updated
+
+    def consume(self, nbytes: int) -> float:
+        """Учет скачанных байтов, возвращает паузу (сек), нужную чтобы остаться в доле"""
+        with self.governor._lock:
+            self.governor._refresh_limit_locked()
+            now = time.monotonic()
+            # Блок учитывается в следующем окне: пауза за него еще впереди
+            if now - self._window_start >= RATE_WINDOW:
+                self.rate = self._window_bytes / (now - self._window_start)
+                self._window_bytes = 0
+                self._window_start = now
+            self._window_bytes += nbytes
+
+            share = self.share
+            elapsed, self._updated = now - self._updated, now
+            if not share:
+                self._tokens = 0.0
+                return 0.0
+            self._tokens = min(share * BURST_SECONDS, self._tokens + elapsed * share) - nbytes
+            return -self._tokens / share if self._tokens < 0 else 0.0
+
+
+class BandwidthGovernor:
+    """Лимит скорости процесса, поделенный между задачами (limit=None - без лимита)"""
+
+    def __init__(self, limit: Optional[int] = None, profiles: Optional[List] = None,
+                 now: Callable[[], datetime.datetime] = datetime.datetime.now):
+        self.base_limit = limit
+        self.profiles = profiles or []
+        self._now = now
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, JobBandwidth] = {}
+        self._limit = self._scheduled_limit()
+        self._checked = time.monotonic()
+
+    @classmethod
+    def from_env(cls) -> 'BandwidthGovernor':
+        """Лимит и профили из YTDL_BANDWIDTH_LIMIT и YTDL_BANDWIDTH_PROFILE"""
+        limit = os.environ.get('YTDL_BANDWIDTH_LIMIT')
+        profiles = os.environ.get('YTDL_BANDWIDTH_PROFILE')
+        try:
+            return cls(parse_rate(limit) if limit else None, parse_profiles(profiles) if profiles else None)
+        except ValueError as e:
+            print(f"⚠️  Предупреждение: {e}, лимит скорости не задан")
+            return cls()
+
+    @property
+    def limit(self) -> Optional[int]:
+        """Действующий сейчас лимит (с учетом профиля)"""
+        with self._lock:
+            return self._limit
+
+    def _scheduled_limit(self) -> Optional[int]:
+        now = self._now()
+        minute = now.hour * 60 + now.minute
+        for start, end, rate in self.profiles:
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                return rate
+        return self.base_limit
+
+    def set_limit(self, limit: Optional[int], profiles: Optional[List] = None):
+        """Новый общий лимит (и профили, если заданы); доли пересчитываются сразу"""
+        with self._lock:
+            self.base_limit = limit
+            if profiles is not None:
+                self.profiles = profiles
+            self._limit = self._scheduled_limit()
+            self._rebalance_locked()
+
+    def register(self, key: str, cap: Optional[int] = None) -> JobBandwidth:
+        """Задача начала скачивание: получает долю, доли остальных уменьшаются"""
+        with self._lock:
+            job = self._jobs[key] = JobBandwidth(self, key, cap)
+            self._rebalance_locked()
+            return job
+
+    def unregister(self, key: str):
+        """Задача завершилась: ее доля делится между оставшимися"""
+        with self._lock:
+            if self._jobs.pop(key, None):
+                self._rebalance_locked()
+
+    def shares(self) -> Dict[str, Dict]:
+        """Доля и измеренная скорость каждой задачи по ключу"""
+        with self._lock:
+            return {key: {'share': job.share, 'rate': job.rate, 'cap': job.cap}
+                    for key, job in self._jobs.items()}
+
+    def _refresh_limit_locked(self):
+        """Смена профиля по времени суток (проверяется не чаще REFRESH_INTERVAL)"""
+        now = time.monotonic()
+        if now - self._checked < REFRESH_INTERVAL:
+            return
+        self._checked = now
+        limit = self._scheduled_limit()
+        if limit != self._limit:
+            self._limit = limit
+            self._rebalance_locked()
+
+    def _rebalance_locked(self):
+        """Равные доли; задачи с cap ниже равной доли получают cap, остаток делится между прочими"""
+        jobs = sorted(self._jobs.values(), key=lambda job: job.cap or float('inf'))
+        if not self._limit:
+            for job in jobs:
+                job.share = job.cap
+            return
+        remaining = float(self._limit)
+        while jobs:
+            fair = remaining / len(jobs)
+            if jobs[0].cap is not None and jobs[0].cap <= fair:
+                job = jobs.pop(0)
+                job.share = job.cap
+                remaining -= job.cap
+                continue
+            for job in jobs:
+                job.share = fair
+            break
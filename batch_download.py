@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Пакетное скачивание без GUI и без вопросов пользователю
+
+Ссылки читаются из файла (или stdin), формат выбирается по политике,
+задачи выполняются пулом из нескольких потоков. Плейлисты и каналы
+раскрываются постепенно, по мере получения страниц списка. На каждую задачу в
+результаты пишется одна строка JSON:
+
+    {"job_id": 1, "url": "...", "status": "done", "output": "...", "bytes": 123,
+     "format_id": "137", "title": "...", "error_class": null, "error": null,
+     "throughput": 5242880.0, "download_bytes": 120, "download_time": 0.1, "media_host": "rr1.googlevideo.com",
+     "transfer": "фрагментов: 4", "written_twice": 0, "skipped": false,
+     "durations": {"queued": 0.0, "info": 1.2, "download": 8.5, "merge": 0.4, "total": 10.1}}
+
+Видео, уже скачанные в эту папку с тем же выбором формата (библиотека
+загрузок, library.py), пропускаются без обращения к YouTube ("skipped": true);
+--force скачивает их заново.
+
+bytes - размер готового файла; download_bytes и download_time - скачанные
+по сети байты и время скачивания (после объединения или перекодирования
+размер файла другой). В конце в stderr выводится средняя скорость по
+каждому хосту медиа (CDN) - по ней подбирается число фрагментов (-N) и
+необходимость aria2c.
+
+    python batch_download.py urls.txt -o downloads -f best -j 4 > results.jsonl
+    python batch_download.py urls.txt -f "best,height<=1080,codec=av1/vp9,size<=500M"
+    python batch_download.py urls.txt -N 8 --aria2c
+    python batch_download.py urls.txt -j 4 --limit-rate 4M --job-rate 1M --bandwidth-profile "09:00-18:00=1M"
+    python batch_download.py urls.txt --metrics-log stages.jsonl --metrics-file ytdl.prom
+    cat urls.txt | python youtube_downloader.py - --format audio
+
+PyQt не импортируется: режим рассчитан на серверы и cron.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, TextIO
+from urllib.parse import urlparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from download_queue import DownloadQueue, parse_url_list
+from bandwidth import parse_profiles, parse_rate
+from downloader_core import YouTubeDownloader
+from engines import MAX_FRAGMENTS
+from format_selector import FORMAT_POLICIES, parse_policy
+from job_journal import JobJournal
+from metrics import StageMetrics, set_default_metrics
+
+
+def format_policy(text: str) -> str:
+    """Проверка политики выбора формата для -f (готовая или с ограничениями)"""
+    try:
+        parse_policy(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return text
+
+
+def job_record(job: Dict) -> Dict:
+    """Строка результата для завершенной задачи"""
+    result = job['result'] or {}
+    output = result.get('final_file') if job['state'] == 'done' else None
+    size = None
+    if output:
+        try:
+            size = os.path.getsize(output)
+        except OSError:
+            pass
+
+    durations = {key: round(value, 3) for key, value in job['timings'].items()}
+    if job['started_at']:
+        durations['queued'] = round(job['started_at'] - job['created_at'], 3)
+        durations['total'] = round(job['finished_at'] - job['started_at'], 3)
+
+    return {
+        'job_id': job['job_id'],
+        'url': job['url'],
+        'status': job['state'],
+        'output': output,
+        'bytes': size,
+        'format_id': job['format_id'],
+        'title': job['title'],
+        'error_class': job['error_class'],
+        'error': job['error'],
+        'throughput': round(result['throughput'], 1) if result.get('throughput') else None,
+        'download_bytes': result.get('download_bytes'),
+        'download_time': round(result['download_time'], 3) if result.get('download_time') else None,
+        'media_host': result.get('media_host'),
+        'transfer': result.get('transfer'),
+        'written_twice': result.get('bytes_written_twice'),
+        'skipped': bool(result.get('skipped')),
+        'durations': durations,
+    }
+
+
+def run_batch(downloader, urls: List[str], output_dir: str, policy: str = 'best',
+              workers: int = 2, format_id: Optional[str] = None,
+              results: Optional[TextIO] = None, log: Optional[TextIO] = None,
+              playlist: bool = False, journal: Optional[JobJournal] = None,
+              fragments: int = 1, use_aria2c: bool = False, rate_cap: Optional[int] = None,
+              skip_existing: bool = True) -> List[Dict]:
+    """Скачивание списка ссылок, возвращает записи результатов в порядке завершения
+
+    playlist=True раскрывает как список каждую ссылку (не только плейлисты и каналы YouTube).
+    С journal сначала возобновляются незавершенные задачи из журнала, их ссылки
+    повторно не добавляются. fragments и use_aria2c - параллельное скачивание
+    фрагментов каждой задачи, rate_cap - ограничение скорости каждой задачи
+    внутри общего лимита downloader.bandwidth. skip_existing=False скачивает
+    заново и то, что уже есть в библиотеке загрузок.
+    """
+    records = []
+    write_lock = threading.Lock()
+
+    def on_update(job: Dict):
+        if job['state'] not in ('done', 'error', 'cancelled'):
+            return
+        record = job_record(job)
+        # Задачи завершаются в разных потоках: строки результатов не должны перемешиваться
+        with write_lock:
+            records.append(record)
+            if results:
+                results.write(json.dumps(record, ensure_ascii=False) + '\n')
+                results.flush()
+            if log:
+                icon = {'done': "⏭️" if record['skipped'] else "✅", 'cancelled': "🚫"}.get(record['status'], "❌")
+                if record['status'] == 'done':
+                    detail = record['output']
+                elif record['status'] == 'cancelled':
+                    detail = "отменено"
+                else:
+                    detail = f"{record['error_class']}: {record['error']}"
+                log.write(f"{icon} [{len(records)}] {record['title'] or record['url']} -> {detail}\n")
+                log.flush()
+
+    # Завершенные задачи не храним: у канала их могут быть десятки тысяч
+    queue = DownloadQueue(downloader, max_workers=workers, on_update=on_update, keep_finished=False,
+                          journal=journal, fragments=fragments, use_aria2c=use_aria2c, rate_cap=rate_cap,
+                          skip_existing=skip_existing)
+    if journal:
+        resumed = {state['url'] for state in journal.unfinished()}
+        queue.resume_unfinished()
+        urls = [url for url in urls if url not in resumed]
+    if format_id:
+        for url in urls:
+            queue.add(url, output_dir, format_id=format_id)
+    elif playlist:
+        for url in urls:
+            queue.add_playlist(url, output_dir, policy)
+    else:
+        queue.add_many(urls, output_dir, policy)
+    try:
+        queue.wait()
+    except KeyboardInterrupt:
+        # С журналом прерванные задачи продолжатся при следующем запуске
+        if journal:
+            queue.shutdown()
+        else:
+            queue.cancel_all()
+            queue.wait()
+    return records
+
+
+def throughput_by_host(records: List[Dict]) -> Dict[str, Dict]:
+    """Скачанные байты, время скачивания и средняя скорость по хостам медиа"""
+    hosts = defaultdict(lambda: {'jobs': 0, 'bytes': 0, 'seconds': 0.0})
+    for record in records:
+        if record['status'] != 'done' or not record.get('download_bytes') or not record.get('download_time'):
+            continue
+        # Без хоста медиа (нет ссылки в информации о видео) - хост страницы
+        host = hosts[record.get('media_host') or urlparse(record['url']).hostname or '?']
+        host['jobs'] += 1
+        host['bytes'] += record['download_bytes']
+        host['seconds'] += record['download_time']
+    for host in hosts.values():
+        host['throughput'] = host['bytes'] / host['seconds'] if host['seconds'] else None
+    return dict(hosts)
+
+
+def read_urls(source: str) -> List[str]:
+    """Ссылки из файла или из stdin ('-')"""
+    if source == '-':
+        return parse_url_list(sys.stdin.read())
+    with open(source, encoding='utf-8', errors='replace') as f:
+        return parse_url_list(f.read())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Пакетное скачивание видео с YouTube")
+    parser.add_argument('urls', nargs='?', default='-', help="файл со ссылками (по одной в строке), '-' - stdin")
+    parser.add_argument('-o', '--output-dir', default='.', help="папка для скачивания")
+    parser.add_argument('-f', '--format', dest='policy', type=format_policy, default='best',
+                        help=f"политика выбора формата: {', '.join(FORMAT_POLICIES)} "
+                             f"или ограничения, например \"best,height<=1080,size<=500M\"")
+    parser.add_argument('--format-id', help="конкретный ID формата для всех ссылок (вместо политики)")
+    parser.add_argument('-j', '--jobs', type=int, default=2, help="одновременных загрузок")
+    parser.add_argument('--results', help="файл для результатов JSON lines (по умолчанию stdout)")
+    parser.add_argument('--playlist', action='store_true',
+                        help="раскрывать каждую ссылку как плейлист (плейлисты и каналы YouTube - всегда)")
+    parser.add_argument('--journal', help="журнал задач JSON lines: незавершенные задачи продолжаются при повторном запуске")
+    parser.add_argument('--backend', help="движок yt-dlp: subprocess или inprocess")
+    parser.add_argument('-N', '--fragments', type=int, default=1,
+                        help=f"фрагментов DASH/HLS одновременно на задачу (до {MAX_FRAGMENTS})")
+    parser.add_argument('--aria2c', action='store_true',
+                        help="скачивать через aria2c (несколько соединений на файл), если он установлен")
+    parser.add_argument('--limit-rate', type=parse_rate,
+                        help="общий лимит скорости всех задач, например 4M (делится между задачами)")
+    parser.add_argument('--job-rate', type=parse_rate, help="ограничение скорости одной задачи, например 1M")
+    parser.add_argument('--bandwidth-profile', type=parse_profiles,
+                        help='лимит по времени суток: "09:00-18:00=1M,23:00-07:00=0" (0 - без лимита)')
+    parser.add_argument('--stream-merge', action='store_true',
+                        help="объединять video-only форматы потоком в FFmpeg, без временных файлов")
+    parser.add_argument('--staging-dir',
+                        help="промежуточный каталог задач (например, tmpfs); по умолчанию .ytdl-staging в папке загрузок")
+    parser.add_argument('--force', action='store_true',
+                        help="скачивать заново видео, которые уже есть в библиотеке загрузок")
+    parser.add_argument('--metrics-log', help="журнал этапов задач JSON lines (длительность, байты, исход)")
+    parser.add_argument('--metrics-file', help="файл метрик в формате Prometheus (textfile collector)")
+    parser.add_argument('--metrics-port', type=int, help="отдавать метрики Prometheus по http://127.0.0.1:PORT/metrics")
+    args = parser.parse_args(argv)
+
+    try:
+        urls = read_urls(args.urls)
+    except OSError as e:
+        print(f"❌ Не удалось прочитать список ссылок: {e}", file=sys.stderr)
+        return 2
+    if not urls:
+        print("❌ Ссылки не найдены", file=sys.stderr)
+        return 2
+
+    # Результаты идут в stdout, поэтому сообщения загрузчика перенаправляются в stderr
+    results = sys.stdout
+    with contextlib.ExitStack() as stack:
+        if args.results:
+            results = stack.enter_context(open(args.results, 'a', encoding='utf-8'))
+        stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+
+        try:
+            if args.metrics_log or args.metrics_file or args.metrics_port is not None:
+                set_default_metrics(StageMetrics.from_env(args.metrics_log, args.metrics_file, args.metrics_port))
+            downloader = YouTubeDownloader(args.backend)
+            if args.stream_merge:
+                downloader.stream_merge = True
+            if args.staging_dir:
+                downloader.staging_dir = args.staging_dir
+            if args.limit_rate or args.bandwidth_profile:
+                downloader.bandwidth.set_limit(args.limit_rate or downloader.bandwidth.base_limit,
+                                               args.bandwidth_profile)
+            journal = JobJournal(args.journal) if args.journal else None
+            if journal:
+                journal.compact()
+        except (RuntimeError, OSError) as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 2
+
+        start = time.perf_counter()
+        print(f"📥 Ссылок: {len(urls)}, одновременно: {args.jobs}, формат: {args.format_id or args.policy}",
+              file=sys.stderr)
+        records = run_batch(downloader, urls, args.output_dir, args.policy, args.jobs,
+                            args.format_id, results=results, log=sys.stderr, playlist=args.playlist,
+                            journal=journal, fragments=args.fragments, use_aria2c=args.aria2c,
+                            rate_cap=args.job_rate, skip_existing=not args.force)
+        elapsed = time.perf_counter() - start
+
+    done = [r for r in records if r['status'] == 'done']
+    skipped = sum(1 for r in done if r['skipped'])
+    total_bytes = sum(r['bytes'] or 0 for r in done if not r['skipped'])
+    print(f"🏁 Готово {len(done)} из {len(records)} за {elapsed:.1f} сек, "
+          f"{total_bytes / 1024 / 1024:.1f} MB"
+          + (f", уже скачано ранее: {skipped}" if skipped else ""), file=sys.stderr)
+    for host, stats in sorted(throughput_by_host(records).items()):
+        print(f"📶 {host}: {stats['throughput'] / 1024 / 1024:.2f} MB/s "
+              f"({stats['jobs']} загрузок, {stats['bytes'] / 1024 / 1024:.1f} MB)", file=sys.stderr)
+    return 0 if len(done) == len(records) else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        sys.exit(130)
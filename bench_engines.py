@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Сравнение движков yt-dlp: subprocess и inprocess
+
+Измеряет время создания загрузчика, задержку получения метаданных
+и накладные расходы на одну задачу скачивания (самый маленький аудио формат).
+
+    python bench_engines.py [URL] [--repeat N] [--download] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from engines import BACKENDS
+
+DEFAULT_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    value = func(*args)
+    return time.perf_counter() - start, value
+
+
+def bench_backend(backend: str, url: str, repeat: int, download: bool) -> dict:
+    """Замеры для одного движка"""
+    from downloader_core import YouTubeDownloader
+
+    result = {'backend': backend}
+    result['init_sec'], downloader = _timed(YouTubeDownloader, backend)
+
+    info_times = []
+    for _ in range(repeat):
+        elapsed, _info = _timed(downloader.get_video_info, url)
+        info_times.append(elapsed)
+    result['info_sec'] = {
+        'min': min(info_times),
+        'median': statistics.median(info_times),
+        'max': max(info_times),
+    }
+
+    if download:
+        # Минимальная задача: самый маленький аудио поток, время сверх чистой передачи данных
+        # видно по разнице между движками на одном и том же формате
+        formats = downloader.get_available_formats(url)
+        audio = [f for f in formats if f['is_audio_only']]
+        if audio:
+            format_id = audio[0]['id']
+            with tempfile.TemporaryDirectory() as tmp:
+                elapsed, job = _timed(downloader._download_audio_only, url, format_id, tmp)
+            result['job_sec'] = elapsed
+            result['job_format'] = format_id
+            result['job_success'] = job['success']
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение движков yt-dlp")
+    parser.add_argument('url', nargs='?', default=DEFAULT_URL)
+    parser.add_argument('--repeat', type=int, default=3, help="повторов получения информации")
+    parser.add_argument('--download', action='store_true', help="замерить и задачу скачивания")
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--json', action='store_true', help="вывод в формате JSON")
+    args = parser.parse_args()
+
+    results = []
+    for backend in args.backends.split(','):
+        try:
+            results.append(bench_backend(backend, args.url, args.repeat, args.download))
+        except Exception as e:
+            results.append({'backend': backend, 'error': str(e)})
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    print("🏁 Сравнение движков yt-dlp")
+    print("=" * 60)
+    for res in results:
+        if 'error' in res:
+            print(f"{res['backend']:<12} ❌ {res['error']}")
+            continue
+        line = (f"{res['backend']:<12} init {res['init_sec']:.2f}s  "
+                f"info median {res['info_sec']['median']:.2f}s (min {res['info_sec']['min']:.2f}s)")
+        if 'job_sec' in res:
+            line += f"  job {res['job_sec']:.2f}s"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
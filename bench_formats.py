@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Сравнение модели форматов: словари (как раньше) и MediaFormat/FormatList
+
+Для N синтетических видео с типичным для YouTube набором форматов (~60,
+включая раскадровки) замеряются память на одно видео (tracemalloc; JSON
+видео, который и так хранится в кэше метаданных, не учитывается), время
+разбора, поиск формата по ID (перебором списка и по индексу) и выбор
+формата по политике (список словарей преобразуется при каждом вызове).
+
+    python bench_formats.py [--videos 2000] [--repeat 3] [--json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from format_model import FormatList
+from format_selector import select_format
+
+HEIGHTS = (144, 240, 360, 480, 720, 1080, 1440, 2160)
+VIDEO_CODECS = (('mp4', 'avc1.640028', 1.0), ('webm', 'vp9', 0.6), ('mp4', 'av01.0.08M.08', 0.5))
+AUDIO = (('139', 'm4a', 'mp4a.40.5', 48.8), ('140', 'm4a', 'mp4a.40.2', 129.5), ('249', 'webm', 'opus', 51.2),
+         ('250', 'webm', 'opus', 66.4), ('251', 'webm', 'opus', 131.9), ('251-drc', 'webm', 'opus', 130.1))
+DURATION = 600
+
+
+def synthetic_info(index: int) -> Dict:
+    """JSON видео как у yt-dlp --dump-json: раскадровки, аудио, видео трех кодеков, HLS"""
+    formats = [{'format_id': f'sb{i}', 'ext': 'mhtml', 'vcodec': 'none', 'acodec': 'none',
+                'format_note': 'storyboard', 'protocol': 'mhtml'} for i in range(4)]
+    for format_id, ext, acodec, abr in AUDIO:
+        formats.append({'format_id': format_id, 'ext': ext, 'vcodec': 'none', 'acodec': acodec, 'abr': abr,
+                        'tbr': abr, 'filesize': int(abr * 125 * DURATION) + index, 'format_note': 'medium',
+                        'protocol': 'https', 'resolution': 'audio only'})
+    for height in HEIGHTS:
+        width = height * 16 // 9
+        for fps in (30, 60) if height >= 720 else (30,):
+            for ext, vcodec, factor in VIDEO_CODECS:
+                tbr = round(height * 4.2 * factor * (1.5 if fps == 60 else 1), 1)
+                formats.append({'format_id': f'{300 + len(formats)}', 'ext': ext, 'vcodec': vcodec, 'acodec': 'none',
+                                'width': width, 'height': height, 'fps': fps, 'tbr': tbr, 'vbr': tbr,
+                                'filesize': int(tbr * 125 * DURATION), 'format_note': f'{height}p',
+                                'protocol': 'https', 'resolution': f'{width}x{height}'})
+        formats.append({'format_id': f'hls-{height}p', 'ext': 'mp4', 'vcodec': 'avc1.4d401f',
+                        'acodec': 'mp4a.40.2', 'width': width, 'height': height, 'fps': 30,
+                        'tbr': round(height * 4.6, 1), 'protocol': 'm3u8_native', 'resolution': f'{width}x{height}'})
+    formats.append({'format_id': '18', 'ext': 'mp4', 'vcodec': 'avc1.42001E', 'acodec': 'mp4a.40.2', 'width': 640,
+                    'height': 360, 'fps': 30, 'tbr': 600.5, 'format_note': '360p', 'protocol': 'https',
+                    'resolution': '640x360'})
+    return {'id': f'video{index:07d}', 'title': f'Video {index}', 'duration': DURATION, 'formats': formats}
+
+
+def legacy_formats_from_info(video_info: Dict) -> List[Dict]:
+    """Форматы словарями, как formats_from_info до появления format_model"""
+    formats = []
+    for fmt in video_info.get('formats') or []:
+        format_id = fmt.get('format_id')
+        if not format_id:
+            continue
+        vcodec = fmt.get('vcodec')
+        acodec = fmt.get('acodec')
+        if vcodec == 'none' and acodec == 'none':
+            continue
+        is_video_only = vcodec != 'none' and acodec == 'none'
+        is_audio_only = vcodec == 'none' and acodec != 'none'
+        height = fmt.get('height')
+        abr = fmt.get('abr')
+        if height:
+            quality = f"{height}p"
+        elif is_audio_only and abr:
+            quality = f"{round(abr)}k"
+        else:
+            quality = fmt.get('format_note') or 'unknown'
+        if is_audio_only:
+            resolution = 'audio only'
+        else:
+            resolution = fmt.get('resolution') or (f"{fmt['width']}x{height}" if fmt.get('width') and height else 'unknown')
+        note_parts = [fmt.get('format_note')]
+        if is_video_only:
+            note_parts += [vcodec, 'video only']
+        elif is_audio_only:
+            note_parts += [acodec, 'audio only']
+        else:
+            note_parts += [vcodec, acodec]
+        formats.append({
+            'id': format_id, 'extension': fmt.get('ext') or 'unknown', 'resolution': resolution,
+            'quality': quality, 'note': ', '.join(part for part in note_parts if part),
+            'is_video_only': is_video_only, 'is_audio_only': is_audio_only,
+            'has_audio': not is_video_only and not is_audio_only,
+            'width': fmt.get('width'), 'height': height, 'fps': fmt.get('fps'), 'tbr': fmt.get('tbr'),
+            'vbr': fmt.get('vbr'), 'abr': abr, 'vcodec': vcodec, 'acodec': acodec,
+            'filesize': fmt.get('filesize'), 'filesize_approx': fmt.get('filesize_approx'),
+            'protocol': fmt.get('protocol'),
+        })
+    return formats
+
+
+def _memory_per_video(parse, infos: List[Dict]) -> float:
+    """Байт на видео: форматы всех видео держатся в памяти одновременно"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [parse(info) for info in infos]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return (after - before) / len(infos)
+
+
+def _best_time(func, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench(videos: int, repeat: int) -> Dict:
+    """Замеры для словарей (legacy) и FormatList (model)"""
+    infos = [synthetic_info(i) for i in range(videos)]
+    parsed = {'legacy': [legacy_formats_from_info(info) for info in infos],
+              'model': [FormatList.from_info(info) for info in infos]}
+    parsers = {'legacy': legacy_formats_from_info, 'model': FormatList.from_info}
+    ids = [fmt['id'] for fmt in parsed['model'][0]]
+    sample = parsed['legacy'][:max(1, videos // 20)]
+    sample_model = parsed['model'][:len(sample)]
+
+    result = {'videos': videos, 'formats_per_video': len(ids),
+              'json_formats_per_video': len(infos[0]['formats'])}
+    for name in ('legacy', 'model'):
+        lists = parsed[name]
+        if name == 'legacy':
+            def lookup():
+                for formats in lists:
+                    for format_id in ids:
+                        next((f for f in formats if f['id'] == format_id), None)
+        else:
+            def lookup():
+                for formats in lists:
+                    for format_id in ids:
+                        formats.by_id(format_id)
+        selection = sample if name == 'legacy' else sample_model
+        result[name] = {
+            'bytes_per_video': round(_memory_per_video(parsers[name], infos)),
+            'parse_us_per_video': round(_best_time(lambda: [parsers[name](info) for info in infos], repeat)
+                                        / videos * 1e6, 2),
+            'lookup_ns': round(_best_time(lookup, repeat) / (videos * len(ids)) * 1e9, 1),
+            'select_us_per_video': round(_best_time(
+                lambda: [select_format(formats, 'best,height<=1080', True, DURATION) for formats in selection],
+                repeat) / len(selection) * 1e6, 1),
+        }
+    # Выбор не зависит от модели
+    assert [select_format(f, 'best-500mb', True, DURATION) for f in sample[:3]] == \
+        [select_format(f, 'best-500mb', True, DURATION) for f in sample_model[:3]]
+    result['memory_ratio'] = round(result['legacy']['bytes_per_video'] / result['model']['bytes_per_video'], 2)
+    result['lookup_speedup'] = round(result['legacy']['lookup_ns'] / result['model']['lookup_ns'], 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение модели форматов: словари и FormatList")
+    parser.add_argument('--videos', type=int, default=2000, help="видео в пакете")
+    parser.add_argument('--repeat', type=int, default=3, help="повторов замера (берется лучший)")
+    parser.add_argument('--json', action='store_true', help="вывод в формате JSON")
+    args = parser.parse_args()
+
+    result = bench(max(1, args.videos), max(1, args.repeat))
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+
+    print(f"📦 Видео: {result['videos']}, форматов на видео: {result['formats_per_video']} "
+          f"(в JSON: {result['json_formats_per_video']})")
+    print("=" * 60)
+    print(f"{'':<22} {'словари':>12} {'FormatList':>12}")
+    rows = (('Память на видео, KB', 'bytes_per_video', 1 / 1024), ('Разбор, мкс/видео', 'parse_us_per_video', 1),
+            ('Поиск по ID, нс', 'lookup_ns', 1), ('Выбор формата, мкс', 'select_us_per_video', 1))
+    for label, key, scale in rows:
+        print(f"{label:<22} {result['legacy'][key] * scale:>12.1f} {result['model'][key] * scale:>12.1f}")
+    print(f"\n📉 Память: в {result['memory_ratio']} раза меньше, поиск по ID: в {result['lookup_speedup']} раза быстрее")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Офлайн-бенчмарк YouTubeDownloader: локальный сервер медиа и поддельный yt-dlp
+
+Сеть и YouTube не нужны: синтетические файлы (progressive, отдельные видео и
+аудио потоки как в DASH, HLS из сегментов) раздает локальный HTTP сервер, а
+информацию о видео отдает fake_ytdlp.py по записанному JSON. Замеряются
+получение информации (холодное, из памяти, с диска), оценка размера,
+скачивание по каждому пути кода (progressive, audio-only, video-only с
+объединением, HLS с 1 и N фрагментами) и задача очереди целиком.
+Объединение замеряется, если установлен FFmpeg с libx264 (тогда и медиа
+настоящие, иначе - случайные байты).
+
+    python bench_offline.py [--repeat N] [--size-mb 16] [--rate 20M] [--real-ytdlp]
+                            [--json] [--output FILE] [--compare BASE.json]
+"""
+
+import argparse
+import contextlib
+import http.server
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bandwidth import parse_rate
+from metrics import StageMetrics
+from tool_probe import probe_tools
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MB = 1024 * 1024
+VIDEO_ID = 'benchclip01'
+VIDEO_URL = f'https://www.youtube.com/watch?v={VIDEO_ID}'
+# Длительность синтетического ролика (сек) и число HLS сегментов без FFmpeg
+DURATION = 10
+HLS_SEGMENTS = 20
+HLS_FRAGMENTS = 4
+# Фрагментированный MP4 (индекс в начале), как DASH-потоки YouTube: читается из канала
+DASH_MOVFLAGS = '+frag_keyframe+empty_moov+default_base_moof'
+# Чем меньше значение, тем лучше (время), кроме скорости
+HIGHER_IS_BETTER = {'MB/s'}
+
+
+class _OriginHandler(http.server.BaseHTTPRequestHandler):
+    """Файлы каталога сервера с поддержкой Range и ограничением скорости"""
+
+    root = '.'
+    rate: Optional[int] = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._serve(body=False)
+
+    def do_GET(self):
+        self._serve(body=True)
+
+    def _serve(self, body: bool):
+        path = os.path.join(self.root, self.path.split('?')[0].lstrip('/'))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start, end = int(match.group(1)), min(int(match.group(2) or end), end)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        content_type = 'application/vnd.apple.mpegurl' if path.endswith('.m3u8') else 'application/octet-stream'
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        if not body:
+            return
+        with open(path, 'rb') as f:
+            f.seek(start)
+            left = end - start + 1
+            sent_start = time.monotonic()
+            sent = 0
+            while left > 0:
+                chunk = f.read(min(256 * 1024, left))
+                left -= len(chunk)
+                try:
+                    self.wfile.write(chunk)
+                except OSError:
+                    return
+                sent += len(chunk)
+                if self.rate:
+                    ahead = sent / self.rate - (time.monotonic() - sent_start)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+
+class MediaOrigin:
+    """Локальный HTTP сервер медиа в фоновом потоке (rate - байт/с на соединение)"""
+
+    def __init__(self, root: str, rate: Optional[int] = None):
+        handler = type('OriginHandler', (_OriginHandler,), {'root': root, 'rate': rate})
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True, name='media-origin')
+
+    def url(self, name: str) -> str:
+        return f'http://127.0.0.1:{self.server.server_address[1]}/{name}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _has_libx264(ffmpeg: Optional[Dict]) -> bool:
+    if not ffmpeg:
+        return False
+    try:
+        result = subprocess.run([ffmpeg['path'], '-hide_banner', '-encoders'], capture_output=True, text=True,
+                                timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return 'libx264' in result.stdout
+
+
+def build_media(root: str, size_mb: float, ffmpeg: Optional[Dict]) -> bool:
+    """Синтетические медиа в root; True - настоящие (FFmpeg), False - случайные байты"""
+    os.makedirs(os.path.join(root, 'hls'), exist_ok=True)
+    if _has_libx264(ffmpeg):
+        # Постоянный битрейт (nal-hrd=cbr) дает предсказуемый размер, GOP 1 сек - сегменты HLS по 1 сек
+        bitrate = str(int(size_mb * MB * 8 / DURATION))
+        base = [ffmpeg['path'], '-y', '-hide_banner', '-loglevel', 'error']
+        commands = [
+            base + ['-f', 'lavfi', '-i', 'testsrc2=size=1280x720:rate=30', '-t', str(DURATION),
+                    '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '30', '-b:v', bitrate, '-minrate', bitrate,
+                    '-maxrate', bitrate, '-bufsize', bitrate, '-x264-params', 'nal-hrd=cbr',
+                    '-movflags', DASH_MOVFLAGS, os.path.join(root, 'video.mp4')],
+            base + ['-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000', '-t', str(DURATION),
+                    '-c:a', 'aac', '-b:a', '128k', '-movflags', DASH_MOVFLAGS, os.path.join(root, 'audio.m4a')],
+            base + ['-i', os.path.join(root, 'video.mp4'), '-i', os.path.join(root, 'audio.m4a'),
+                    '-c', 'copy', os.path.join(root, 'progressive.mp4')],
+            base + ['-i', os.path.join(root, 'progressive.mp4'), '-c', 'copy', '-f', 'hls', '-hls_time', '1',
+                    '-hls_list_size', '0', '-hls_segment_filename', os.path.join(root, 'hls', 'seg%03d.ts'),
+                    os.path.join(root, 'hls', 'index.m3u8')],
+        ]
+        for cmd in commands:
+            subprocess.run(cmd, check=True, capture_output=True, timeout=300)
+        return True
+
+    size = int(size_mb * MB)
+    for name, nbytes in (('video.mp4', size), ('audio.m4a', size // 8), ('progressive.mp4', size)):
+        with open(os.path.join(root, name), 'wb') as f:
+            f.write(os.urandom(nbytes))
+    segment = size // HLS_SEGMENTS
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{DURATION // HLS_SEGMENTS or 1}']
+    for i in range(HLS_SEGMENTS):
+        with open(os.path.join(root, 'hls', f'seg{i:03d}.ts'), 'wb') as f:
+            f.write(os.urandom(segment))
+        lines += [f'#EXTINF:{DURATION / HLS_SEGMENTS:.3f},', f'seg{i:03d}.ts']
+    with open(os.path.join(root, 'hls', 'index.m3u8'), 'w') as f:
+        f.write('\n'.join(lines + ['#EXT-X-ENDLIST', '']))
+    return False
+
+
+def build_info(origin: MediaOrigin, root: str) -> Dict:
+    """Информация о видео в формате yt-dlp --dump-json со ссылками на локальный сервер"""
+    def size(name):
+        return os.path.getsize(os.path.join(root, name))
+
+    def fmt(format_id, name, ext, vcodec, acodec, **extra):
+        entry = {'format_id': format_id, 'url': origin.url(name), 'ext': ext, 'vcodec': vcodec,
+                 'acodec': acodec, 'protocol': 'https'}
+        if vcodec != 'none':
+            entry.update(width=1280, height=720, fps=30, resolution='1280x720')
+        entry.update(extra)
+        return entry
+
+    return {
+        'id': VIDEO_ID,
+        'title': 'bench clip',
+        'duration': DURATION,
+        'webpage_url': VIDEO_URL,
+        'formats': [
+            fmt('140', 'audio.m4a', 'm4a', 'none', 'mp4a.40.2', abr=128, format_note='medium',
+                filesize=size('audio.m4a')),
+            fmt('137', 'video.mp4', 'mp4', 'avc1.64001f', 'none', format_note='720p',
+                filesize=size('video.mp4')),
+            fmt('18', 'progressive.mp4', 'mp4', 'avc1.64001f', 'mp4a.40.2', format_note='720p',
+                filesize=size('progressive.mp4')),
+            # Размер HLS неизвестен заранее: оценка по битрейту
+            fmt('hls-720', 'hls/index.m3u8', 'mp4', 'avc1.64001f', 'mp4a.40.2', protocol='m3u8_native',
+                tbr=round(size('progressive.mp4') * 8 / 1000 / DURATION, 1)),
+        ],
+    }
+
+
+def _median(func: Callable[[], Optional[float]], repeat: int) -> Optional[float]:
+    values = [value for value in (func() for _ in range(repeat)) if value is not None]
+    return statistics.median(values) if values else None
+
+
+class OfflineBench:
+    """Замеры одного прогона: результаты - список {'name', 'value', 'unit'}"""
+
+    def __init__(self, work_dir: str, tools: Dict, repeat: int):
+        self.work_dir = work_dir
+        self.tools = tools
+        self.repeat = repeat
+        self.results: List[Dict] = []
+        self.skipped: List[Dict] = []
+        # Этапы всех задач прогона: число, суммарное время и байты по этапу
+        self.metrics = StageMetrics()
+
+    def record(self, name: str, value: Optional[float], unit: str):
+        if value is not None:
+            self.results.append({'name': name, 'value': round(value, 4), 'unit': unit})
+
+    def skip(self, name: str, reason: str):
+        self.skipped.append({'name': name, 'reason': reason})
+
+    def downloader(self):
+        from downloader_core import YouTubeDownloader
+        return YouTubeDownloader('subprocess', tools=self.tools, metrics=self.metrics)
+
+    def bench_info(self):
+        """Информация о видео: процесс yt-dlp, кэш в памяти, кэш на диске"""
+        def cold():
+            downloader = self.downloader()
+            if downloader.disk_cache:
+                downloader.disk_cache.delete(VIDEO_ID)
+            start = time.perf_counter()
+            downloader.get_video_info(VIDEO_URL)
+            return (time.perf_counter() - start) * 1000
+
+        def memory():
+            downloader = self.downloader()
+            downloader.get_video_info(VIDEO_URL)
+            start = time.perf_counter()
+            downloader.get_video_info(VIDEO_URL)
+            return (time.perf_counter() - start) * 1000
+
+        def disk():
+            self.downloader().get_video_info(VIDEO_URL)
+            downloader = self.downloader()
+            if not downloader.disk_cache:
+                return None
+            start = time.perf_counter()
+            downloader.get_video_info(VIDEO_URL)
+            return (time.perf_counter() - start) * 1000
+
+        self.record('info.cold', _median(cold, self.repeat), 'ms')
+        self.record('info.memory_cache', _median(memory, self.repeat), 'ms')
+        self.record('info.disk_cache', _median(disk, self.repeat), 'ms')
+
+    def bench_size(self):
+        """Оценка размера всех форматов (информация уже в кэше)"""
+        downloader = self.downloader()
+        formats = downloader.get_available_formats(VIDEO_URL)
+
+        def lookup():
+            start = time.perf_counter()
+            for fmt in formats:
+                downloader.get_format_size(VIDEO_URL, fmt['id'])
+            return (time.perf_counter() - start) * 1000 / len(formats)
+
+        self.record('size.lookup', _median(lookup, self.repeat), 'ms')
+
+    def bench_download(self, name: str, format_id: str, fragments: int = 1, stream_merge: bool = False):
+        """Скачивание одного формата через download_video: время задачи, скорость, объединение"""
+        downloader = self.downloader()
+        downloader.stream_merge = stream_merge
+        downloader.get_video_info(VIDEO_URL)
+        job_times, throughputs, merge_times = [], [], []
+        for _ in range(self.repeat):
+            output_dir = tempfile.mkdtemp(dir=self.work_dir)
+            try:
+                start = time.perf_counter()
+                result = downloader.download_video(VIDEO_URL, format_id, output_dir, fragments=fragments)
+                elapsed = time.perf_counter() - start
+            finally:
+                shutil.rmtree(output_dir, ignore_errors=True)
+            if not result['success']:
+                self.skip(name, result['message'])
+                return
+            if stream_merge and result.get('merge_mode') != 'stream':
+                self.skip(name, "потоковое объединение не удалось, использованы временные файлы")
+                return
+            job_times.append(elapsed)
+            if result.get('throughput'):
+                throughputs.append(result['throughput'] / MB)
+            if result.get('merge_time') is not None:
+                merge_times.append(result['merge_time'])
+
+        self.record(f'{name}.job', statistics.median(job_times), 's')
+        if throughputs:
+            self.record(f'{name}.throughput', statistics.median(throughputs), 'MB/s')
+        if merge_times:
+            self.record(f'{name}.merge', statistics.median(merge_times), 's')
+
+    def bench_queue_job(self, format_id: str):
+        """Задача очереди целиком: этапы из job['timings'] и общее время от старта до завершения"""
+        from download_queue import DownloadQueue
+
+        timings = []
+        for _ in range(self.repeat):
+            output_dir = tempfile.mkdtemp(dir=self.work_dir)
+            try:
+                queue = DownloadQueue(self.downloader(), max_workers=1)
+                queue.add(VIDEO_URL, output_dir, format_id=format_id)
+                queue.wait()
+                job = queue.jobs()[0]
+            finally:
+                shutil.rmtree(output_dir, ignore_errors=True)
+            if job['state'] != 'done':
+                self.skip('queue', job.get('error') or job['state'])
+                return
+            timings.append(dict(job['timings'], total=job['finished_at'] - job['started_at']))
+        for phase in ('info', 'download', 'merge', 'total'):
+            values = [t[phase] for t in timings if t.get(phase) is not None]
+            if values:
+                self.record(f'queue.{phase}', statistics.median(values), 's')
+
+    def run(self, real_media: bool):
+        self.bench_info()
+        self.bench_size()
+        self.bench_download('download.progressive', '18')
+        self.bench_download('download.audio_only', '140')
+        if self.tools['ffmpeg'] and real_media:
+            self.bench_download('download.merge', '137')
+            if os.name != 'nt':
+                self.bench_download('download.merge_stream', '137', stream_merge=True)
+        else:
+            self.skip('download.merge', "нужен FFmpeg с libx264 (объединение настоящих потоков)")
+        self.bench_download('download.hls_1', 'hls-720', fragments=1)
+        self.bench_download(f'download.hls_{HLS_FRAGMENTS}', 'hls-720', fragments=HLS_FRAGMENTS)
+        self.bench_queue_job('18')
+
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout.strip() or None
+
+
+def run_bench(repeat: int = 3, size_mb: float = 16, rate: Optional[int] = None, real_ytdlp: bool = False) -> Dict:
+    """Полный прогон в временном каталоге, возвращает документ с результатами"""
+    work_dir = tempfile.mkdtemp(prefix='ytdl-bench-')
+    saved_env = dict(os.environ)
+    try:
+        tools = probe_tools(need_ytdlp=False)
+        media_dir = os.path.join(work_dir, 'media')
+        real_media = build_media(media_dir, size_mb, tools['ffmpeg'])
+        with MediaOrigin(media_dir, rate) as origin:
+            info_path = os.path.join(work_dir, 'info.json')
+            with open(info_path, 'w', encoding='utf-8') as f:
+                json.dump({VIDEO_URL: build_info(origin, media_dir)}, f)
+
+            # Отдельные кэш и журнал, без общего лимита скорости; fake_ytdlp запускается как модуль
+            os.environ.update({
+                'FAKE_YTDLP_INFO': info_path,
+                'YTDL_CACHE_DIR': os.path.join(work_dir, 'cache'),
+                'PYTHONPATH': os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])),
+            })
+            for name in ('YTDL_BANDWIDTH_LIMIT', 'YTDL_BANDWIDTH_PROFILE', 'YTDL_DISK_CACHE'):
+                os.environ.pop(name, None)
+            if real_ytdlp:
+                os.environ['FAKE_YTDLP_DOWNLOADER'] = 'yt-dlp'
+            tools = dict(tools, ytdlp={'command': f'{sys.executable} -m fake_ytdlp', 'version': 'fake'})
+
+            bench = OfflineBench(work_dir, tools, repeat)
+            bench.run(real_media)
+    finally:
+        os.environ.clear()
+        os.environ.update(saved_env)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'schema': 1,
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'downloader': 'yt-dlp' if real_ytdlp else 'fake',
+        'ffmpeg': tools['ffmpeg']['version'] if tools['ffmpeg'] else None,
+        'media': 'ffmpeg' if real_media else 'random',
+        'size_mb': size_mb,
+        'rate': rate,
+        'repeat': repeat,
+        'results': bench.results,
+        'skipped': bench.skipped,
+        'stages': bench.metrics.summary(),
+    }
+
+
+def compare(current: Dict, base: Dict) -> List[Dict]:
+    """Изменение каждой метрики относительно base (+ - лучше, - - хуже)"""
+    base_values = {r['name']: r for r in base.get('results', [])}
+    rows = []
+    for result in current['results']:
+        old = base_values.get(result['name'])
+        if not old or not old['value']:
+            continue
+        change = (result['value'] - old['value']) / old['value'] * 100
+        better = change if result['unit'] in HIGHER_IS_BETTER else -change
+        rows.append({'name': result['name'], 'unit': result['unit'], 'base': old['value'],
+                     'value': result['value'], 'change_pct': round(change, 1), 'better': better >= 0})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк YouTubeDownloader (локальный сервер медиа)")
+    parser.add_argument('--repeat', type=int, default=3, help="повторов каждого замера")
+    parser.add_argument('--size-mb', type=float, default=16, help="размер видео потока, MB")
+    parser.add_argument('--rate', type=parse_rate, help="скорость сервера на соединение (например 20M)")
+    parser.add_argument('--real-ytdlp', action='store_true', help="скачивать настоящим yt-dlp (--load-info-json)")
+    parser.add_argument('--json', action='store_true', help="вывод в формате JSON")
+    parser.add_argument('--output', help="сохранить результаты в файл JSON")
+    parser.add_argument('--compare', metavar='BASE', help="сравнить с сохраненными результатами")
+    args = parser.parse_args()
+
+    # Сообщения загрузчика уходят в stderr: stdout остается для результатов
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_bench(args.repeat, args.size_mb, args.rate, args.real_ytdlp)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            base = json.load(f)
+        report['compare'] = {'base_commit': base.get('commit'), 'rows': compare(report, base)}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"🏁 Офлайн-бенчмарк ({report['commit'] or 'без git'}, загрузчик {report['downloader']}, "
+          f"медиа {report['media']}, медиана из {report['repeat']})")
+    print("=" * 60)
+    for result in report['results']:
+        print(f"{result['name']:<28} {result['value']:>10.3f} {result['unit']}")
+    for skipped in report['skipped']:
+        print(f"{skipped['name']:<28} ⏭️  {skipped['reason']}")
+    print("\nЭтапы задач (среднее время):")
+    for stage, stats in report['stages'].items():
+        print(f"{stage:<28} {stats['sum'] / stats['count']:>10.3f} s  ({stats['count']} раз, {stats['outcomes']})")
+    if args.compare:
+        print(f"\nСравнение с {report['compare']['base_commit'] or args.compare}:")
+        for row in report['compare']['rows']:
+            mark = '✅' if row['better'] else '⚠️ '
+            print(f"{mark} {row['name']:<26} {row['base']:>10.3f} -> {row['value']:.3f} {row['unit']} "
+                  f"({row['change_pct']:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
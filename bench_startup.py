@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Время импорта модулей приложения (python -X importtime)
+
+Замеряет время импорта точек входа и проверяет, что модули без GUI не
+подтягивают тяжелые зависимости (PyQt5, yt_dlp, concurrent.futures): они
+импортируются только при первом использовании. С --check завершается с
+кодом 1 при превышении бюджета или запрещенном импорте.
+
+    python bench_startup.py [--repeat N] [--check] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Точка входа -> модули, которые она не должна импортировать сразу
+FORBIDDEN_IMPORTS = {
+    'downloader_core': ('PyQt5', 'yt_dlp', 'concurrent.futures', 'uuid'),
+    'download_queue': ('PyQt5', 'yt_dlp', 'concurrent.futures', 'uuid'),
+    'batch_download': ('PyQt5', 'yt_dlp', 'concurrent.futures', 'uuid'),
+    'youtube_downloader': ('PyQt5', 'yt_dlp', 'concurrent.futures', 'uuid'),
+    'main': ('yt_dlp',),
+}
+# Бюджет времени импорта (мс) с большим запасом: ловит тяжелые импорты, а не шум
+IMPORT_BUDGET_MS = {
+    'downloader_core': 80,
+    'download_queue': 100,
+    'batch_download': 120,
+    'youtube_downloader': 100,
+    'main': 400,
+}
+
+
+def _child_env() -> Dict[str, str]:
+    # Байткод должен записаться при прогреве, иначе каждый замер включает компиляцию
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return env
+
+
+def parse_importtime(stderr: str, module: str) -> Tuple[Optional[float], List[str]]:
+    """(суммарное время импорта module в мс, имена всех импортированных модулей)"""
+    total = None
+    names = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        if not cumulative.strip().isdigit():
+            continue  # заголовок таблицы
+        name = name.strip()
+        names.append(name)
+        if name == module:
+            total = int(cumulative) / 1000
+    return total, names
+
+
+def measure_import(module: str, repeat: int = 5) -> Dict:
+    """Медиана времени импорта модуля и запрещенные для него импорты"""
+    cmd = [sys.executable, '-X', 'importtime', '-c', f'import {module}']
+    env = _child_env()
+    subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True)  # прогрев: запись байткода
+
+    import_times, wall_times = [], []
+    names: List[str] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+        wall_times.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            return {'module': module, 'error': result.stderr.strip().splitlines()[-1]}
+        total, names = parse_importtime(result.stderr, module)
+        import_times.append(total)
+
+    forbidden = [name for name in FORBIDDEN_IMPORTS.get(module, ()) if name in names]
+    return {
+        'module': module,
+        'import_ms': round(statistics.median(import_times), 1),
+        'wall_ms': round(statistics.median(wall_times), 1),
+        'modules': len(names),
+        'budget_ms': IMPORT_BUDGET_MS.get(module),
+        'forbidden': forbidden,
+    }
+
+
+def check(result: Dict) -> List[str]:
+    """Нарушения для одного замера (пустой список - все в порядке)"""
+    if 'error' in result:
+        return [f"{result['module']}: {result['error']}"]
+    problems = [f"{result['module']}: импортирует {name}" for name in result['forbidden']]
+    if result['budget_ms'] and result['import_ms'] > result['budget_ms']:
+        problems.append(f"{result['module']}: {result['import_ms']} мс > бюджета {result['budget_ms']} мс")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время импорта модулей приложения")
+    parser.add_argument('modules', nargs='*', default=list(FORBIDDEN_IMPORTS))
+    parser.add_argument('--repeat', type=int, default=5, help="повторов на модуль")
+    parser.add_argument('--check', action='store_true', help="код 1 при превышении бюджета или тяжелом импорте")
+    parser.add_argument('--json', action='store_true', help="вывод в формате JSON")
+    args = parser.parse_args()
+
+    results = [measure_import(module, args.repeat) for module in args.modules]
+    problems = [problem for res in results for problem in check(res)]
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print("🏁 Время импорта (python -X importtime, медиана)")
+        print("=" * 60)
+        for res in results:
+            if 'error' in res:
+                print(f"{res['module']:<20} ❌ {res['error']}")
+                continue
+            print(f"{res['module']:<20} {res['import_ms']:>7.1f} мс  (процесс {res['wall_ms']:.0f} мс, "
+                  f"модулей {res['modules']}, бюджет {res['budget_ms']} мс)")
+        for problem in problems:
+            print(f"❌ {problem}")
+
+    if args.check and problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
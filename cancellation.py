@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Отмена задач скачивания
+
+Каждый дочерний процесс (yt-dlp, ffmpeg) запускается в своей группе
+процессов. При отмене группе отправляется мягкий сигнал (SIGTERM,
+CTRL_BREAK_EVENT в Windows), а если она не завершилась за grace_period -
+принудительный (SIGKILL, taskkill /T /F). Движок yt_dlp внутри процесса
+останавливается исключением из progress hook.
+"""
+
+import glob
+import os
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+# Время на корректное завершение после мягкого сигнала (сек)
+GRACE_PERIOD = 3.0
+# Файлы, которые yt-dlp оставляет рядом с недокачанным файлом
+PARTIAL_SUFFIXES = ('.part', '.ytdl')
+
+
+class JobCancelled(Exception):
+    """Задача отменена пользователем"""
+
+
+class JobInterrupted(JobCancelled):
+    """Задача прервана закрытием приложения: временные файлы сохраняются для возобновления"""
+
+
+def process_group_kwargs() -> Dict:
+    """Аргументы Popen для запуска процесса в отдельной группе"""
+    if os.name == 'nt':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def terminate_process_tree(process: subprocess.Popen, grace_period: float = GRACE_PERIOD):
+    """Мягкий сигнал группе процесса, после grace_period - принудительное завершение"""
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == 'nt':
+            process.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            os.killpg(process.pid, signal.SIGTERM)
+            # Приостановленная (pause) группа обработает SIGTERM только после SIGCONT
+            os.killpg(process.pid, signal.SIGCONT)
+    except OSError:
+        pass
+
+    try:
+        process.wait(grace_period)
+        return
+    except subprocess.TimeoutExpired:
+        pass
+
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)], capture_output=True)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    process.wait()
+
+
+class CancelToken:
+    """Флаг отмены задачи, ее дочерние процессы и файлы, которые она пишет
+
+    keep_partial=True (закрытие приложения) сохраняет .part и временные файлы
+    для возобновления, иначе они удаляются.
+    """
+
+    def __init__(self, grace_period: float = GRACE_PERIOD):
+        self.grace_period = grace_period
+        self.keep_partial = False
+        self.requested_at: Optional[float] = None  # time.monotonic() запроса отмены
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = set()
+        self._files = set()
+        self._paused_until: Optional[float] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, keep_partial: bool = False):
+        """Запрос отмены: процессы задачи останавливаются в фоне, вызов не блокируется"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.keep_partial = keep_partial
+            self.requested_at = time.monotonic()
+            self._event.set()
+            processes = list(self._processes)
+        for process in processes:
+            self._terminate_in_background(process)
+
+    def _terminate_in_background(self, process: subprocess.Popen):
+        threading.Thread(target=terminate_process_tree, args=(process, self.grace_period),
+                         daemon=True, name="terminate-process").start()
+
+    def raise_if_cancelled(self):
+        """Исключение отмены, если она запрошена"""
+        if self._event.is_set():
+            raise JobInterrupted() if self.keep_partial else JobCancelled()
+
+    @contextmanager
+    def track(self, process: subprocess.Popen):
+        """Процесс задачи: будет остановлен при отмене (и сразу, если она уже запрошена)"""
+        with self._lock:
+            self._processes.add(process)
+            cancelled = self._event.is_set()
+        if cancelled:
+            self._terminate_in_background(process)
+        try:
+            yield process
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+
+    def pause(self, seconds: float):
+        """Приостановка задачи на seconds (ограничение скорости), прерывается отменой
+
+        Процессы задачи останавливаются SIGSTOP группы и продолжаются SIGCONT.
+        Если пауза уже идет (второй поток задачи), она только продлевается.
+        В Windows процессы не приостанавливаются, ждет только вызывающий поток.
+        """
+        deadline = time.monotonic() + seconds
+        with self._lock:
+            if self._paused_until is not None:
+                self._paused_until = max(self._paused_until, deadline)
+                return
+            self._paused_until = deadline
+            processes = list(self._processes)
+        self._signal_groups(processes, 'SIGSTOP')
+        try:
+            while True:
+                with self._lock:
+                    remaining = self._paused_until - time.monotonic()
+                if remaining <= 0 or self._event.wait(remaining):
+                    break
+        finally:
+            with self._lock:
+                self._paused_until = None
+                processes = list(self._processes)
+            self._signal_groups(processes, 'SIGCONT')
+
+    @staticmethod
+    def _signal_groups(processes, name: str):
+        sig = getattr(signal, name, None)
+        if sig is None or os.name == 'nt':
+            return
+        for process in processes:
+            if process.poll() is None:
+                try:
+                    os.killpg(process.pid, sig)
+                except OSError:
+                    pass
+
+    def add_file(self, path: Optional[str]):
+        """Файл, который пишет задача (для удаления недокачанных частей)"""
+        if path:
+            with self._lock:
+                self._files.add(path)
+
+    def remove_partial_files(self) -> int:
+        """Удаление .part/.ytdl и фрагментов файлов задачи, возвращает число удаленных"""
+        with self._lock:
+            files = list(self._files)
+        removed = 0
+        for path in files:
+            candidates = [path + suffix for suffix in PARTIAL_SUFFIXES]
+            candidates += glob.glob(glob.escape(path) + '.part-Frag*')
+            for candidate in candidates:
+                try:
+                    os.remove(candidate)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Предупреждение: не удалось удалить {candidate}: {e}")
+        return removed
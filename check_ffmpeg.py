@@ -3,51 +3,48 @@
 Проверка установки FFmpeg
 """
 
-import subprocess
+import shutil
 import sys
 
+from tool_probe import probe_ffmpeg
+
+# Мультиплексоры контейнеров, в которые объединяются потоки
+REQUIRED_MUXERS = ('mp4', 'webm', 'matroska')
+
 def check_ffmpeg():
     """Проверка установки FFmpeg"""
     print("🔍 Проверка установки FFmpeg...")
     print("=" * 40)
     
-    try:
-        # Проверяем FFmpeg
-        result = subprocess.run(['ffmpeg', '-version'], 
-                              capture_output=True, text=True, timeout=10)
-        
-        if result.returncode == 0:
-            # Извлекаем версию из вывода
-            version_line = result.stdout.split('\n')[0]
-            print(f"✅ FFmpeg установлен: {version_line}")
-            
-            # Проверяем поддержку AAC кодека
-            codec_result = subprocess.run(['ffmpeg', '-codecs'], 
-                                        capture_output=True, text=True, timeout=10)
-            
-            if 'aac' in codec_result.stdout.lower():
-                print("✅ Поддержка AAC кодека: есть")
-            else:
-                print("⚠️  Поддержка AAC кодека: не найдена")
-            
-            return True
-        else:
-            print("❌ FFmpeg не найден")
-            return False
-            
-    except FileNotFoundError:
+    path = shutil.which('ffmpeg')
+    if not path:
         print("❌ FFmpeg не установлен")
         print("\n💡 Для установки FFmpeg:")
         print("   Windows: https://ffmpeg.org/download.html")
         print("   Linux: sudo apt install ffmpeg")
         print("   macOS: brew install ffmpeg")
         return False
-    except subprocess.TimeoutExpired:
-        print("❌ Таймаут при проверке FFmpeg")
-        return False
-    except Exception as e:
-        print(f"❌ Ошибка: {e}")
+    
+    # Та же проверка, что при запуске приложения (без кэша: всегда свежий результат)
+    info = probe_ffmpeg(path)
+    if info is None:
+        print(f"❌ FFmpeg не запускается: {path}")
         return False
+    print(f"✅ FFmpeg установлен: {info['version_line']}")
+    
+    # Проверяем поддержку AAC кодека
+    if 'aac' in info['codecs']:
+        print("✅ Поддержка AAC кодека: есть")
+    else:
+        print("⚠️  Поддержка AAC кодека: не найдена")
+    
+    missing = [muxer for muxer in REQUIRED_MUXERS if muxer not in info['muxers']]
+    if missing:
+        print(f"⚠️  Нет мультиплексоров: {', '.join(missing)}")
+    else:
+        print(f"✅ Контейнеры: {', '.join(REQUIRED_MUXERS)}")
+    print(f"📦 Кодеков: {len(info['codecs'])}, мультиплексоров: {len(info['muxers'])}")
+    return True
 
 def main():
     print("🎬 Проверка зависимостей для объединения видео...")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Постоянный кэш метаданных видео на диске (SQLite, сжатый JSON)
+
+Кэш общий для GUI, консольной версии и пакетного режима. Запись считается
+свежей, пока не истекли подписанные ссылки на медиа (параметр expire в URL
+форматов). Устаревшую запись можно показать сразу и обновить в фоне.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+# Срок свежести, если в ссылках нет expire, и предельный возраст устаревших записей
+DEFAULT_TTL = 6 * 3600
+MAX_STALE_AGE = 7 * 24 * 3600
+# Запас до истечения ссылок: обновляем чуть раньше
+EXPIRY_MARGIN = 300
+
+_PATH_EXPIRE = re.compile(r'/expire/(\d+)')
+
+
+def default_cache_dir() -> str:
+    """Каталог для кэшей приложения (можно задать через YTDL_CACHE_DIR)"""
+    path = os.environ.get('YTDL_CACHE_DIR')
+    if not path:
+        if sys.platform == 'win32':
+            base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        else:
+            base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        path = os.path.join(base, 'ytdl-downloader')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def media_url_expiry(video_info: Dict) -> Optional[float]:
+    """Ближайший срок истечения подписанных ссылок на медиа (unix time)"""
+    expiry = None
+    for fmt in video_info.get('formats') or []:
+        for key in ('url', 'manifest_url', 'fragment_base_url'):
+            url = fmt.get(key)
+            if not url:
+                continue
+            value = (parse_qs(urlparse(url).query).get('expire') or [None])[0]
+            if value is None:
+                match = _PATH_EXPIRE.search(url)
+                value = match.group(1) if match else None
+            if value and value.isdigit():
+                expiry = int(value) if expiry is None else min(expiry, int(value))
+    return expiry
+
+
+class DiskMetadataCache:
+    """SQLite-хранилище результатов извлечения информации о видео"""
+
+    def __init__(self, path: Optional[str] = None, default_ttl: float = DEFAULT_TTL,
+                 max_stale_age: float = MAX_STALE_AGE):
+        self.path = path or os.path.join(default_cache_dir(), 'metadata.sqlite3')
+        self.default_ttl = default_ttl
+        self.max_stale_age = max_stale_age
+        with self._connect() as conn:
+            # WAL сохраняется в файле базы: читатели не блокируют писателя из другого процесса
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    data BLOB NOT NULL
+                )
+            ''')
+            # Удаляем записи, которые уже не покажем даже как устаревшие
+            conn.execute('DELETE FROM entries WHERE fetched_at < ?', (time.time() - self.max_stale_age,))
+
+    @contextmanager
+    def _connect(self):
+        # Отдельное соединение на операцию: безопасно из любых потоков и процессов
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Tuple[Dict, bool]]:
+        """(информация, свежая ли запись) или None, если записи нет"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT fetched_at, expires_at, data FROM entries WHERE key = ?',
+                               (key,)).fetchone()
+        if row is None:
+            return None
+
+        fetched_at, expires_at, data = row
+        now = time.time()
+        if now - fetched_at > self.max_stale_age:
+            return None
+        try:
+            video_info = json.loads(zlib.decompress(data))
+        except (zlib.error, ValueError):
+            self.delete(key)
+            return None
+        return video_info, now < expires_at
+
+    def put(self, key: str, video_info: Dict):
+        """Сохранение информации; срок свежести - по истечению ссылок на медиа"""
+        now = time.time()
+        expiry = media_url_expiry(video_info)
+        expires_at = expiry - EXPIRY_MARGIN if expiry else now + self.default_ttl
+        data = zlib.compress(json.dumps(video_info, ensure_ascii=False).encode('utf-8'), 6)
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO entries (key, fetched_at, expires_at, data) VALUES (?, ?, ?, ?)',
+                         (key, now, expires_at, data))
+
+    def delete(self, key: str):
+        """Удаление записи"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Очередь загрузок с ограничением числа одновременных задач
+
+Очередь не зависит от PyQt: GUI подписывается на обновления задач через
+on_update (вызывается из рабочих потоков), пакетный режим - так же.
+Ссылки на плейлисты и каналы раскрываются постепенно: скачивание первых
+видео начинается, пока следующие страницы списка еще загружаются.
+С журналом задач (job_journal.py) незавершенные задачи возобновляются
+после перезапуска с теми же временными файлами.
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from cancellation import CancelToken, JobCancelled
+from downloader_core import error_class
+from format_selector import parse_policy, select_format
+from job_journal import PHASE_EVENTS
+from library import policy_selection
+from metadata_cache import is_playlist_url
+
+
+# Состояния задачи
+JOB_STATES = ('queued', 'running', 'done', 'error', 'cancelled')
+
+# Вложенность плейлистов при раскрытии (канал -> вкладка -> плейлист)
+MAX_PLAYLIST_DEPTH = 2
+
+_URL_RE = re.compile(r'https?://\S+')
+
+
+def parse_url_list(text: str) -> List[str]:
+    """Ссылки из вставленного текста или файла: по одной в строке, # - комментарий"""
+    urls = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        # Строка без схемы (youtu.be/..., ID видео) берется целиком, если в ней нет пробелов
+        found = _URL_RE.findall(line) or ([line] if ' ' not in line else [])
+        for url in found:
+            if url not in urls:
+                urls.append(url)
+    return urls
+
+
+class DownloadJob:
+    """Одна задача очереди"""
+
+    def __init__(self, job_id: int, url: str, output_dir: str,
+                 format_id: Optional[str] = None, policy: str = 'best', key: Optional[str] = None,
+                 fragments: int = 1, use_aria2c: bool = False, rate_cap: Optional[int] = None):
+        self.job_id = job_id
+        self.key = key or os.urandom(6).hex()  # ключ в журнале и в именах временных файлов
+        self.url = url
+        self.output_dir = output_dir
+        self.format_id = format_id
+        self.policy = policy
+        # Ключ в библиотеке загрузок: формат, заданный при добавлении, или политика
+        self.selection = format_id or policy_selection(policy)
+        self.fragments = fragments  # одновременно скачиваемых фрагментов (соединений aria2c)
+        self.use_aria2c = use_aria2c
+        self.rate_cap = rate_cap  # ограничение скорости задачи (байт/с) внутри общего лимита, 0 - без него
+        self.state = 'queued'
+        self.title = None
+        self.phase = None
+        self.percent = None
+        self.last_event = None
+        self.result = None
+        self.error = None
+        self.error_class = None
+        self.timings: Dict[str, float] = {}  # длительность этапов: info, download, merge (сек)
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_token = CancelToken()
+
+    def snapshot(self) -> Dict:
+        """Копия состояния задачи для передачи в другой поток"""
+        return {
+            'job_id': self.job_id,
+            'key': self.key,
+            'url': self.url,
+            'output_dir': self.output_dir,
+            'format_id': self.format_id,
+            'policy': self.policy,
+            'selection': self.selection,
+            'fragments': self.fragments,
+            'use_aria2c': self.use_aria2c,
+            'rate_cap': self.rate_cap,
+            'state': self.state,
+            'title': self.title,
+            'phase': self.phase,
+            'percent': self.percent,
+            'event': dict(self.last_event) if self.last_event else None,
+            'result': self.result,
+            'error': self.error,
+            'error_class': self.error_class,
+            'timings': dict(self.timings),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class DownloadQueue:
+    """Очередь задач, выполняемых не более чем max_workers одновременно
+
+    Каждая задача выполняется в своем потоке, новые потоки запускаются по мере
+    освобождения мест, поэтому лимит можно менять на ходу. При раскрытии
+    плейлиста в ожидании держится не больше max_pending задач, остальные
+    элементы списка читаются по мере освобождения очереди. При keep_finished=False
+    завершенные задачи забываются после последнего обновления (пакетный режим).
+    С journal каждое изменение задачи записывается в журнал. fragments,
+    use_aria2c и rate_cap - параметры скачивания для новых задач (их можно
+    менять на ходу). С skip_existing задачи, файл которых уже есть в библиотеке
+    загрузок, завершаются без получения информации о видео (result['skipped']).
+    """
+
+    # Минимальный интервал между обновлениями прогресса одной задачи (сек)
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, downloader, max_workers: int = 2,
+                 on_update: Optional[Callable[[Dict], None]] = None,
+                 max_pending: int = 100, keep_finished: bool = True, journal=None,
+                 fragments: int = 1, use_aria2c: bool = False, rate_cap: Optional[int] = None,
+                 skip_existing: bool = True):
+        self.downloader = downloader
+        self.max_workers = max(1, max_workers)
+        self.on_update = on_update
+        self.max_pending = max(1, max_pending)
+        self.keep_finished = keep_finished
+        self.journal = journal
+        self.fragments = fragments
+        self.use_aria2c = use_aria2c
+        self.rate_cap = rate_cap
+        self.skip_existing = skip_existing
+        self._shutting_down = False
+        self._jobs: Dict[int, DownloadJob] = {}
+        self._pending: List[int] = []
+        self._running = 0
+        self._expansions = set()  # события остановки для раскрываемых плейлистов
+        self._next_id = 1
+        self._cond = threading.Condition()
+
+    def _new_job_locked(self, url: str, output_dir: str, format_id: Optional[str], policy: str,
+                        key: Optional[str] = None, fragments: Optional[int] = None,
+                        use_aria2c: Optional[bool] = None, rate_cap: Optional[int] = None) -> DownloadJob:
+        job = DownloadJob(self._next_id, url, output_dir, format_id, policy, key,
+                          self.fragments if fragments is None else fragments,
+                          self.use_aria2c if use_aria2c is None else use_aria2c,
+                          self.rate_cap if rate_cap is None else rate_cap)
+        self._next_id += 1
+        self._jobs[job.job_id] = job
+        return job
+
+    def add(self, url: str, output_dir: str = ".", format_id: Optional[str] = None,
+            policy: str = 'best', title: Optional[str] = None,
+            fragments: Optional[int] = None, use_aria2c: Optional[bool] = None,
+            rate_cap: Optional[int] = None) -> int:
+        """Добавление задачи, возвращает ее номер
+
+        fragments, use_aria2c и rate_cap по умолчанию берутся из текущих настроек очереди;
+        rate_cap=0 - задача без ограничения скорости, даже если оно задано для очереди.
+        """
+        with self._cond:
+            job = self._new_job_locked(url, output_dir, format_id, policy, fragments=fragments,
+                                       use_aria2c=use_aria2c, rate_cap=rate_cap)
+            job.title = title
+            self._pending.append(job.job_id)
+        self._record(job, 'queued', url=url, output_dir=output_dir, format_id=format_id,
+                     policy=policy, title=title, fragments=job.fragments, use_aria2c=job.use_aria2c,
+                     rate_cap=job.rate_cap)
+        self._notify(job)
+        self._start_pending()
+        return job.job_id
+
+    def resume_unfinished(self) -> int:
+        """Возвращает в очередь незавершенные задачи из журнала, возвращает их число
+
+        Задача, у которой объединение уже записано и итоговый файл на месте,
+        только отмечается завершенной.
+        """
+        if not self.journal:
+            return 0
+        resumed = []
+        for state in self.journal.unfinished():
+            final_file = state.get('final_file')
+            if state['last_event'] == 'merged' and final_file and os.path.exists(final_file):
+                self.journal.record(state['key'], 'done', final_file=final_file)
+                continue
+            with self._cond:
+                job = self._new_job_locked(state['url'], state['output_dir'], state.get('format_id'),
+                                           state.get('policy', 'best'), state['key'],
+                                           state.get('fragments'), state.get('use_aria2c'),
+                                           state.get('rate_cap'))
+                job.title = state.get('title')
+                self._pending.append(job.job_id)
+            resumed.append(job)
+        for job in resumed:
+            self._notify(job)
+        self._start_pending()
+        return len(resumed)
+
+    def add_many(self, urls: Iterable[str], output_dir: str = ".", policy: str = 'best') -> List[int]:
+        """Добавление нескольких ссылок с одной политикой выбора формата
+
+        Плейлисты и каналы раскрываются в фоне, возвращаются номера задач
+        только для ссылок на отдельные видео.
+        """
+        job_ids = []
+        for url in urls:
+            if is_playlist_url(url):
+                self.add_playlist(url, output_dir, policy)
+            else:
+                job_ids.append(self.add(url, output_dir, policy=policy))
+        return job_ids
+
+    def add_playlist(self, url: str, output_dir: str = ".", policy: str = 'best'):
+        """Постепенное добавление видео плейлиста или канала в очередь"""
+        stop = threading.Event()
+        with self._cond:
+            self._expansions.add(stop)
+        threading.Thread(target=self._expand_playlist, args=(url, output_dir, policy, stop),
+                         daemon=True, name="playlist-expand").start()
+
+    def _expand_playlist(self, url: str, output_dir: str, policy: str, stop: threading.Event):
+        try:
+            self._add_entries(url, output_dir, policy, stop, depth=0)
+        except Exception as e:
+            # Ошибка получения списка - отдельная задача с ошибкой, чтобы ее было видно
+            with self._cond:
+                job = self._new_job_locked(url, output_dir, None, policy)
+                job.state = 'error'
+                job.error = str(e)
+                job.error_class = error_class(e)
+                job.finished_at = time.time()
+            self._notify(job)
+            self._forget(job)
+        finally:
+            with self._cond:
+                self._expansions.discard(stop)
+                self._cond.notify_all()
+
+    def _add_entries(self, url: str, output_dir: str, policy: str, stop: threading.Event, depth: int):
+        entries = self.downloader.iter_playlist(url)
+        try:
+            for entry in entries:
+                if stop.is_set():
+                    return
+                if is_playlist_url(entry['url']):
+                    if depth < MAX_PLAYLIST_DEPTH:
+                        self._add_entries(entry['url'], output_dir, policy, stop, depth + 1)
+                    continue
+                # Следующий элемент читаем, только когда в очереди есть место
+                with self._cond:
+                    self._cond.wait_for(lambda: len(self._pending) < self.max_pending or stop.is_set())
+                if stop.is_set():
+                    return
+                self.add(entry['url'], output_dir, policy=policy, title=entry['title'])
+        finally:
+            # Закрытие генератора останавливает чтение списка (и процесс yt-dlp)
+            entries.close()
+
+    def set_max_workers(self, max_workers: int):
+        """Изменение лимита одновременных задач (уже запущенные не прерываются)"""
+        with self._cond:
+            self.max_workers = max(1, max_workers)
+        self._start_pending()
+
+    def cancel(self, job_id: int):
+        """Отмена задачи: ожидающая снимается сразу, у выполняемой останавливаются процессы
+
+        Вызов не блокируется; время от запроса до завершения задачи
+        записывается в timings['cancel'].
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state not in ('queued', 'running'):
+                return
+            job.cancel_token.cancel()
+            if job.state != 'queued':
+                return
+            self._pending.remove(job_id)
+            job.state = 'cancelled'
+            job.finished_at = time.time()
+            self._cond.notify_all()
+        self._record(job, 'cancelled')
+        self._notify(job)
+        self._forget(job)
+
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """Остановка при закрытии приложения: задачи прерываются без записи в журнал
+
+        В журнале они остаются незавершенными, а временные файлы сохраняются,
+        поэтому при следующем запуске задачи продолжаются с того же места.
+        """
+        with self._cond:
+            self._shutting_down = True
+            for stop in self._expansions:
+                stop.set()
+            self._pending.clear()
+            for job in self._jobs.values():
+                job.cancel_token.cancel(keep_partial=True)
+            self._cond.notify_all()
+        return self.wait(timeout)
+
+    def cancel_all(self):
+        """Отмена всех незавершенных задач и раскрытия плейлистов"""
+        with self._cond:
+            for stop in self._expansions:
+                stop.set()
+            self._cond.notify_all()
+            job_ids = list(self._jobs)
+        for job_id in job_ids:
+            self.cancel(job_id)
+
+    def jobs(self) -> List[Dict]:
+        """Состояние всех задач в порядке добавления"""
+        with self._cond:
+            return [job.snapshot() for job in self._jobs.values()]
+
+    def active_count(self) -> int:
+        """Число ожидающих и выполняемых задач и раскрываемых плейлистов"""
+        with self._cond:
+            return len(self._pending) + self._running + len(self._expansions)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Ожидание завершения всех задач, False - если истек timeout"""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._pending and not self._running and not self._expansions, timeout)
+
+    def _notify(self, job: DownloadJob):
+        if self.on_update:
+            self.on_update(job.snapshot())
+
+    def _record(self, job: DownloadJob, event: str, **data):
+        if not self.journal:
+            return
+        try:
+            self.journal.record(job.key, event, **data)
+        except OSError as e:
+            print(f"⚠️  Предупреждение: не удалось записать журнал задач: {e}")
+
+    def _forget(self, job: DownloadJob):
+        if not self.keep_finished:
+            with self._cond:
+                self._jobs.pop(job.job_id, None)
+
+    def _start_pending(self):
+        with self._cond:
+            started = []
+            while self._pending and self._running < self.max_workers:
+                job = self._jobs[self._pending.pop(0)]
+                job.state = 'running'
+                job.started_at = time.time()
+                self._running += 1
+                started.append(job)
+        for job in started:
+            self._notify(job)
+            threading.Thread(target=self._run_job, args=(job,), daemon=True,
+                             name=f"download-job-{job.job_id}").start()
+
+    def _download(self, job: DownloadJob, on_progress: Callable[[Dict], None]) -> Dict:
+        """Получение информации, выбор формата и скачивание задачи"""
+        stage_start = time.perf_counter()
+        video_info = self.downloader.get_video_info(job.url, cancel_token=job.cancel_token)
+        job.timings['info'] = time.perf_counter() - stage_start
+        job.title = video_info.get('title')
+        if not job.format_id:
+            formats = self.downloader.formats_from_info(video_info)
+            job.format_id = select_format(formats, job.policy, self.downloader.ffmpeg_available,
+                                          video_info.get('duration'))
+            if not job.format_id:
+                raise RuntimeError("Не найден подходящий формат")
+        # Формат фиксируется в журнале: возобновленная задача докачает те же потоки
+        self._record(job, 'started', format_id=job.format_id, title=job.title)
+        self._notify(job)
+        job.cancel_token.raise_if_cancelled()
+
+        os.makedirs(job.output_dir, exist_ok=True)
+        stage_start = time.perf_counter()
+        # container= из политики задает контейнер итогового файла при объединении
+        result = self.downloader.download_video(job.url, job.format_id, job.output_dir,
+                                                progress_callback=on_progress, job_key=job.key,
+                                                cancel_token=job.cancel_token, fragments=job.fragments,
+                                                use_aria2c=job.use_aria2c, rate_cap=job.rate_cap or None,
+                                                selection=job.selection, force=not self.skip_existing,
+                                                container=parse_policy(job.policy).container)
+        job.timings['download'] = time.perf_counter() - stage_start
+        if result.get('merge_time') is not None:
+            job.timings['merge'] = result['merge_time']
+        return result
+
+    def _run_job(self, job: DownloadJob):
+        last_progress = [0.0]
+
+        def on_progress(event: Dict):
+            job.cancel_token.raise_if_cancelled()
+            if event.get('status') == 'finished' and event.get('phase') in PHASE_EVENTS:
+                extra = {'final_file': event['final_file']} if event.get('final_file') else {}
+                self._record(job, PHASE_EVENTS[event['phase']], **extra)
+            job.phase = event.get('phase', job.phase)
+            if event.get('overall_percent') is not None:
+                job.percent = event['overall_percent']
+            job.last_event = event
+            # Промежуточные события прореживаем, смену статуса передаем всегда
+            if event.get('status') in ('downloading', 'processing'):
+                now = time.monotonic()
+                if now - last_progress[0] < self.PROGRESS_INTERVAL:
+                    return
+                last_progress[0] = now
+            self._notify(job)
+
+        try:
+            # Повторно отправленное видео: файл уже скачан, ссылка даже не открывается
+            existing = self.downloader.library_lookup(job.url, job.selection, job.output_dir) \
+                if self.skip_existing else None
+            job.result = existing or self._download(job, on_progress)
+            if job.result['success']:
+                job.state = 'done'
+                job.percent = 100.0
+            else:
+                job.state = 'error'
+                job.error = job.result['message']
+                job.error_class = job.result.get('error_class', 'RuntimeError')
+        except JobCancelled:
+            job.state = 'cancelled'
+        except Exception as e:
+            if job.cancel_token.cancelled:
+                # Ошибка остановленного процесса - следствие отмены
+                job.state = 'cancelled'
+            else:
+                job.state = 'error'
+                job.error = str(e)
+                job.error_class = error_class(e)
+
+        job.finished_at = time.time()
+        if job.state == 'cancelled' and job.cancel_token.requested_at is not None:
+            job.timings['cancel'] = time.monotonic() - job.cancel_token.requested_at
+        if job.state == 'done':
+            self._record(job, 'done', final_file=job.result.get('final_file'))
+        elif job.state == 'error':
+            self._record(job, 'error', error=job.error, error_class=job.error_class)
+        elif not self._shutting_down:
+            self._record(job, 'cancelled')
+        self._notify(job)
+        self._forget(job)
+        with self._cond:
+            self._running -= 1
+            self._cond.notify_all()
+        self._start_pending()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Сканер папки загрузок: скачанные файлы и оставшиеся временные файлы
+
+Папка обходится рекурсивно через os.scandir. Содержимое каждого каталога
+(имя, размер и время изменения медиа и временных файлов, подкаталоги)
+сохраняется в кэше (SQLite) вместе со временем изменения каталога; при
+повторном запуске перечитываются только каталоги, время изменения которых
+поменялось (добавлены, удалены или переименованы файлы), остальные берутся
+из кэша одним os.stat на каталог. Файл, дописанный на месте без изменения
+списка файлов каталога, виден с прежним размером до следующего изменения каталога.
+
+Временные файлы - потоки задач (temp_video_*, temp_audio_*), недокачанные
+.part и состояние фрагментов yt-dlp (.ytdl), а также все файлы в каталоге
+задач .ytdl-staging. Их объем показывается как место, которое можно освободить.
+"""
+
+import json
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from disk_cache import default_cache_dir
+from staging import STAGING_DIR_NAME
+
+
+MEDIA_EXTENSIONS = ('.mp4', '.mkv', '.webm', '.avi', '.mov', '.flv', '.m4a', '.mp3', '.opus')
+TEMP_PREFIXES = ('temp_video_', 'temp_audio_')
+TEMP_MARKERS = ('.part', '.ytdl')
+# Каталог, измененный за это время до сканирования, может измениться еще раз в пределах
+# той же отметки времени файловой системы: такой каталог перечитывается в следующий раз
+RACY_WINDOW = 2.0
+
+
+def is_temp_file(name: str) -> bool:
+    """Временный файл задачи: поток до объединения, .part (в том числе .part-FragN) или .ytdl"""
+    return name.startswith(TEMP_PREFIXES) or any(marker in name for marker in TEMP_MARKERS)
+
+
+def is_media_file(name: str) -> bool:
+    """Видео или аудио файл по расширению (без учета регистра)"""
+    return os.path.splitext(name)[1].lower() in MEDIA_EXTENSIONS
+
+
+class DownloadScanner:
+    """Рекурсивный обход папки загрузок с кэшем содержимого каталогов"""
+
+    def __init__(self, cache_path: Optional[str] = None):
+        self.cache_path = cache_path or os.path.join(default_cache_dir(), 'scan.sqlite3')
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS dirs (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    entries BLOB NOT NULL
+                )
+            ''')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.cache_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _subtree(root: str) -> Tuple[str, str, str]:
+        # root и каталоги внутри него (root + разделитель + ...): диапазон строк по индексу первичного ключа
+        prefix = os.path.join(root, '')
+        return root, prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    def _load(self, root: str) -> Dict[str, Tuple[int, bytes]]:
+        with self._connect() as conn:
+            rows = conn.execute('SELECT path, mtime_ns, entries FROM dirs WHERE path = ? OR (path >= ? AND path < ?)',
+                                self._subtree(root)).fetchall()
+        return {path: (mtime_ns, entries) for path, mtime_ns, entries in rows}
+
+    @staticmethod
+    def _read_dir(path: str, in_staging: bool) -> Dict:
+        """Медиа и временные файлы (имя, размер, время изменения) и подкаталоги одного каталога
+
+        Остальные файлы в кэш не попадают: повторный обход не разбирает имена заново.
+        """
+        media, temp, dirs = [], [], []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                        continue
+                    if in_staging or is_temp_file(entry.name):
+                        target = temp
+                    elif is_media_file(entry.name):
+                        target = media
+                    else:
+                        continue
+                    if entry.is_file():
+                        stat = entry.stat()
+                        target.append((entry.name, stat.st_size, stat.st_mtime))
+                except OSError:
+                    continue  # файл удален во время обхода
+        return {'media': media, 'temp': temp, 'dirs': dirs}
+
+    def scan(self, root: str = '.', use_cache: bool = True) -> Dict:
+        """Медиа и временные файлы в root и вложенных каталогах
+
+        Возвращает media и temp (списки path, size, mtime, новые первыми), их
+        общий объем (media_bytes, reclaimable_bytes) и статистику обхода:
+        dirs - всего каталогов, rescanned - перечитанных, elapsed - время (сек).
+        """
+        start = time.perf_counter()
+        root = os.path.abspath(root)
+        cached = self._load(root) if use_cache else {}
+        updates, seen = [], set()
+        media, temp = [], []
+        now_ns = time.time_ns()
+        stack = [(root, False)]
+        while stack:
+            path, in_staging = stack.pop()
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            seen.add(path)
+            entry = cached.get(path)
+            if entry and entry[0] == mtime_ns:
+                listing = json.loads(zlib.decompress(entry[1]))
+            else:
+                try:
+                    listing = self._read_dir(path, in_staging)
+                except OSError:
+                    continue
+                racy = now_ns - mtime_ns < RACY_WINDOW * 1e9
+                updates.append((path, -1 if racy else mtime_ns,
+                                zlib.compress(json.dumps(listing, ensure_ascii=False).encode('utf-8'), 1)))
+
+            prefix = os.path.join(path, '')
+            media.extend({'path': prefix + name, 'size': size, 'mtime': mtime}
+                         for name, size, mtime in listing['media'])
+            temp.extend({'path': prefix + name, 'size': size, 'mtime': mtime}
+                        for name, size, mtime in listing['temp'])
+            for name in listing['dirs']:
+                stack.append((prefix + name, in_staging or name == STAGING_DIR_NAME))
+
+        removed = [(path,) for path in cached if path not in seen]
+        if updates or removed:
+            with self._connect() as conn:
+                conn.executemany('INSERT OR REPLACE INTO dirs (path, mtime_ns, entries) VALUES (?, ?, ?)', updates)
+                conn.executemany('DELETE FROM dirs WHERE path = ?', removed)
+
+        media.sort(key=lambda item: item['mtime'], reverse=True)
+        temp.sort(key=lambda item: item['mtime'], reverse=True)
+        return {
+            'root': root,
+            'media': media,
+            'temp': temp,
+            'media_bytes': sum(item['size'] for item in media),
+            'reclaimable_bytes': sum(item['size'] for item in temp),
+            'dirs': len(seen),
+            'rescanned': len(updates),
+            'elapsed': time.perf_counter() - start,
+        }
+
+    def forget(self, root: str):
+        """Удаляет кэш каталогов root (следующий обход перечитает все)"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)',
+                         self._subtree(os.path.abspath(root)))
+
+
+def format_size(size_bytes: int) -> str:
+    """Размер в KB, MB или GB"""
+    if size_bytes > 1024 * 1024 * 1024:
+        return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
+    if size_bytes > 1024 * 1024:
+        return f"{size_bytes / (1024 * 1024):.1f} MB"
+    return f"{size_bytes / 1024:.1f} KB"
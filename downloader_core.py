@@ -0,0 +1,1127 @@
+#!/usr/bin/env python3
+"""
+Загрузчик YouTube без GUI: общий для окна (main.py), консольной версии и пакетного режима
+
+Модуль не импортирует PyQt, поэтому пакетный режим работает на серверах без дисплея.
+"""
+
+import os
+import subprocess
+import re
+import json
+import glob
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from bandwidth import BandwidthGovernor, JobBandwidth
+from cancellation import CancelToken, JobCancelled, JobInterrupted
+from disk_cache import DiskMetadataCache
+from engines import BACKENDS, MAX_FRAGMENTS, EngineError, InProcessEngine, SubprocessEngine, TransferSettings
+from format_model import FormatList
+from format_selector import FormatQuery, estimate_format_size, pick_audio, split_format_id
+from library import LibraryIndex
+from merge_planner import DEFAULT_CONTAINERS, MergePlan, codec_family, describe_plan, plan_merge, probe_codec
+from metadata_cache import MetadataCache, extract_video_id
+from metrics import StageMetrics, default_metrics
+from progress import FFmpegProgressParser, run_with_progress
+from staging import JobStaging
+from tool_probe import probe_tools
+
+
+# Названия этапов задачи для сообщений о прогрессе
+STREAM_LABELS = {
+    'video': 'видео',
+    'audio': 'аудио',
+    'merge': 'объединение',
+}
+
+
+def error_class(error: BaseException) -> str:
+    """Имя класса исходной ошибки (по цепочке исключений, из которых она возникла)"""
+    while (error.__cause__ or error.__context__) is not None:
+        error = error.__cause__ or error.__context__
+    return type(error).__name__
+
+
+class YouTubeDownloader:
+    """Класс для скачивания видео с YouTube используя yt-dlp"""
+    
+    def __init__(self, backend: Optional[str] = None, tools: Optional[Dict] = None,
+                 metrics: Optional[StageMetrics] = None):
+        # Длительность, объем и исход этапов задач (YTDL_METRICS_LOG, YTDL_METRICS_FILE, YTDL_METRICS_PORT)
+        self.metrics = metrics or default_metrics()
+        
+        # Движок выбирается аргументом или переменной окружения YTDL_BACKEND
+        backend = backend or os.environ.get('YTDL_BACKEND', 'subprocess')
+        if backend not in BACKENDS:
+            raise RuntimeError(f"Неизвестный движок yt-dlp: {backend} (доступны: {', '.join(BACKENDS)})")
+        
+        # yt-dlp, FFmpeg и aria2c: при повторных запусках берутся из кэша проверки без запуска процессов
+        self.tools = tools or probe_tools(need_ytdlp=backend != 'inprocess', metrics=self.metrics)
+        
+        if backend == 'inprocess':
+            try:
+                self.engine = InProcessEngine()
+            except ImportError:
+                raise RuntimeError("Модуль yt_dlp не найден! Установите его: pip install yt-dlp")
+            self.ytdlp_path = None
+        else:
+            if not self.tools['ytdlp']:
+                raise RuntimeError("yt-dlp не найден! Установите его: pip install yt-dlp")
+            self.ytdlp_path = self.tools['ytdlp']['command']
+            self.engine = SubprocessEngine(self.ytdlp_path)
+        
+        # Общий кэш метаданных для InfoThread, размеров и скачивания
+        self.metadata_cache = MetadataCache()
+        
+        # Постоянный кэш на диске (отключается через YTDL_DISK_CACHE=0)
+        self.disk_cache = None
+        if os.environ.get('YTDL_DISK_CACHE', '1') != '0':
+            try:
+                self.disk_cache = DiskMetadataCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️  Предупреждение: кэш на диске недоступен: {e}")
+        # Устаревшая запись: в GUI возвращается сразу и обновляется в фоне, в консоли
+        # и пакетном режиме запрашивается заново (фоновый поток не переживет выход)
+        self.refresh_in_background = False
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        
+        # Библиотека скачанных файлов: повторно отправленное не скачивается (отключается через YTDL_LIBRARY=0)
+        self.library = None
+        if os.environ.get('YTDL_LIBRARY', '1') != '0':
+            try:
+                self.library = LibraryIndex()
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️  Предупреждение: библиотека загрузок недоступна: {e}")
+        
+        # FFmpeg: версия, кодеки и мультиплексоры (None, если не найден)
+        self.ffmpeg_info = self.tools['ffmpeg']
+        self.ffmpeg_available = self.ffmpeg_info is not None
+        if not self.ffmpeg_available:
+            print("⚠️  Предупреждение: FFmpeg не найден. Video-only форматы могут не объединяться.")
+        
+        # Необязательный загрузчик с несколькими соединениями на файл
+        self.aria2c_path = self.tools['aria2c']
+        
+        # Общий лимит скорости всех задач (YTDL_BANDWIDTH_LIMIT, YTDL_BANDWIDTH_PROFILE)
+        self.bandwidth = BandwidthGovernor.from_env()
+        
+        # Объединение video-only форматов без временных файлов: потоки идут в FFmpeg по каналам
+        self.stream_merge = os.environ.get('YTDL_STREAM_MERGE', '0') == '1'
+        
+        # Промежуточный каталог задач (None - .ytdl-staging в папке загрузок), см. staging.py
+        self.staging_dir = os.environ.get('YTDL_STAGING_DIR') or None
+    
+    def transfer_settings(self, fragments: int = 1, use_aria2c: bool = False,
+                          bandwidth: Optional[JobBandwidth] = None) -> TransferSettings:
+        """Параметры скачивания задачи; aria2c используется, только если он установлен"""
+        fragments = min(max(int(fragments), 1), MAX_FRAGMENTS)
+        external = None
+        if use_aria2c:
+            if self.aria2c_path:
+                external = self.aria2c_path
+            else:
+                print("⚠️  aria2c не найден, используется встроенный загрузчик yt-dlp")
+        return TransferSettings(fragments, external, bandwidth)
+    
+    def get_video_info(self, url: str, cancel_token: Optional[CancelToken] = None) -> Dict:
+        """Получение информации о видео (через общий кэш метаданных)"""
+        return self.metadata_cache.get_or_load(extract_video_id(url),
+                                               lambda: self._load_video_info(url, cancel_token))
+    
+    def iter_playlist(self, url: str) -> Iterator[Dict]:
+        """Видео плейлиста или канала по мере получения страниц (url, id, title, duration)"""
+        entries = self.engine.iter_playlist(url)
+        try:
+            yield from entries
+        except EngineError as e:
+            raise RuntimeError(f"Ошибка получения списка видео: {e}") from e
+        finally:
+            entries.close()
+    
+    def cache_stats(self) -> Dict:
+        """Счетчики попаданий и промахов кэша метаданных"""
+        return self.metadata_cache.stats()
+    
+    def _load_video_info(self, url: str, cancel_token: Optional[CancelToken] = None) -> Dict:
+        """Информация из кэша на диске, при его отсутствии - из yt-dlp
+        
+        Устаревшая запись при refresh_in_background возвращается сразу, а
+        обновление идет в фоне (GUI: окно не ждет yt-dlp, процесс работает
+        дальше). Иначе запись запрашивается заново: просроченные ссылки не
+        попадают в скачивание.
+        """
+        key = extract_video_id(url)
+        cached = self._disk_cache_get(key)
+        if cached is not None:
+            video_info, fresh = cached
+            if fresh:
+                return video_info
+            if self.refresh_in_background:
+                self._refresh_in_background(url, key)
+                return video_info
+        
+        video_info = self._extract_video_info(url, cancel_token)
+        self._disk_cache_put(key, video_info)
+        return video_info
+    
+    def _disk_cache_get(self, key: str):
+        if not self.disk_cache:
+            return None
+        try:
+            return self.disk_cache.get(key)
+        except sqlite3.Error as e:
+            print(f"⚠️  Ошибка чтения кэша на диске: {e}")
+            return None
+    
+    def _disk_cache_put(self, key: str, video_info: Dict):
+        if not self.disk_cache:
+            return
+        try:
+            self.disk_cache.put(key, video_info)
+        except sqlite3.Error as e:
+            print(f"⚠️  Ошибка записи кэша на диске: {e}")
+    
+    def _refresh_in_background(self, url: str, key: str):
+        """Фоновое обновление устаревшей записи (не более одного на ключ)"""
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        
+        def refresh():
+            try:
+                video_info = self._extract_video_info(url)
+                self._disk_cache_put(key, video_info)
+                self.metadata_cache.put(key, video_info)
+            except RuntimeError as e:
+                print(f"⚠️  Не удалось обновить информацию о видео: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+        
+        threading.Thread(target=refresh, daemon=True).start()
+    
+    def _extract_video_info(self, url: str, cancel_token: Optional[CancelToken] = None) -> Dict:
+        """Извлечение информации о видео через yt-dlp"""
+        try:
+            with self.metrics.span('info', video_id=extract_video_id(url), engine=self.engine.name):
+                return self.engine.extract_info(url, timeout=60, cancel_token=cancel_token)
+        except EngineError as e:
+            error_msg = str(e)
+            if "Video unavailable" in error_msg:
+                raise RuntimeError("Видео недоступно или приватное")
+            elif "Private video" in error_msg:
+                raise RuntimeError("Видео приватное")
+            elif "HTTP Error 403" in error_msg:
+                raise RuntimeError("Доступ запрещен (403). Попробуйте другую ссылку")
+            elif "HTTP Error 404" in error_msg:
+                raise RuntimeError("Видео не найдено (404)")
+            else:
+                raise RuntimeError(f"Ошибка получения информации: {error_msg}")
+        except subprocess.TimeoutExpired:
+            raise RuntimeError("Таймаут при получении информации о видео (60 сек). Проверьте интернет-соединение")
+        except json.JSONDecodeError as e:
+            raise RuntimeError(f"Ошибка парсинга JSON: {e}")
+        except FileNotFoundError:
+            raise RuntimeError("yt-dlp не найден в системе")
+    
+    def get_format_size(self, url: str, format_id: str) -> str:
+        """Получение размера файла для конкретного формата (из уже полученной информации)"""
+        try:
+            video_info = self.get_video_info(url)
+            formats = self.formats_from_info(video_info)
+            return self.describe_size(self.estimate_download_size(formats, format_id, video_info.get('duration')))
+        except Exception:
+            return "Размер неизвестен"
+    
+    @staticmethod
+    def estimate_format_size(fmt: Dict, duration: Optional[float]) -> Tuple[Optional[int], bool]:
+        """Размер одного формата: (байты, точный ли размер), см. format_selector.estimate_format_size"""
+        return estimate_format_size(fmt, duration)
+    
+    def estimate_download_size(self, formats: List[Dict], format_id: str,
+                               duration: Optional[float]) -> Tuple[Optional[int], bool]:
+        """Итоговый размер скачивания: для video-only - видео плюс выбранная аудиодорожка
+        
+        format_id - ID формата или пара "видео+аудио" (результат select_format).
+        """
+        formats = FormatList.of(formats)
+        video_id, audio_id = split_format_id(format_id)
+        selected_format = formats.by_id(video_id)
+        if not selected_format:
+            return None, False
+        
+        size, exact = self.estimate_format_size(selected_format, duration)
+        if size is None or not selected_format['is_video_only']:
+            return size, exact
+        
+        if audio_id:
+            audio = formats.by_id(audio_id)
+        else:
+            audio = pick_audio(formats, selected_format, duration=duration)
+        if not audio:
+            return size, exact
+        audio_size, audio_exact = self.estimate_format_size(audio, duration)
+        if audio_size is None:
+            return None, False
+        return size + audio_size, exact and audio_exact
+    
+    def describe_size(self, estimate: Tuple[Optional[int], bool]) -> str:
+        """Строка размера, оценочный размер помечается знаком ~"""
+        size, exact = estimate
+        if size is None:
+            return "Размер неизвестен"
+        return self._format_file_size(size) if exact else f"~{self._format_file_size(size)}"
+    
+    def _format_file_size(self, size_bytes: int) -> str:
+        """Форматирование размера файла"""
+        if size_bytes is None:
+            return "Размер неизвестен"
+        
+        if size_bytes >= 1024 * 1024 * 1024:  # GB
+            return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
+        elif size_bytes >= 1024 * 1024:  # MB
+            return f"{size_bytes / (1024 * 1024):.1f} MB"
+        elif size_bytes >= 1024:  # KB
+            return f"{size_bytes / 1024:.1f} KB"
+        else:
+            return f"{size_bytes} байт"
+    
+    def get_available_formats(self, url: str) -> FormatList:
+        """Получение доступных форматов видео"""
+        video_info = self.get_video_info(url)
+        with self.metrics.span('formats', video_id=video_info.get('id')) as span:
+            formats = self.formats_from_info(video_info)
+            span.labels['count'] = len(formats)
+        return formats
+    
+    @staticmethod
+    def formats_from_info(video_info: Dict) -> FormatList:
+        """Список форматов из массива formats в JSON-информации о видео
+        
+        Форматы - записи MediaFormat (доступ и по ключу, как к словарю) с индексами
+        по ID и по типу, см. format_model.py.
+        """
+        return FormatList.from_info(video_info)
+    
+    def download_video(self, url: str, format_id: str, output_dir: str = ".",
+                       progress_callback: Optional[Callable[[Dict], None]] = None,
+                       job_key: Optional[str] = None, cancel_token: Optional[CancelToken] = None,
+                       fragments: int = 1, use_aria2c: bool = False, rate_cap: Optional[int] = None,
+                       selection: Optional[str] = None, force: bool = False,
+                       container: Optional[str] = None) -> Dict:
+        """Скачивание видео с выбранным форматом
+        
+        job_key задает имена временных файлов: при повторном запуске задачи с тем же
+        ключом уже скачанные потоки и .part файлы используются повторно.
+        cancel_token останавливает процессы задачи; после отмены недокачанные
+        файлы удаляются (или сохраняются при keep_partial) и поднимается JobCancelled.
+        fragments и use_aria2c задают параллельное скачивание (см. TransferSettings),
+        скорость скачивания возвращается в result['throughput'] (байт/с).
+        На время скачивания задача получает долю общего лимита скорости
+        (self.bandwidth), rate_cap - ее собственное ограничение (байт/с).
+        Файлы задачи пишутся в промежуточный каталог (self.staging_dir), в
+        output_dir готовый файл переносится атомарно; result['staging'] описывает
+        перенос, result['bytes_written_twice'] - байты, скопированные между устройствами.
+        Готовый файл записывается в библиотеку (self.library) по ключу (ID видео,
+        selection, output_dir); selection по умолчанию - format_id. Если файл уже
+        есть, задача не скачивается (result['skipped'], отключается force), а
+        одновременные задачи с одним ключом выполняются по очереди.
+        container - контейнер итогового файла при объединении video-only формата
+        с аудио (container= в политике выбора); без него - первый подходящий из mp4, webm, mkv.
+        """
+        cancel_token = cancel_token or CancelToken()
+        bandwidth_key = job_key or os.urandom(6).hex()
+        selection = selection or format_id
+        video_id = extract_video_id(url)
+        # Ключ задачи связывает в метриках все этапы одной задачи
+        with self.metrics.span('job', job=bandwidth_key, format_id=format_id) as job_span:
+            with self._library_lock(video_id, selection, output_dir, cancel_token):
+                # Проверка под блокировкой: второй процесс находит файл, скачанный первым
+                existing = None if force else self._library_lookup(video_id, selection, output_dir)
+                if existing:
+                    job_span.labels['skipped'] = True
+                    return self._skipped_result(existing)
+                result = self._download_job(url, format_id, output_dir, progress_callback, job_key, cancel_token,
+                                            fragments, use_aria2c, rate_cap, bandwidth_key, job_span, container)
+                if result['success'] and result.get('final_file'):
+                    self._library_record(video_id, {selection, format_id}, output_dir, result['final_file'])
+        return result
+    
+    def _download_job(self, url: str, format_id: str, output_dir: str,
+                      progress_callback: Optional[Callable[[Dict], None]], job_key: Optional[str],
+                      cancel_token: CancelToken, fragments: int, use_aria2c: bool, rate_cap: Optional[int],
+                      bandwidth_key: str, job_span, container: Optional[str] = None) -> Dict:
+        """Скачивание задачи в промежуточном каталоге с долей общего лимита скорости"""
+        staging = JobStaging(output_dir, bandwidth_key, self.staging_dir)
+        try:
+            bandwidth = self.bandwidth.register(bandwidth_key, rate_cap)
+            try:
+                transfer = self.transfer_settings(fragments, use_aria2c, bandwidth)
+                result = self._download_selected_format(url, format_id, output_dir, progress_callback, job_key,
+                                                        cancel_token, transfer, staging, container)
+            finally:
+                self.bandwidth.unregister(bandwidth_key)
+            result['staging'] = staging.report()
+            result['bytes_written_twice'] = staging.copied_bytes
+            if result.get('download_bytes'):
+                result['media_host'] = self.media_host(url, format_id)
+            job_span.bytes = result.get('download_bytes')
+            job_span.labels['format_type'] = result['format_type']
+            if not result['success']:
+                job_span.outcome = 'error'
+                job_span.error_class = result.get('error_class')
+            if cancel_token.cancelled and not result['success']:
+                if not cancel_token.keep_partial:
+                    with self.metrics.span('cleanup', job=bandwidth_key, reason='cancelled') as span:
+                        removed = cancel_token.remove_partial_files()
+                        span.labels['files'] = removed
+                    if removed:
+                        print(f"Удалено недокачанных файлов: {removed}")
+                cancel_token.raise_if_cancelled()
+        finally:
+            # Задача, прерванная закрытием приложения, продолжится с файлами из своего каталога
+            if not (job_key and cancel_token.cancelled and cancel_token.keep_partial):
+                staging.cleanup()
+        return result
+    
+    def media_host(self, url: str, format_id: str) -> Optional[str]:
+        """Хост, с которого скачивается формат (CDN из JSON-информации, для пары - видеопоток)"""
+        video_id, _ = split_format_id(format_id)
+        try:
+            video_info = self.get_video_info(url)
+        except RuntimeError:
+            return None
+        for fmt in video_info.get('formats') or []:
+            if fmt.get('format_id') == video_id and fmt.get('url'):
+                return urlparse(fmt['url']).hostname
+        return None
+    
+    def _library_lock(self, video_id: str, selection: str, output_dir: str, cancel_token: CancelToken):
+        """Блокировка ключа библиотеки на время скачивания (без библиотеки - пустой контекст)"""
+        if not self.library:
+            return nullcontext()
+        return self.library.lock(video_id, selection, output_dir, cancel_token)
+    
+    def library_lookup(self, url: str, selection: str, output_dir: str) -> Optional[Dict]:
+        """Результат пропущенной задачи, если файл уже в библиотеке (проверка до получения информации)"""
+        existing = self._library_lookup(extract_video_id(url), selection, output_dir)
+        return self._skipped_result(existing) if existing else None
+    
+    def library_files(self, url: str, output_dir: str) -> List[Dict]:
+        """Файлы этого видео в папке загрузок по библиотеке (с любым выбором формата)"""
+        if not self.library:
+            return []
+        try:
+            return [entry for entry in self.library.entries(output_dir, extract_video_id(url))
+                    if os.path.exists(entry['path'])]
+        except sqlite3.Error as e:
+            print(f"⚠️  Предупреждение: ошибка библиотеки загрузок: {e}")
+            return []
+    
+    def _library_lookup(self, video_id: str, selection: str, output_dir: str) -> Optional[Dict]:
+        if not self.library:
+            return None
+        try:
+            return self.library.lookup(video_id, selection, output_dir)
+        except sqlite3.Error as e:
+            print(f"⚠️  Предупреждение: ошибка библиотеки загрузок: {e}")
+            return None
+    
+    def _library_record(self, video_id: str, selections, output_dir: str, path: str):
+        if not self.library:
+            return
+        try:
+            for selection in selections:
+                self.library.record(video_id, selection, output_dir, path)
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️  Предупреждение: файл не добавлен в библиотеку загрузок: {e}")
+    
+    @staticmethod
+    def _skipped_result(entry: Dict) -> Dict:
+        """Результат задачи, файл которой уже есть в библиотеке"""
+        print(f"⏭️  Уже скачано: {entry['path']}")
+        return {
+            'success': True,
+            'skipped': True,
+            'video_file': None,
+            'audio_file': None,
+            'final_file': entry['path'],
+            'message': f"Уже скачано: {entry['path']}",
+            'format_type': 'library',
+            'download_bytes': 0,
+            'library': entry,
+        }
+    
+    def _download_selected_format(self, url: str, format_id: str, output_dir: str,
+                                  progress_callback: Optional[Callable[[Dict], None]],
+                                  job_key: Optional[str], cancel_token: CancelToken,
+                                  transfer: TransferSettings, staging: Optional[JobStaging] = None,
+                                  container: Optional[str] = None) -> Dict:
+        """Выбор способа скачивания по типу формата"""
+        try:
+            formats = self.get_available_formats(url)
+            video_id, audio_id = split_format_id(format_id)
+            selected_format = formats.by_id(video_id)
+            
+            if not selected_format:
+                raise ValueError(f"Формат {video_id} не найден")
+            if audio_id and not selected_format['is_video_only']:
+                raise ValueError(f"Формат {video_id} не video-only, аудио {audio_id} не объединяется")
+            
+            result = {
+                'success': False,
+                'video_file': None,
+                'audio_file': None,
+                'final_file': None,
+                'message': '',
+                'format_type': 'unknown'
+            }
+            
+            if selected_format['is_video_only']:
+                # Скачиваем video only + лучший аудио отдельно, затем объединяем
+                result['format_type'] = 'video_only'
+                return self._download_video_with_audio(url, video_id, output_dir, formats, progress_callback,
+                                                       job_key, cancel_token, transfer, staging, audio_id,
+                                                       container)
+                
+            elif selected_format['is_audio_only']:
+                # Скачиваем только аудио
+                result['format_type'] = 'audio_only'
+                return self._download_audio_only(url, format_id, output_dir, progress_callback, cancel_token,
+                                                 transfer, staging)
+                
+            else:
+                # Скачиваем видео с аудио (обычный формат)
+                result['format_type'] = 'video_with_audio'
+                return self._download_video_with_audio_direct(url, format_id, output_dir, progress_callback,
+                                                              cancel_token, transfer, staging)
+                
+        except subprocess.TimeoutExpired:
+            raise RuntimeError("Таймаут при скачивании видео")
+    
+    def _download_video_with_audio(self, url: str, video_format_id: str, output_dir: str, formats: List[Dict],
+                                   progress_callback: Optional[Callable[[Dict], None]] = None,
+                                   job_key: Optional[str] = None,
+                                   cancel_token: Optional[CancelToken] = None,
+                                   transfer: Optional[TransferSettings] = None,
+                                   staging: Optional[JobStaging] = None,
+                                   audio_format_id: Optional[str] = None,
+                                   container: Optional[str] = None) -> Dict:
+        """Скачивание video only + аудио с последующим объединением
+        
+        Без audio_format_id аудиодорожка подбирается к видео (format_selector.pick_audio)
+        с учетом контейнера container.
+        """
+        result = {
+            'success': False,
+            'video_file': None,
+            'audio_file': None,
+            'final_file': None,
+            'message': '',
+            'format_type': 'video_only'
+        }
+        
+        try:
+            formats = FormatList.of(formats)
+            if audio_format_id:
+                audio = formats.by_id(audio_format_id)
+                if not audio or not audio['is_audio_only']:
+                    raise RuntimeError(f"Аудио формат {audio_format_id} не найден")
+            else:
+                # Дорожка, которая копируется вместе с видео без перекодирования, с большим битрейтом
+                audio = pick_audio(formats, formats.by_id(video_format_id), FormatQuery(container=container))
+                if not audio:
+                    raise RuntimeError("Не найден аудио формат для объединения")
+            
+            # Сразу используем ручное объединение, так как yt-dlp с + не всегда работает корректно
+            print("Используем ручное объединение для гарантированного результата...")
+            return self._download_and_merge_manually(url, video_format_id, audio['id'], output_dir,
+                                                     progress_callback, job_key, cancel_token, transfer, staging,
+                                                     container)
+                
+        except Exception as e:
+            result['message'] = f"Ошибка при скачивании video+audio: {e}"
+            result['error_class'] = error_class(e)
+            
+        return result
+    
+    def _download_and_merge_manually(self, url: str, video_format_id: str, audio_format_id: str, output_dir: str,
+                                     progress_callback: Optional[Callable[[Dict], None]] = None,
+                                     job_key: Optional[str] = None,
+                                     cancel_token: Optional[CancelToken] = None,
+                                     transfer: Optional[TransferSettings] = None,
+                                     staging: Optional[JobStaging] = None,
+                                     container: Optional[str] = None) -> Dict:
+        """Альтернативный метод: скачивание и ручное объединение
+        
+        Потоки и итоговый файл пишутся в каталог задачи staging (без него - прямо
+        в output_dir), готовый файл переносится в output_dir атомарно. Итоговый
+        файл - в контейнере container (при необходимости с перекодированием).
+        """
+        result = {
+            'success': False,
+            'video_file': None,
+            'audio_file': None,
+            'final_file': None,
+            'message': '',
+            'format_type': 'video_only'
+        }
+        
+        temp_video = temp_audio = staged_file = None
+        merge_started = False
+        job = self._job_label(transfer)
+        staging = staging or JobStaging(output_dir)
+        containers = (container,) if container else DEFAULT_CONTAINERS
+        try:
+            # Проверяем наличие FFmpeg
+            if not self.ffmpeg_available:
+                raise RuntimeError("FFmpeg не найден! Установите FFmpeg для объединения video-only форматов.")
+            
+            # Получаем название видео для финального файла
+            video_info = self.get_video_info(url)
+            title = video_info.get('title', 'video')
+            # Очищаем название от недопустимых символов
+            title = re.sub(r'[<>:"/\\|?*]', '_', title)
+            
+            # Кодеки потоков из уже полученных форматов
+            formats = self.get_available_formats(url)
+            video_codec = formats.by_id(video_format_id, {}).get('vcodec')
+            audio_codec = formats.by_id(audio_format_id, {}).get('acodec')
+            
+            # Уникальные имена временных файлов: задачи очереди могут стартовать в одну секунду.
+            # Ключ задачи из журнала дает те же имена при возобновлении
+            token = job_key or os.urandom(6).hex()
+            temp_video = os.path.join(staging.path, f"temp_video_{token}.%(ext)s")
+            temp_audio = os.path.join(staging.path, f"temp_audio_{token}.%(ext)s")
+            
+            # Видео и аудио скачиваются одновременно; потоки, скачанные до возобновления, в скорость не входят
+            resumed = {self._find_temp_file(temp_video), self._find_temp_file(temp_audio)}
+            
+            # Потоковое объединение: без временных файлов на диске только итоговый файл.
+            # Возобновляемая задача с уже скачанными потоками объединяет их из файлов
+            if resumed == {None} and self._can_stream_merge(video_codec, audio_codec, transfer):
+                plan = plan_merge(video_codec, audio_codec, containers)
+                staged_file = os.path.join(staging.path, f"{title}.{plan.container}")
+                print(f"Потоковое объединение: {video_codec} + {audio_codec} -> {plan.container}, {describe_plan(plan)}")
+                merge_started = True
+                try:
+                    streamed = self._stream_merge(url, video_format_id, audio_format_id, staged_file, plan,
+                                                  video_info.get('duration'), progress_callback, cancel_token,
+                                                  transfer)
+                except Exception as e:
+                    if isinstance(e, JobCancelled) or (cancel_token and cancel_token.cancelled):
+                        raise
+                    # Например, MP4 с индексом (moov) в конце файла не читается из канала
+                    print(f"⚠️  Потоковое объединение не удалось ({e}), скачиваем во временные файлы")
+                    if os.path.exists(staged_file):
+                        os.remove(staged_file)
+                    merge_started = False
+                else:
+                    final_file = self._finalize(staging, staged_file, job)
+                    self._report(progress_callback, phase='merge', status='finished', final_file=final_file)
+                    result['final_file'] = final_file
+                    result['success'] = True
+                    result['merge_strategy'] = plan.strategy
+                    result['merge_mode'] = 'stream'
+                    result['merge_time'] = streamed['merge_time']
+                    result['download_bytes'] = streamed['download_bytes']
+                    result['download_time'] = streamed['download_time']
+                    result['throughput'] = (streamed['download_bytes'] / streamed['download_time']
+                                            if streamed['download_bytes'] and streamed['download_time'] > 0 else None)
+                    result['transfer'] = (transfer or TransferSettings()).describe()
+                    result['message'] = (f"Видео и аудио скачаны и объединены потоком в: {os.path.basename(final_file)} "
+                                         f"({describe_plan(plan)}, без временных файлов)")
+                    print(f"Потоковое объединение: {plan.strategy}, после скачивания {streamed['merge_time']:.2f} сек")
+                    return result
+            
+            download_start = time.perf_counter()
+            video_file, audio_file = self._download_streams_concurrently(
+                url, video_format_id, audio_format_id, temp_video, temp_audio, progress_callback, cancel_token,
+                transfer)
+            self._record_throughput(result, [path for path in (video_file, audio_file) if path not in resumed],
+                                    time.perf_counter() - download_start, transfer)
+            # Объединение не занимает сеть: доля задачи сразу отдается остальным
+            if transfer and transfer.bandwidth:
+                self.bandwidth.unregister(transfer.bandwidth.key)
+            
+            print(f"Найдены файлы:")
+            print(f"  Видео: {video_file}")
+            print(f"  Аудио: {audio_file}")
+            
+            # Если кодек не указан в форматах, читаем его из файла
+            if codec_family(video_codec) is None:
+                video_codec = probe_codec(video_file, 'v') or video_codec
+            if codec_family(audio_codec) is None:
+                audio_codec = probe_codec(audio_file, 'a') or audio_codec
+            
+            # Копирование потоков без перекодирования, если контейнер позволяет
+            plan = plan_merge(video_codec, audio_codec, containers)
+            staged_file = os.path.join(staging.path, f"{title}.{plan.container}")
+            print(f"План объединения: {video_codec} + {audio_codec} -> {plan.container}, {describe_plan(plan)}")
+            
+            # Объединяем с помощью ffmpeg, прогресс читается из -progress pipe:1
+            ffmpeg_cmd = [
+                'ffmpeg',
+                '-progress', 'pipe:1',
+                '-nostats',
+                '-i', video_file,
+                '-i', audio_file,
+                '-map', '0:v:0',
+                '-map', '1:a:0',
+            ] + plan.ffmpeg_args() + [
+                '-y',  # Перезаписывать файл если существует
+                staged_file
+            ]
+            
+            print(f"Объединение файлов: {' '.join(ffmpeg_cmd)}")
+            self._report(progress_callback, phase='merge', status='started')
+            merge_start = time.perf_counter()
+            merge_started = True
+            parser = FFmpegProgressParser(video_info.get('duration'))
+            
+            def on_ffmpeg_line(line: str):
+                event = parser.feed(line)
+                if event:
+                    self._report(progress_callback, phase='merge', overall_percent=event['percent'], **event)
+            
+            with self.metrics.span('merge', job=job, strategy=plan.strategy, container=plan.container) as span:
+                returncode, ffmpeg_stderr = run_with_progress(ffmpeg_cmd, on_ffmpeg_line, timeout=300,
+                                                              merge_stderr=False, cancel_token=cancel_token)
+                merge_time = time.perf_counter() - merge_start
+                
+                if returncode != 0:
+                    print(f"Ошибка FFmpeg stderr: {ffmpeg_stderr}")
+                    raise RuntimeError(f"Ошибка объединения: {ffmpeg_stderr}")
+                
+                # Проверяем, что финальный файл создан
+                if not os.path.exists(staged_file):
+                    raise RuntimeError("Финальный файл не был создан")
+                span.bytes = os.path.getsize(staged_file)
+            final_file = self._finalize(staging, staged_file, job)
+            self._report(progress_callback, phase='merge', status='finished', final_file=final_file)
+            
+            # Удаляем временные файлы
+            with self.metrics.span('cleanup', job=job, reason='merged') as span:
+                span.bytes = self._file_size(video_file) + self._file_size(audio_file)
+                try:
+                    os.remove(video_file)
+                    os.remove(audio_file)
+                    print("Временные файлы удалены")
+                except Exception as e:
+                    span.outcome = 'error'
+                    span.error_class = type(e).__name__
+                    print(f"Предупреждение: не удалось удалить временные файлы: {e}")
+            
+            result['final_file'] = final_file
+            result['success'] = True
+            result['merge_strategy'] = plan.strategy
+            result['merge_mode'] = 'files'
+            result['merge_time'] = merge_time
+            result['message'] = (f"Видео и аудио успешно скачаны и объединены в: {os.path.basename(final_file)} "
+                                 f"({describe_plan(plan)}, {merge_time:.1f} сек)")
+            print(f"Объединение: {plan.strategy}, {merge_time:.2f} сек")
+            
+        except Exception as e:
+            result['message'] = f"Ошибка при ручном объединении: {e}"
+            result['error_class'] = error_class(e)
+            print(f"Ошибка: {e}")
+            # Объединение прервано: временные потоки задачи больше не нужны
+            # (кроме закрытия приложения - тогда задача возобновится с ними)
+            if temp_video and not isinstance(e, JobInterrupted):
+                self._remove_temp_files([temp_video, temp_audio], job=job)
+            # Недописанный ffmpeg итоговый файл не пригоден ни для просмотра, ни для возобновления
+            if merge_started and staged_file and os.path.exists(staged_file):
+                try:
+                    os.remove(staged_file)
+                except OSError as remove_error:
+                    print(f"Предупреждение: не удалось удалить {staged_file}: {remove_error}")
+            
+        return result
+    
+    def _can_stream_merge(self, video_codec: Optional[str], audio_codec: Optional[str],
+                          transfer: Optional[TransferSettings]) -> bool:
+        """Потоковое объединение включено и возможно для задачи
+        
+        Нужны каналы ОС с передачей дескрипторов (не Windows), движок-процесс
+        и кодеки, известные заранее (из файла их прочитать нельзя). aria2c
+        пишет только в файлы.
+        """
+        return (self.stream_merge and os.name != 'nt' and self.engine.can_stream
+                and codec_family(video_codec) is not None and codec_family(audio_codec) is not None
+                and not (transfer and transfer.external_downloader))
+    
+    def _stream_merge(self, url: str, video_format_id: str, audio_format_id: str, final_file: str, plan: MergePlan,
+                      duration: Optional[float], progress_callback: Optional[Callable[[Dict], None]],
+                      cancel_token: Optional[CancelToken], transfer: Optional[TransferSettings]) -> Dict:
+        """Скачивание потоков прямо в FFmpeg через каналы, без временных файлов
+        
+        Каждый yt-dlp пишет свой поток в канал, FFmpeg читает оба канала (pipe:N)
+        и пишет итоговый файл, пока потоки еще скачиваются. Если поток завершился
+        ошибкой, FFmpeg останавливается, и второй yt-dlp завершается на записи в
+        закрытый канал. Возвращает download_bytes, download_time и merge_time
+        (сколько FFmpeg работал после окончания скачивания).
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        cancel_token = cancel_token or CancelToken()
+        job = self._job_label(transfer)
+        streams = {'video': video_format_id, 'audio': audio_format_id}
+        pipes = {phase: os.pipe() for phase in streams}
+        ffmpeg_cmd = [
+            'ffmpeg',
+            '-progress', 'pipe:1',
+            '-nostats',
+            # Поврежденный или нечитаемый из канала вход - ошибка, а не пустой файл с кодом 0
+            '-xerror',
+            '-i', f"pipe:{pipes['video'][0]}",
+            '-i', f"pipe:{pipes['audio'][0]}",
+            '-map', '0:v:0',
+            '-map', '1:a:0',
+        ] + plan.ffmpeg_args() + ['-y', final_file]
+        print(f"Объединение потоков: {' '.join(ffmpeg_cmd)}")
+        # Отдельный токен FFmpeg: его остановка при ошибке потока не отменяет задачу
+        merge_token = CancelToken()
+        
+        stream_bytes = {phase: (0, None) for phase in streams}
+        finished_at = {}
+        progress_lock = threading.Lock()
+        
+        def stream_progress(phase: str, event: Dict):
+            with progress_lock:
+                stream_bytes[phase] = (event['downloaded_bytes'] or 0, event['total_bytes'])
+                totals = [total for _, total in stream_bytes.values()]
+                overall = None
+                if all(totals):
+                    overall = sum(done for done, _ in stream_bytes.values()) * 100 / sum(totals)
+            self._report(progress_callback, phase=phase, overall_percent=overall, **event)
+        
+        def download_stream(phase: str):
+            with self.metrics.span('download', job=job, stream=phase, format_id=streams[phase],
+                                   engine=self.engine.name, mode='stream') as span:
+                try:
+                    self.engine.stream(url, streams[phase], pipes[phase][1], 300,
+                                       lambda event: stream_progress(phase, event),
+                                       cancel_token=cancel_token, transfer=transfer)
+                except BaseException:
+                    merge_token.cancel()
+                    raise
+                finally:
+                    span.bytes = stream_bytes[phase][0]
+            finished_at[phase] = time.perf_counter()
+        
+        def run_ffmpeg():
+            return run_with_progress(ffmpeg_cmd, lambda line: None, timeout=300, merge_stderr=False,
+                                     cancel_token=merge_token, pass_fds=[read_fd for read_fd, _ in pipes.values()])
+        
+        self._report(progress_callback, phase='merge', status='started', streaming=True)
+        start = time.perf_counter()
+        errors = {}
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            merge_future = executor.submit(run_ffmpeg)
+            futures = {}
+            for phase in streams:
+                print(f"Скачивание {STREAM_LABELS[phase]} ({self.engine.name}): формат {streams[phase]} -> FFmpeg")
+                futures[phase] = executor.submit(download_stream, phase)
+                self._report(progress_callback, phase=phase, status='started')
+            for phase, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[phase] = e
+                    self._report(progress_callback, phase=phase, status='error')
+                    continue
+                self._report(progress_callback, phase=phase, status='finished')
+            try:
+                returncode, ffmpeg_stderr = merge_future.result()
+            except JobCancelled:
+                returncode, ffmpeg_stderr = None, "FFmpeg остановлен"
+            except OSError as e:
+                returncode, ffmpeg_stderr = None, str(e)
+        end = time.perf_counter()
+        
+        downloaded = sum(done for done, _ in stream_bytes.values())
+        ok = not errors and returncode == 0 and os.path.exists(final_file)
+        self.metrics.record('merge', end - start, self._file_size(final_file) if ok else None,
+                            'ok' if ok else 'error', job=job, strategy=plan.strategy,
+                            container=plan.container, mode='stream')
+        cancel_token.raise_if_cancelled()
+        for phase in streams:
+            if phase in errors:
+                raise RuntimeError(f"Ошибка скачивания {STREAM_LABELS[phase]}: {errors[phase]}") from errors[phase]
+        if returncode != 0:
+            print(f"Ошибка FFmpeg stderr: {ffmpeg_stderr}")
+            raise RuntimeError(f"Ошибка объединения: {ffmpeg_stderr}")
+        if not os.path.exists(final_file):
+            raise RuntimeError("Финальный файл не был создан")
+        
+        last_stream = max(finished_at.values())
+        return {
+            'download_bytes': downloaded,
+            'download_time': last_stream - start,
+            'merge_time': end - last_stream,
+        }
+    
+    def _download_streams_concurrently(self, url: str, video_format_id: str, audio_format_id: str,
+                                       temp_video: str, temp_audio: str,
+                                       progress_callback: Optional[Callable[[Dict], None]] = None,
+                                       cancel_token: Optional[CancelToken] = None,
+                                       transfer: Optional[TransferSettings] = None) -> Tuple[str, str]:
+        """Параллельное скачивание видео и аудио потоков во временные файлы
+        
+        Если один из потоков завершился ошибкой, дожидаемся второго и удаляем
+        все временные файлы задачи (включая .part), затем поднимаем ошибку.
+        Уже скачанный поток (возобновленная задача) повторно не скачивается.
+        """
+        # concurrent.futures тянет logging: импорт только когда потоки действительно скачиваются
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        
+        streams = {
+            'video': (video_format_id, temp_video),
+            'audio': (audio_format_id, temp_audio),
+        }
+        job = self._job_label(transfer)
+        errors = {}
+        completed = 0
+        
+        # Суммарный прогресс обоих потоков: байты скачано / всего по каждому
+        stream_bytes = {phase: (0, None) for phase in streams}
+        progress_lock = threading.Lock()
+        
+        def stream_progress(phase: str, event: Dict):
+            with progress_lock:
+                stream_bytes[phase] = (event['downloaded_bytes'] or 0, event['total_bytes'])
+                totals = [total for _, total in stream_bytes.values()]
+                overall = None
+                if all(totals):
+                    overall = sum(done for done, _ in stream_bytes.values()) * 100 / sum(totals)
+            self._report(progress_callback, phase=phase, overall_percent=overall, **event)
+        
+        def download_stream(phase: str, format_id: str, template: str, callback):
+            with self.metrics.span('download', job=job, stream=phase, format_id=format_id,
+                                   engine=self.engine.name) as span:
+                self.engine.download(url, format_id, template, 300, callback,
+                                     cancel_token=cancel_token, transfer=transfer)
+                span.bytes = self._file_size(self._find_temp_file(template))
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = {}
+            for phase, (format_id, template) in streams.items():
+                existing = self._find_temp_file(template)
+                if existing:
+                    size = os.path.getsize(existing)
+                    stream_bytes[phase] = (size, size)
+                    completed += 1
+                    print(f"Поток {STREAM_LABELS[phase]} уже скачан: {existing}")
+                    self._report(progress_callback, phase=phase, status='finished', resumed=True,
+                                 streams_done=completed, streams_total=len(streams))
+                    continue
+                print(f"Скачивание {STREAM_LABELS[phase]} ({self.engine.name}): формат {format_id} -> {template}")
+                callback = (lambda event, phase=phase: stream_progress(phase, event)) if progress_callback else None
+                futures[executor.submit(download_stream, phase, format_id, template, callback)] = phase
+                self._report(progress_callback, phase=phase, status='started', streams_done=completed, streams_total=len(streams))
+            
+            for future in as_completed(futures):
+                phase = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[phase] = e
+                    self._report(progress_callback, phase=phase, status='error', streams_done=completed, streams_total=len(streams))
+                    continue
+                completed += 1
+                self._report(progress_callback, phase=phase, status='finished', streams_done=completed, streams_total=len(streams))
+        
+        files = {phase: self._find_temp_file(template) for phase, (_, template) in streams.items()}
+        
+        interrupted = next((e for e in errors.values() if isinstance(e, JobInterrupted)), None)
+        if interrupted:
+            # Приложение закрывается: .part и готовые потоки нужны для возобновления
+            raise interrupted
+        
+        if errors or not all(files.values()):
+            removed = self._remove_temp_files([template for _, template in streams.values()], job=job)
+            if removed:
+                print(f"Удалено временных файлов: {removed}")
+            if 'video' in errors:
+                raise RuntimeError(f"Ошибка скачивания видео: {errors['video']}") from errors['video']
+            if 'audio' in errors:
+                raise RuntimeError(f"Ошибка скачивания аудио: {errors['audio']}") from errors['audio']
+            print(f"Найдено видео: {files['video']}, аудио: {files['audio']}")
+            raise RuntimeError("Не удалось найти скачанные файлы")
+        
+        return files['video'], files['audio']
+    
+    def _temp_pattern(self, template: str) -> str:
+        """Шаблон glob для файлов задачи: temp_video_<ts>.%(ext)s -> temp_video_<ts>.*"""
+        return template.replace('.%(ext)s', '.*')
+    
+    def _find_temp_file(self, template: str) -> Optional[str]:
+        """Готовый (не .part) файл, скачанный по шаблону"""
+        for path in sorted(glob.glob(self._temp_pattern(template))):
+            if not path.endswith(('.part', '.ytdl')) and '.part-Frag' not in path:
+                return path
+        return None
+    
+    def _remove_temp_files(self, templates, job: Optional[str] = None) -> int:
+        """Удаление всех файлов по шаблонам, возвращает количество удаленных"""
+        removed = 0
+        with self.metrics.span('cleanup', job=job, reason='failed') as span:
+            span.bytes = 0
+            for template in templates:
+                for path in glob.glob(self._temp_pattern(template)):
+                    size = self._file_size(path)
+                    try:
+                        os.remove(path)
+                        removed += 1
+                        span.bytes += size
+                    except OSError as e:
+                        span.outcome = 'error'
+                        span.error_class = type(e).__name__
+                        print(f"Предупреждение: не удалось удалить {path}: {e}")
+            span.labels['files'] = removed
+        return removed
+    
+    def _finalize(self, staging: JobStaging, staged_path: str, job: Optional[str]) -> str:
+        """Перенос готового файла из каталога задачи в папку загрузок (этап finalize в метриках)"""
+        with self.metrics.span('finalize', job=job) as span:
+            final_file = staging.finalize(staged_path)
+            span.bytes = staging.copied_bytes
+            span.labels['method'] = staging.method
+        if staging.copied_bytes:
+            print(f"Файл скопирован между устройствами ({staging.method}): "
+                  f"{self._format_file_size(staging.copied_bytes)} записано повторно")
+        return final_file
+    
+    @staticmethod
+    def _file_size(path: Optional[str]) -> int:
+        """Размер файла в байтах (0, если файла нет)"""
+        try:
+            return os.path.getsize(path) if path else 0
+        except OSError:
+            return 0
+    
+    @staticmethod
+    def _job_label(transfer: Optional[TransferSettings]) -> Optional[str]:
+        """Ключ задачи для метрик этапов (совпадает с ключом ее доли лимита скорости)"""
+        return transfer.bandwidth.key if transfer and transfer.bandwidth else None
+    
+    def _phase_callback(self, progress_callback: Optional[Callable[[Dict], None]],
+                        phase: str) -> Optional[Callable[[Dict], None]]:
+        """Обработчик прогресса одного потока, добавляющий этап к событию"""
+        if not progress_callback:
+            return None
+        return lambda event: self._report(progress_callback, phase=phase, overall_percent=event['percent'], **event)
+    
+    def _record_throughput(self, result: Dict, files: List[str], elapsed: float,
+                           transfer: Optional[TransferSettings]):
+        """Объем, время и скорость скачивания в результате задачи"""
+        transfer = transfer or TransferSettings()
+        size = sum(os.path.getsize(path) for path in files if path and os.path.exists(path))
+        result['download_bytes'] = size
+        result['download_time'] = elapsed
+        result['throughput'] = size / elapsed if size and elapsed > 0 else None
+        result['transfer'] = transfer.describe()
+        if result['throughput']:
+            print(f"Скорость скачивания: {self._format_file_size(int(result['throughput']))}/с "
+                  f"({transfer.describe()})")
+    
+    @staticmethod
+    def _report(progress_callback: Optional[Callable[[Dict], None]], **event):
+        """Передача события прогресса, если задан обработчик"""
+        if progress_callback:
+            progress_callback(event)
+    
+    def _download_audio_only(self, url: str, audio_format_id: str, output_dir: str,
+                                    progress_callback: Optional[Callable[[Dict], None]] = None,
+                                    cancel_token: Optional[CancelToken] = None,
+                                    transfer: Optional[TransferSettings] = None,
+                                    staging: Optional[JobStaging] = None) -> Dict:
+        """Скачивание только аудио"""
+        result = {
+            'success': False,
+            'video_file': None,
+            'audio_file': None,
+            'final_file': None,
+            'message': '',
+            'format_type': 'audio_only'
+        }
+        
+        try:
+            staging = staging or JobStaging(output_dir)
+            output_template = os.path.join(staging.path, '%(title)s.%(ext)s')
+            download_start = time.perf_counter()
+            try:
+                with self.metrics.span('download', job=self._job_label(transfer), stream='audio',
+                                       format_id=audio_format_id, engine=self.engine.name) as span:
+                    final_file = self.engine.download(url, audio_format_id, output_template, timeout=300,
+                                                      progress_callback=self._phase_callback(progress_callback, 'audio'),
+                                                      cancel_token=cancel_token, transfer=transfer)
+                    span.bytes = self._file_size(final_file)
+            except EngineError as e:
+                raise RuntimeError(f"Ошибка скачивания: {e}") from e
+            
+            # Путь к скачанному файлу
+            if final_file:
+                self._record_throughput(result, [final_file], time.perf_counter() - download_start, transfer)
+                result['final_file'] = self._finalize(staging, final_file, self._job_label(transfer))
+                result['success'] = True
+                result['message'] = f"Аудио успешно скачано: {os.path.basename(result['final_file'])}"
+            else:
+                raise RuntimeError("Не удалось определить путь к скачанному файлу")
+                
+        except Exception as e:
+            result['message'] = f"Ошибка при скачивании аудио: {e}"
+            result['error_class'] = error_class(e)
+            
+        return result
+    
+    def _download_video_with_audio_direct(self, url: str, format_id: str, output_dir: str,
+                                                 progress_callback: Optional[Callable[[Dict], None]] = None,
+                                                 cancel_token: Optional[CancelToken] = None,
+                                                 transfer: Optional[TransferSettings] = None,
+                                                 staging: Optional[JobStaging] = None) -> Dict:
+        """Скачивание видео с аудио напрямую"""
+        result = {
+            'success': False,
+            'video_file': None,
+            'audio_file': None,
+            'final_file': None,
+            'message': '',
+            'format_type': 'video_with_audio'
+        }
+        
+        try:
+            staging = staging or JobStaging(output_dir)
+            output_template = os.path.join(staging.path, '%(title)s.%(ext)s')
+            download_start = time.perf_counter()
+            try:
+                with self.metrics.span('download', job=self._job_label(transfer), stream='av',
+                                       format_id=format_id, engine=self.engine.name) as span:
+                    final_file = self.engine.download(url, format_id, output_template, timeout=300,
+                                                      progress_callback=self._phase_callback(progress_callback, 'video'),
+                                                      cancel_token=cancel_token, transfer=transfer)
+                    span.bytes = self._file_size(final_file)
+            except EngineError as e:
+                raise RuntimeError(f"Ошибка скачивания: {e}") from e
+            
+            # Путь к скачанному файлу
+            if final_file:
+                self._record_throughput(result, [final_file], time.perf_counter() - download_start, transfer)
+                result['final_file'] = self._finalize(staging, final_file, self._job_label(transfer))
+                result['success'] = True
+                result['message'] = f"Видео с аудио успешно скачано: {os.path.basename(result['final_file'])}"
+            else:
+                raise RuntimeError("Не удалось определить путь к скачанному файлу")
+                
+        except Exception as e:
+            result['message'] = f"Ошибка при скачивании: {e}"
+            result['error_class'] = error_class(e)
+            
+        return result
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Движки выполнения yt-dlp для YouTubeDownloader
+
+subprocess - отдельный процесс yt-dlp на каждый вызов (поведение по умолчанию)
+inprocess  - yt_dlp.YoutubeDL внутри текущего процесса, без запуска интерпретатора
+"""
+
+import json
+import os
+import re
+import subprocess
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from bandwidth import JobBandwidth
+from cancellation import CancelToken, process_group_kwargs, terminate_process_tree
+from progress import PROGRESS_TEMPLATE, parse_ytdlp_progress, progress_from_hook, run_with_progress
+
+
+BACKENDS = ('subprocess', 'inprocess')
+
+# Сетевые параметры, общие для всех вызовов yt-dlp
+NETWORK_ARGS = [
+    '--socket-timeout', '30',
+    '--retries', '3',
+    '--fragment-retries', '3',
+]
+# Строка вывода yt-dlp с путем к скачиваемому файлу
+DESTINATION_PREFIX = '[download] Destination: '
+
+
+# Соединений aria2c на файл и минимальный размер куска для разбиения
+ARIA2C_SPLIT_SIZE = '1M'
+MAX_FRAGMENTS = 16
+
+
+class TransferSettings(NamedTuple):
+    """Параметры скачивания одной задачи: параллельные фрагменты и внешний загрузчик
+
+    fragments - сколько фрагментов DASH/HLS качать одновременно
+    (--concurrent-fragments). external_downloader - путь к aria2c: файл
+    качается несколькими соединениями, в том числе обычные https форматы
+    YouTube, на которые --concurrent-fragments не влияет. bandwidth - доля
+    общего лимита скорости задачи (BandwidthGovernor).
+    """
+    fragments: int = 1
+    external_downloader: Optional[str] = None
+    bandwidth: Optional[JobBandwidth] = None
+
+    def rate_limit(self) -> Optional[int]:
+        """Постоянный лимит процесса yt-dlp: ограничение задачи (cap)
+
+        Изменяющаяся доля держится паузами процесса, а в Windows, где их нет,
+        фиксируется доля на момент запуска.
+        """
+        if not self.bandwidth:
+            return None
+        limit = self.bandwidth.share if os.name == 'nt' else self.bandwidth.cap
+        return int(limit) if limit else None
+
+    def aria2c_args(self) -> List[str]:
+        connections = str(max(self.fragments, 1))
+        return ['-x', connections, '-s', connections, '-k', ARIA2C_SPLIT_SIZE]
+
+    def ytdlp_args(self) -> List[str]:
+        """Аргументы командной строки yt-dlp"""
+        args = []
+        if self.fragments > 1:
+            args += ['--concurrent-fragments', str(self.fragments)]
+        if self.external_downloader:
+            args += ['--downloader', self.external_downloader,
+                     '--downloader-args', 'aria2c:' + ' '.join(self.aria2c_args())]
+        if self.rate_limit():
+            args += ['--limit-rate', str(self.rate_limit())]
+        return args
+
+    def ydl_params(self) -> Dict:
+        """Те же параметры для yt_dlp.YoutubeDL"""
+        params = {}
+        if self.fragments > 1:
+            params['concurrent_fragment_downloads'] = self.fragments
+        if self.external_downloader:
+            params['external_downloader'] = {'default': self.external_downloader}
+            params['external_downloader_args'] = {'aria2c': self.aria2c_args()}
+        if self.bandwidth and self.bandwidth.cap:
+            params['ratelimit'] = self.bandwidth.cap
+        return params
+
+    def describe(self) -> str:
+        """Краткое описание для сообщений"""
+        if self.external_downloader:
+            return f"aria2c, {self.fragments} соед."
+        return f"фрагментов: {self.fragments}"
+
+
+def bandwidth_throttle(transfer: Optional[TransferSettings],
+                       cancel_token: CancelToken) -> Callable[[Dict], None]:
+    """Обработчик событий прогресса одного файла, удерживающий задачу в ее доле скорости"""
+    bandwidth = transfer.bandwidth if transfer else None
+    last = [0]
+
+    def throttle(event: Dict):
+        downloaded = event.get('downloaded_bytes')
+        if bandwidth is None or downloaded is None:
+            return
+        # Счетчик сбрасывается при повторной попытке - такие байты не учитываем
+        delta = downloaded - last[0] if downloaded >= last[0] else 0
+        last[0] = downloaded
+        delay = bandwidth.consume(delta)
+        if delay > 0:
+            cancel_token.pause(delay)
+
+    return throttle
+
+
+class EngineError(RuntimeError):
+    """Ошибка yt-dlp: текст stderr или сообщение исключения"""
+
+
+def playlist_entry(entry: Dict) -> Optional[Dict]:
+    """Элемент плейлиста из плоского извлечения: ссылка, ID, название, длительность"""
+    url = entry.get('url') or entry.get('webpage_url')
+    formats = entry.get('formats') or []
+    if not url and len(formats) == 1:
+        # Необработанный элемент со встроенным медиафайлом (generic extractor)
+        url = formats[0].get('url')
+    if entry.get('ie_key') == 'Youtube' and entry.get('id'):
+        url = f"https://www.youtube.com/watch?v={entry['id']}"
+    if not url:
+        return None
+    return {
+        'url': url,
+        'id': entry.get('id'),
+        'title': entry.get('title'),
+        'duration': entry.get('duration'),
+    }
+
+
+class SubprocessEngine:
+    """Запуск yt-dlp отдельным процессом на каждый вызов"""
+
+    name = 'subprocess'
+    # Может писать поток в канал (stream) для объединения без временных файлов
+    can_stream = True
+
+    def __init__(self, ytdlp_path: str):
+        self.ytdlp_path = ytdlp_path
+
+    def _base_cmd(self) -> List[str]:
+        """Команда запуска yt-dlp в виде списка аргументов"""
+        # "<python> -m yt_dlp" хранится одной строкой, путь к python может содержать пробелы
+        python, sep, module = self.ytdlp_path.rpartition(' -m ')
+        if sep:
+            return [python, '-m', module]
+        return [self.ytdlp_path]
+
+    def extract_info(self, url: str, format_id: Optional[str] = None, timeout: int = 60,
+                     cancel_token: Optional[CancelToken] = None) -> Dict:
+        """Полная информация о видео (--dump-json)"""
+        cmd = self._base_cmd() + ['--dump-json', '--no-download']
+        if format_id:
+            cmd += ['--format', format_id]
+        cmd += NETWORK_ARGS + [url]
+
+        cancel_token = cancel_token or CancelToken()
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True, errors='replace', **process_group_kwargs())
+        with cancel_token.track(process):
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except BaseException:
+                terminate_process_tree(process, grace_period=0)
+                raise
+        cancel_token.raise_if_cancelled()
+        if process.returncode != 0:
+            raise EngineError(stderr.strip())
+        return json.loads(stdout)
+
+    def download(self, url: str, format_id: str, output_template: str, timeout: int = 300,
+                 progress_callback: Optional[Callable[[Dict], None]] = None,
+                 cancel_token: Optional[CancelToken] = None,
+                 transfer: Optional[TransferSettings] = None) -> Optional[str]:
+        """Скачивание одного формата, возвращает путь к файлу (если удалось определить)
+
+        Вывод yt-dlp читается построчно, прогресс передается в progress_callback.
+        timeout - допустимое время без вывода. Файлы, которые начал писать yt-dlp,
+        запоминаются в cancel_token для удаления недокачанных частей.
+        """
+        cancel_token = cancel_token or CancelToken()
+        output = []
+        on_line = self._output_handler(output, progress_callback, cancel_token, transfer)
+        returncode, _ = run_with_progress(self._download_cmd(url, format_id, output_template, transfer), on_line,
+                                          timeout, cancel_token=cancel_token)
+        self._raise_for_returncode(returncode, output)
+
+        text = '\n'.join(output)
+        output_match = (re.search(re.escape(DESTINATION_PREFIX) + r'(.+)', text) or
+                        re.search(r'\[download\] (.+) has already been downloaded', text))
+        return output_match.group(1) if output_match else None
+
+    def stream(self, url: str, format_id: str, output_fd: int, timeout: int = 300,
+               progress_callback: Optional[Callable[[Dict], None]] = None,
+               cancel_token: Optional[CancelToken] = None,
+               transfer: Optional[TransferSettings] = None):
+        """Скачивание одного формата в дескриптор output_fd (канал к FFmpeg) вместо файла
+
+        С --output - yt-dlp пишет данные в stdout, а сообщения и прогресс - в stderr.
+        output_fd закрывается сразу после запуска процесса: читающая сторона
+        получит конец данных, когда yt-dlp завершится.
+        """
+        cancel_token = cancel_token or CancelToken()
+        output = []
+        on_line = self._output_handler(output, progress_callback, cancel_token, transfer)
+        returncode, _ = run_with_progress(self._download_cmd(url, format_id, '-', transfer), on_line, timeout,
+                                          cancel_token=cancel_token, output_fd=output_fd)
+        self._raise_for_returncode(returncode, output)
+
+    def _download_cmd(self, url: str, format_id: str, output_template: str,
+                      transfer: Optional[TransferSettings]) -> List[str]:
+        return self._base_cmd() + [
+            '--format', format_id,
+            '--output', output_template,
+            '--no-playlist',
+            '--newline',
+            '--progress-template', PROGRESS_TEMPLATE,
+        ] + (transfer or TransferSettings()).ytdlp_args() + [url]
+
+    @staticmethod
+    def _output_handler(output: List[str], progress_callback: Optional[Callable[[Dict], None]],
+                        cancel_token: CancelToken, transfer: Optional[TransferSettings]) -> Callable[[str], None]:
+        """Обработчик строк вывода: прогресс - в progress_callback, остальное - в output"""
+        throttle = bandwidth_throttle(transfer, cancel_token)
+
+        def on_line(line: str):
+            event = parse_ytdlp_progress(line)
+            if event is None:
+                output.append(line)
+                # "-" - вывод в канал (stream), файла нет
+                if line.startswith(DESTINATION_PREFIX) and line != DESTINATION_PREFIX + '-':
+                    cancel_token.add_file(line[len(DESTINATION_PREFIX):])
+                return
+            throttle(event)
+            if progress_callback:
+                progress_callback(event)
+
+        return on_line
+
+    @staticmethod
+    def _raise_for_returncode(returncode: int, output: List[str]):
+        if returncode != 0:
+            errors = [line for line in output if line.startswith('ERROR')]
+            raise EngineError('\n'.join(errors or output[-20:]))
+
+    def iter_playlist(self, url: str) -> Iterator[Dict]:
+        """Элементы плейлиста или канала по мере получения страниц
+
+        yt-dlp выводит по строке JSON на элемент (--flat-playlist --lazy-playlist),
+        строки разбираются по одной, весь список в памяти не хранится. Если
+        потребитель перестал читать, процесс завершается.
+        """
+        cmd = self._base_cmd() + ['--flat-playlist', '--lazy-playlist', '--dump-json'] + NETWORK_ARGS + [url]
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True, bufsize=1, errors='replace', **process_group_kwargs())
+        stderr_tail = deque(maxlen=20)
+        stderr_thread = threading.Thread(target=lambda: stderr_tail.extend(process.stderr), daemon=True)
+        stderr_thread.start()
+
+        finished = False
+        try:
+            for line in process.stdout:
+                try:
+                    entry = playlist_entry(json.loads(line))
+                except ValueError:
+                    continue
+                if entry:
+                    yield entry
+            finished = True
+        finally:
+            if not finished:
+                terminate_process_tree(process, grace_period=0)
+            returncode = process.wait()
+            stderr_thread.join()
+
+        if returncode != 0:
+            errors = [line.strip() for line in stderr_tail if line.startswith('ERROR')]
+            raise EngineError('\n'.join(errors or [line.strip() for line in stderr_tail]))
+
+
+class _SilentLogger:
+    """Логгер для YoutubeDL: ошибки приходят исключениями, печатать нечего"""
+
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+class InProcessEngine:
+    """yt_dlp.YoutubeDL внутри текущего процесса
+
+    Один долгоживущий экземпляр YoutubeDL обслуживает извлечение информации
+    (под блокировкой, экземпляр не потокобезопасен). Для скачивания создается
+    отдельный экземпляр на задачу со своими format/outtmpl, модуль yt_dlp уже
+    импортирован, поэтому это дешево. Параметр timeout принимается для
+    совместимости с SubprocessEngine и не используется.
+    """
+
+    name = 'inprocess'
+    # YoutubeDL внутри процесса пишет только в файлы
+    can_stream = False
+
+    def __init__(self):
+        import yt_dlp  # тяжелый импорт - только если выбран этот движок
+        self._yt_dlp = yt_dlp
+        self._lock = threading.Lock()
+        self._ydl = yt_dlp.YoutubeDL(self._params())
+
+    def _params(self, **extra) -> Dict:
+        """Параметры YoutubeDL, эквивалентные аргументам SubprocessEngine"""
+        params = {
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'no_color': True,
+            'logger': _SilentLogger(),
+            'noplaylist': True,
+            'socket_timeout': 30,
+            'retries': 3,
+            'fragment_retries': 3,
+        }
+        params.update(extra)
+        return params
+
+    def _extract(self, url: str) -> Dict:
+        with self._lock:
+            try:
+                info = self._ydl.extract_info(url, download=False)
+            except self._yt_dlp.utils.DownloadError as e:
+                raise EngineError(str(e))
+            return self._ydl.sanitize_info(info)
+
+    def extract_info(self, url: str, format_id: Optional[str] = None, timeout: int = 60,
+                     cancel_token: Optional[CancelToken] = None) -> Dict:
+        """Полная информация о видео (аналог --dump-json)
+
+        format_id не влияет на результат: список formats и так содержит все форматы.
+        Извлечение внутри процесса не прерывается: отмена проверяется после него.
+        """
+        info = self._extract(url)
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        return info
+
+    def download(self, url: str, format_id: str, output_template: str, timeout: int = 300,
+                 progress_callback: Optional[Callable[[Dict], None]] = None,
+                 cancel_token: Optional[CancelToken] = None,
+                 transfer: Optional[TransferSettings] = None) -> Optional[str]:
+        """Скачивание одного формата, возвращает путь к файлу
+
+        Отмена срабатывает в progress hook: исключение из него останавливает
+        YoutubeDL на следующем блоке данных.
+        """
+        params = self._params(format=format_id, outtmpl=output_template,
+                              **(transfer or TransferSettings()).ydl_params())
+        cancel_token = cancel_token or CancelToken()
+        throttle = bandwidth_throttle(transfer, cancel_token)
+
+        def hook(status: Dict):
+            cancel_token.add_file(status.get('filename'))
+            cancel_token.raise_if_cancelled()
+            event = progress_from_hook(status)
+            # Пауза в hook задерживает чтение следующего блока данных
+            throttle(event)
+            cancel_token.raise_if_cancelled()
+            if progress_callback:
+                progress_callback(event)
+
+        params['progress_hooks'] = [hook]
+        with self._yt_dlp.YoutubeDL(params) as ydl:
+            try:
+                info = ydl.extract_info(url, download=True)
+            except self._yt_dlp.utils.DownloadError as e:
+                raise EngineError(str(e))
+
+        downloads = (info or {}).get('requested_downloads') or []
+        return downloads[0].get('filepath') if downloads else None
+
+    def iter_playlist(self, url: str) -> Iterator[Dict]:
+        """Элементы плейлиста или канала по мере получения страниц
+
+        Плоское извлечение без обработки (process=False): entries - ленивый
+        генератор экстрактора, следующая страница запрашивается по мере чтения.
+        """
+        params = self._params(extract_flat='in_playlist', lazy_playlist=True, noplaylist=False)
+        with self._yt_dlp.YoutubeDL(params) as ydl:
+            try:
+                info = ydl.extract_info(url, download=False, process=False)
+                # Ссылка на канал может вернуть ссылку на вкладку с видео
+                for _ in range(3):
+                    if info.get('_type') not in ('url', 'url_transparent'):
+                        break
+                    info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+                if info.get('_type') not in ('playlist', 'multi_video'):
+                    entry = playlist_entry(dict(info, url=info.get('webpage_url') or url))
+                    if entry:
+                        yield entry
+                    return
+                for entry in info.get('entries') or []:
+                    entry = playlist_entry(entry or {})
+                    if entry:
+                        yield entry
+            except self._yt_dlp.utils.DownloadError as e:
+                raise EngineError(str(e))
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Поддельный yt-dlp для офлайн-бенчмарка (bench_offline.py)
+
+Понимает те же аргументы, что передает SubprocessEngine: --dump-json отдает
+записанную информацию о видео, скачивание идет с локального сервера с
+выводом прогресса по --progress-template (с -o - данные идут в stdout,
+а сообщения - в stderr, как у yt-dlp). Информация о видео - JSON-файл
+{url: info} из переменной FAKE_YTDLP_INFO. С FAKE_YTDLP_DOWNLOADER=yt-dlp
+скачивание выполняет настоящий yt-dlp (--load-info-json).
+
+    python -m fake_ytdlp --dump-json --no-download URL
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+CHUNK_SIZE = 256 * 1024
+# Как часто выводится прогресс (сек), как и у yt-dlp - не на каждый блок
+PROGRESS_INTERVAL = 0.1
+
+
+def load_info(url: str) -> Dict:
+    with open(os.environ['FAKE_YTDLP_INFO'], encoding='utf-8') as f:
+        infos = json.load(f)
+    if url not in infos:
+        print(f"ERROR: [fake] {url}: Unsupported URL", file=sys.stderr)
+        sys.exit(1)
+    return infos[url]
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--version', action='store_true')
+    parser.add_argument('--dump-json', '-j', action='store_true')
+    parser.add_argument('--format', '-f')
+    parser.add_argument('--output', '-o', default='%(title)s.%(ext)s')
+    parser.add_argument('--progress-template')
+    parser.add_argument('--concurrent-fragments', '-N', type=int, default=1)
+    parser.add_argument('--limit-rate', '-r')
+    # --newline, --no-playlist, сетевые параметры и т.п. на поддельную загрузку не влияют
+    args, _unknown = parser.parse_known_args(argv)
+    # Ссылка - последний аргумент (так вызывает SubprocessEngine); значения
+    # неизвестных параметров (--retries 3) argparse принял бы за нее
+    args.url = argv[-1] if argv and not argv[-1].startswith('-') else None
+    return args
+
+
+def render_progress(template: Optional[str], progress: Dict) -> Optional[str]:
+    """Строка прогресса по шаблону 'download:...%(progress.поле)s...'"""
+    if not template or not template.startswith('download:'):
+        return None
+
+    def field(match):
+        value = progress.get(match.group(1))
+        return 'NA' if value is None else str(value)
+
+    return re.sub(r'%\(progress\.(\w+)\)s', field, template[len('download:'):])
+
+
+def output_path(template: str, info: Dict, fmt: Dict) -> str:
+    values = {'title': info.get('title', 'video'), 'id': info.get('id', 'video'), 'ext': fmt.get('ext', 'mp4')}
+    return re.sub(r'%\((\w+)\)s', lambda m: str(values.get(m.group(1), m.group(0))), template)
+
+
+def fetch(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.read()
+
+
+class ProgressWriter:
+    """Вывод строк прогресса не чаще PROGRESS_INTERVAL и ограничение --limit-rate"""
+
+    def __init__(self, template: Optional[str], total: Optional[int], rate_limit: Optional[int], log=None):
+        self.template = template
+        self.log = log or sys.stdout
+        self.total = total
+        self.rate_limit = rate_limit
+        self.downloaded = 0
+        self.start = time.monotonic()
+        self.last = 0.0
+
+    def add(self, nbytes: int):
+        self.downloaded += nbytes
+        now = time.monotonic()
+        elapsed = now - self.start
+        if self.rate_limit:
+            ahead = self.downloaded / self.rate_limit - elapsed
+            if ahead > 0:
+                time.sleep(ahead)
+        if now - self.last >= PROGRESS_INTERVAL:
+            self.last = now
+            self.emit('downloading')
+
+    def emit(self, status: str):
+        elapsed = max(time.monotonic() - self.start, 1e-6)
+        speed = self.downloaded / elapsed
+        eta = int((self.total - self.downloaded) / speed) if self.total and speed else None
+        line = render_progress(self.template, {
+            'status': status, 'downloaded_bytes': self.downloaded, 'total_bytes': self.total,
+            'total_bytes_estimate': None, 'speed': round(speed, 1), 'eta': eta,
+        })
+        if line:
+            print(line, file=self.log, flush=True)
+
+
+def download_http(fmt: Dict, part, progress: ProgressWriter):
+    with urllib.request.urlopen(fmt['url'], timeout=30) as response:
+        progress.total = progress.total or int(response.headers.get('Content-Length') or 0) or None
+        while True:
+            chunk = response.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            part.write(chunk)
+            progress.add(len(chunk))
+
+
+def download_hls(fmt: Dict, part, progress: ProgressWriter, fragments: int):
+    """Сегменты плейлиста, до fragments одновременно, пишутся по порядку"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    playlist = fetch(fmt['url']).decode('utf-8')
+    segments = [urljoin(fmt['url'], line.strip()) for line in playlist.splitlines()
+                if line.strip() and not line.startswith('#')]
+    with ThreadPoolExecutor(max_workers=max(fragments, 1)) as executor:
+        for data in executor.map(fetch, segments):
+            part.write(data)
+            progress.add(len(data))
+
+
+def run_real_ytdlp(info: Dict, argv: List[str], url: str):
+    """Скачивание настоящим yt-dlp по записанной информации (процесс заменяется)"""
+    # Рядом с файлом FAKE_YTDLP_INFO: каталог бенчмарка удаляется вместе с ним
+    handle, info_path = tempfile.mkstemp(suffix='.info.json', dir=os.path.dirname(os.environ['FAKE_YTDLP_INFO']))
+    with os.fdopen(handle, 'w', encoding='utf-8') as f:
+        json.dump(info, f)
+    args = [arg for arg in argv if arg != url]
+    os.execv(sys.executable, [sys.executable, '-m', 'yt_dlp', '--load-info-json', info_path] + args)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    if args.version:
+        print('fake')
+        return 0
+    if not args.url:
+        print("ERROR: You must provide at least one URL.", file=sys.stderr)
+        return 2
+
+    info = load_info(args.url)
+    if args.dump_json:
+        print(json.dumps(info, ensure_ascii=False))
+        return 0
+
+    if os.environ.get('FAKE_YTDLP_DOWNLOADER') == 'yt-dlp':
+        run_real_ytdlp(info, argv, args.url)
+
+    fmt = next((f for f in info['formats'] if f['format_id'] == args.format), None)
+    if fmt is None:
+        print(f"ERROR: [fake] {info['id']}: Requested format is not available", file=sys.stderr)
+        return 1
+
+    to_stdout = args.output == '-'
+    log = sys.stderr if to_stdout else sys.stdout
+    path = '-' if to_stdout else output_path(args.output, info, fmt)
+    if not to_stdout and os.path.exists(path):
+        print(f"[download] {path} has already been downloaded", flush=True)
+        return 0
+    print(f"[download] Destination: {path}", file=log, flush=True)
+
+    rate_limit = int(args.limit_rate) if args.limit_rate and args.limit_rate.isdigit() else None
+    progress = ProgressWriter(args.progress_template, fmt.get('filesize'), rate_limit, log)
+    try:
+        with (os.fdopen(sys.stdout.fileno(), 'wb', closefd=False) if to_stdout else open(path + '.part', 'wb')) as part:
+            if fmt.get('protocol') == 'm3u8_native':
+                download_hls(fmt, part, progress, args.concurrent_fragments)
+            else:
+                download_http(fmt, part, progress)
+    except OSError as e:
+        # В том числе BrokenPipeError: читающий процесс (FFmpeg) завершился
+        print(f"ERROR: [fake] {info['id']}: {e}", file=sys.stderr)
+        return 1
+    progress.emit('finished')
+    if not to_stdout:
+        os.replace(path + '.part', path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
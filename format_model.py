@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Компактная модель форматов видео
+
+MediaFormat - запись формата со __slots__ и разобранными числовыми полями
+вместо словаря на ~20 ключей: строки (ID, кодеки, расширение) берутся из
+JSON yt-dlp без копирования, а строки для показа (quality, resolution,
+note) вычисляются при обращении. Доступ по ключу (fmt['id'], fmt.get('tbr'))
+сохранен, поэтому код, работающий со словарями форматов, не меняется.
+
+FormatList - список форматов с индексами по ID и по типу (video-only,
+audio-only, видео с аудио), которые строятся один раз при создании:
+поиск формата по ID и перебор форматов одного типа не проходят весь список.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+
+# Тип формата
+KIND_VIDEO_ONLY = 'video'
+KIND_AUDIO_ONLY = 'audio'
+KIND_AV = 'av'
+
+
+def _int(value) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class MediaFormat:
+    """Один формат из массива formats JSON-информации yt-dlp"""
+
+    __slots__ = ('id', 'extension', 'vcodec', 'acodec', 'kind', 'width', 'height', 'fps',
+                 'tbr', 'vbr', 'abr', 'filesize', 'filesize_approx', 'protocol', 'format_note',
+                 '_resolution')
+
+    # Ключи словаря формата (to_dict и доступ по ключу)
+    KEYS = ('id', 'extension', 'resolution', 'quality', 'note', 'is_video_only', 'is_audio_only',
+            'has_audio', 'width', 'height', 'fps', 'tbr', 'vbr', 'abr', 'vcodec', 'acodec',
+            'filesize', 'filesize_approx', 'protocol')
+    _KEY_SET = frozenset(KEYS)
+
+    def __init__(self, format_id: str, extension: str = 'unknown', vcodec: Optional[str] = None,
+                 acodec: Optional[str] = None, width=None, height=None, fps=None, tbr=None, vbr=None,
+                 abr=None, filesize=None, filesize_approx=None, protocol: Optional[str] = None,
+                 format_note: Optional[str] = None, resolution: Optional[str] = None):
+        self.id = format_id
+        self.extension = extension
+        self.vcodec = vcodec
+        self.acodec = acodec
+        if vcodec != 'none' and acodec == 'none':
+            self.kind = KIND_VIDEO_ONLY
+        elif vcodec == 'none' and acodec != 'none':
+            self.kind = KIND_AUDIO_ONLY
+        else:
+            self.kind = KIND_AV
+        self.width = _int(width)
+        self.height = _int(height)
+        self.fps = _float(fps)
+        self.tbr = _float(tbr)
+        self.vbr = _float(vbr)
+        self.abr = _float(abr)
+        self.filesize = _int(filesize)
+        self.filesize_approx = _int(filesize_approx)
+        self.protocol = protocol
+        self.format_note = format_note
+        self._resolution = resolution
+
+    @classmethod
+    def from_json(cls, fmt: Dict) -> Optional['MediaFormat']:
+        """Формат из элемента formats; None для раскадровок и форматов без ID"""
+        format_id = fmt.get('format_id')
+        vcodec = fmt.get('vcodec')
+        acodec = fmt.get('acodec')
+        # Раскадровки (storyboard) не содержат ни видео, ни аудио
+        if not format_id or (vcodec == 'none' and acodec == 'none'):
+            return None
+        return cls(format_id, fmt.get('ext') or 'unknown', vcodec, acodec, fmt.get('width'), fmt.get('height'),
+                   fmt.get('fps'), fmt.get('tbr'), fmt.get('vbr'), fmt.get('abr'), fmt.get('filesize'),
+                   fmt.get('filesize_approx'), fmt.get('protocol'), fmt.get('format_note'), fmt.get('resolution'))
+
+    @classmethod
+    def from_dict(cls, fmt: Dict) -> 'MediaFormat':
+        """Формат из словаря с ключами to_dict (форматы, построенные до модели)"""
+        if isinstance(fmt, cls):
+            return fmt
+        return cls(fmt['id'], fmt.get('extension') or 'unknown', fmt.get('vcodec'), fmt.get('acodec'), fmt.get('width'),
+                   fmt.get('height'), fmt.get('fps'), fmt.get('tbr'), fmt.get('vbr'), fmt.get('abr'),
+                   fmt.get('filesize'), fmt.get('filesize_approx'), fmt.get('protocol'), None,
+                   fmt.get('resolution'))
+
+    @property
+    def is_video_only(self) -> bool:
+        return self.kind == KIND_VIDEO_ONLY
+
+    @property
+    def is_audio_only(self) -> bool:
+        return self.kind == KIND_AUDIO_ONLY
+
+    @property
+    def has_audio(self) -> bool:
+        return self.kind == KIND_AV
+
+    @property
+    def quality(self) -> str:
+        """360p, 130k (аудио) или заметка формата"""
+        if self.height:
+            return f"{self.height}p"
+        if self.kind == KIND_AUDIO_ONLY and self.abr:
+            return f"{round(self.abr)}k"
+        return self.format_note or 'unknown'
+
+    @property
+    def resolution(self) -> str:
+        if self.kind == KIND_AUDIO_ONLY:
+            return 'audio only'
+        if self._resolution:
+            return self._resolution
+        return f"{self.width}x{self.height}" if self.width and self.height else 'unknown'
+
+    @property
+    def note(self) -> str:
+        """Заметка, кодеки и тип через запятую"""
+        if self.kind == KIND_VIDEO_ONLY:
+            parts = (self.format_note, self.vcodec, 'video only')
+        elif self.kind == KIND_AUDIO_ONLY:
+            parts = (self.format_note, self.acodec, 'audio only')
+        else:
+            parts = (self.format_note, self.vcodec, self.acodec)
+        return ', '.join(part for part in parts if part)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._KEY_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._KEY_SET
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self._KEY_SET else default
+
+    def to_dict(self) -> Dict:
+        """Формат в виде словаря (как до появления модели)"""
+        return {key: getattr(self, key) for key in self.KEYS}
+
+    def __repr__(self) -> str:
+        return f"MediaFormat({self.id!r}, {self.extension!r}, {self.kind}, {self.quality})"
+
+
+class FormatList(list):
+    """Форматы видео с индексами по ID и по типу
+
+    Индексы строятся при создании: список не изменяется после разбора JSON.
+    """
+
+    def __init__(self, formats: Iterable[MediaFormat] = ()):
+        super().__init__(formats)
+        self._by_id = {}
+        # with_video - video-only и форматы с аудио в исходном порядке
+        self.video_only, self.audio_only, self.with_audio, self.with_video = [], [], [], []
+        for fmt in self:
+            # При повторе ID остается первый формат (как при поиске перебором)
+            self._by_id.setdefault(fmt.id, fmt)
+            if fmt.kind == KIND_AUDIO_ONLY:
+                self.audio_only.append(fmt)
+                continue
+            self.with_video.append(fmt)
+            if fmt.kind == KIND_VIDEO_ONLY:
+                self.video_only.append(fmt)
+            else:
+                self.with_audio.append(fmt)
+
+    @classmethod
+    def from_info(cls, video_info: Dict) -> 'FormatList':
+        """Список форматов из массива formats в JSON-информации о видео"""
+        formats = (MediaFormat.from_json(fmt) for fmt in video_info.get('formats') or [])
+        return cls(fmt for fmt in formats if fmt is not None)
+
+    @classmethod
+    def of(cls, formats: Iterable) -> 'FormatList':
+        """formats как FormatList: список словарей форматов преобразуется, FormatList возвращается как есть"""
+        return formats if isinstance(formats, cls) else cls(MediaFormat.from_dict(fmt) for fmt in formats)
+
+    def by_id(self, format_id: str, default: Any = None) -> Any:
+        """Формат по ID или default"""
+        return self._by_id.get(format_id, default)
+
+    def to_dicts(self) -> List[Dict]:
+        return [fmt.to_dict() for fmt in self]
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Выбор формата по ограничениям на числовые поля форматов
+
+Политика - основа (best - видео с аудио, audio - только аудио) и ограничения
+через запятую:
+
+    best,size<=500M                  лучшее видео не больше 500 MB вместе с аудио
+    best,height<=1080,codec=av1/vp9  до 1080p, при равном качестве - AV1/VP9 (меньше байт)
+    audio,abr>=128,smallest          самое маленькое аудио от 128 кбит/с
+    best,container=mp4               пары кодеков, которые копируются в mp4 без перекодирования
+
+Ограничения: height, fps (<=, >=), abr (кбит/с), size (байты, суффиксы K/M/G);
+предпочтения: codec и acodec (семейства кодеков через /, см. merge_planner),
+container; smallest выбирает самый маленький подходящий вариант вместо лучшего.
+Для video-only формата аудиодорожка подбирается по тем же ограничениям:
+сначала копируемая в контейнер без перекодирования, затем с большим битрейтом.
+Выбранная пара возвращается как "видео+аудио" (137+140), как в yt-dlp.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from format_model import FormatList, MediaFormat
+from merge_planner import CONTAINER_CODECS, DEFAULT_CONTAINERS, codec_family, plan_merge
+
+
+# Готовые политики (для списков в окне и подсказок в консоли)
+FORMAT_PRESETS = {
+    'best': 'best',
+    'audio': 'audio',
+    'best-500mb': 'best,size<=500M',
+    '1080p-compact': 'best,height<=1080,codec=av1/vp9',
+    'audio-small': 'audio,abr>=128,smallest',
+    'mp4': 'best,container=mp4',
+}
+FORMAT_POLICIES = tuple(FORMAT_PRESETS)
+# Стратегии объединения от лучшей к худшей (см. merge_planner.plan_merge)
+MERGE_STRATEGY_RANK = {'copy': 3, 'container_switch': 2, 'transcode_audio': 1, 'transcode': 0}
+
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+_CONSTRAINT_RE = re.compile(r'(height|fps|abr|size)\s*(<=|>=|≤|≥)\s*([\d.]+)\s*([a-z]*)', re.IGNORECASE)
+
+
+class FormatQuery(NamedTuple):
+    """Разобранная политика выбора формата"""
+    kind: str = 'best'
+    min_height: Optional[int] = None
+    max_height: Optional[int] = None
+    min_fps: Optional[float] = None
+    max_fps: Optional[float] = None
+    min_abr: Optional[float] = None
+    max_abr: Optional[float] = None
+    max_size: Optional[int] = None
+    vcodecs: Tuple[str, ...] = ()
+    acodecs: Tuple[str, ...] = ()
+    container: Optional[str] = None
+    smallest: bool = False
+
+
+def parse_policy(policy: str) -> FormatQuery:
+    """Политика из строки или имени готовой политики; ValueError, если строка не разобрана"""
+    text = FORMAT_PRESETS.get(policy.strip(), policy)
+    values = {}
+    for index, token in enumerate(filter(None, (part.strip() for part in text.split(',')))):
+        lowered = token.lower()
+        match = _CONSTRAINT_RE.fullmatch(token)
+        if lowered in ('best', 'audio'):
+            if index:
+                raise ValueError(f"Основа политики должна быть первой: {token}")
+            values['kind'] = lowered
+        elif lowered == 'smallest':
+            values['smallest'] = True
+        elif match:
+            name, op, number, unit = match.groups()
+            bound = 'max' if op in ('<=', '≤') else 'min'
+            if name.lower() == 'size':
+                if bound == 'min' or unit.upper().rstrip('B') not in _SIZE_UNITS:
+                    raise ValueError(f"Неверное ограничение размера: {token} (пример: size<=500M)")
+                values['max_size'] = int(float(number) * _SIZE_UNITS[unit.upper().rstrip('B')])
+            elif unit.lower() not in ('', 'p', 'k', 'kbps', 'fps'):
+                raise ValueError(f"Неверная единица в ограничении: {token}")
+            else:
+                value = float(number)
+                values[f"{bound}_{name.lower()}"] = int(value) if name.lower() == 'height' else value
+        elif lowered.startswith(('codec=', 'vcodec=', 'acodec=')):
+            key, _, families = lowered.partition('=')
+            codecs = tuple(codec_family(name) or name for name in families.split('/') if name)
+            values['acodecs' if key == 'acodec' else 'vcodecs'] = codecs
+        elif lowered.startswith('container='):
+            container = lowered.partition('=')[2]
+            if container not in CONTAINER_CODECS:
+                raise ValueError(f"Неизвестный контейнер: {container} (доступны: {', '.join(CONTAINER_CODECS)})")
+            values['container'] = container
+        else:
+            raise ValueError(f"Неизвестная политика выбора формата: {token} "
+                             f"(готовые: {', '.join(FORMAT_POLICIES)})")
+    return FormatQuery(**values)
+
+
+def estimate_format_size(fmt: Dict, duration: Optional[float]) -> Tuple[Optional[int], bool]:
+    """Размер одного формата: (байты, точный ли размер)
+
+    Порядок: filesize, затем filesize_approx, затем средний битрейт × длительность
+    (tbr, а без него - сумма vbr и abr).
+    """
+    if fmt.get('filesize'):
+        return int(fmt['filesize']), True
+    if fmt.get('filesize_approx'):
+        return int(fmt['filesize_approx']), False
+    bitrate = fmt.get('tbr') or (fmt.get('vbr') or 0) + (fmt.get('abr') or 0)
+    if bitrate and duration:
+        # Битрейт в кбит/с
+        return int(bitrate * 1000 / 8 * duration), False
+    return None, False
+
+
+@lru_cache(maxsize=256)
+def _merge_rank(vcodec: Optional[str], acodec: Optional[str], containers: Tuple[str, ...]) -> int:
+    # Пар кодеков у видео немного, а проверяется каждая пара видео и аудио
+    return MERGE_STRATEGY_RANK[plan_merge(vcodec, acodec, containers).strategy]
+
+
+@lru_cache(maxsize=256)
+def _family(codec: Optional[str]) -> Optional[str]:
+    return codec_family(codec)
+
+
+def _within(value, low, high) -> bool:
+    value = value or 0
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def _preference(family: Optional[str], preferred: Tuple[str, ...]) -> int:
+    """Чем раньше семейство кодека в списке предпочтений, тем больше"""
+    return len(preferred) - preferred.index(family) if family in preferred else 0
+
+
+def _total_size(formats: Tuple[MediaFormat, ...], duration: Optional[float]) -> Optional[int]:
+    sizes = [estimate_format_size(fmt, duration)[0] for fmt in formats]
+    return None if None in sizes else sum(sizes)
+
+
+def _fits_size(formats: Tuple[MediaFormat, ...], query: FormatQuery, duration: Optional[float]) -> bool:
+    # С ограничением размера форматы неизвестного размера не выбираются
+    if query.max_size is None:
+        return True
+    size = _total_size(formats, duration)
+    return size is not None and size <= query.max_size
+
+
+def _audio_candidates(formats: FormatList, video: Optional[Dict], query: FormatQuery,
+                      duration: Optional[float]) -> List[Tuple[tuple, MediaFormat]]:
+    """Подходящие под политику дорожки с ключом сравнения (больше - лучше)"""
+    containers = (query.container,) if query.container else DEFAULT_CONTAINERS
+    vcodec = video['vcodec'] if video is not None else None
+    candidates = []
+    for fmt in formats.audio_only:
+        abr = fmt.abr or fmt.tbr
+        if not _within(abr, query.min_abr, query.max_abr):
+            continue
+        # Ограничение размера пары проверяется при выборе видео
+        if video is None and not _fits_size((fmt,), query, duration):
+            continue
+        merge = _merge_rank(vcodec, fmt.acodec, containers) if video is not None else 0
+        size = estimate_format_size(fmt, duration)[0]
+        preference = _preference(_family(fmt.acodec), query.acodecs)
+        if query.smallest:
+            key = (preference, merge, -(size if size is not None else float('inf')))
+        else:
+            key = (preference, merge, abr or 0, -(size or 0))
+        candidates.append((key, fmt))
+    return candidates
+
+
+def _best(candidates: List[tuple]):
+    return max(candidates, key=lambda candidate: candidate[0]) if candidates else None
+
+
+def pick_audio(formats: List[Dict], video: Optional[Dict] = None, query: Optional[FormatQuery] = None,
+               duration: Optional[float] = None) -> Optional[MediaFormat]:
+    """Аудиодорожка по политике (для video-only формата - для объединения с ним)
+
+    С видео предпочитается дорожка, которая вместе с ним копируется в контейнер
+    без перекодирования; затем - больший битрейт (или меньший размер при smallest).
+    formats - FormatList или список словарей форматов.
+    """
+    best = _best(_audio_candidates(FormatList.of(formats), video, query or FormatQuery(), duration))
+    return best[1] if best else None
+
+
+def _video_key(video: MediaFormat, audio: Optional[MediaFormat], query: FormatQuery,
+               duration: Optional[float]) -> tuple:
+    preference = _preference(_family(video.vcodec), query.vcodecs)
+    if audio:
+        containers = (query.container,) if query.container else DEFAULT_CONTAINERS
+        merge = _merge_rank(video.vcodec, audio.acodec, containers)
+    else:
+        # Формат с аудио не объединяется: подходит, если уже в нужном контейнере
+        merge = MERGE_STRATEGY_RANK['copy'] if video.extension == (query.container or video.extension) else 0
+    if query.smallest:
+        size = _total_size((video, audio) if audio else (video,), duration)
+        return preference, merge, -(size if size is not None else float('inf'))
+    bitrate = (video.tbr or video.vbr or 0) + ((audio.abr or audio.tbr or 0) if audio else 0)
+    return video.height or 0, video.fps or 0, preference, merge, bitrate
+
+
+def select_format(formats: List[Dict], policy: str = 'best', ffmpeg_available: bool = True,
+                  duration: Optional[float] = None) -> Optional[str]:
+    """ID формата ("видео+аудио" для video-only) по политике или None, если ничего не подходит
+
+    Без FFmpeg video-only форматы не рассматриваются (их не с чем объединить).
+    """
+    query = parse_policy(policy)
+    # Индексы по типу строятся один раз: дорожки подбираются для каждого video-only формата
+    formats = FormatList.of(formats)
+    if query.kind == 'audio':
+        audio = pick_audio(formats, query=query, duration=duration)
+        return audio.id if audio else None
+
+    candidates = []
+    for fmt in formats.with_video if ffmpeg_available else formats.with_audio:
+        if not (_within(fmt.height, query.min_height, query.max_height)
+                and _within(fmt.fps, query.min_fps, query.max_fps)):
+            continue
+        audio = None
+        if fmt.is_video_only:
+            tracks = _audio_candidates(formats, fmt, query, duration)
+            if query.max_size is not None:
+                # В лимит размера может войти пара с другой дорожкой, в том числе требующей
+                # перекодирования: из вошедших берется лучшая
+                tracks = [track for track in tracks if _fits_size((fmt, track[1]), query, duration)]
+            if not tracks:
+                continue
+            audio = _best(tracks)[1]
+        elif not _fits_size((fmt,), query, duration):
+            continue
+        candidates.append((_video_key(fmt, audio, query, duration), fmt, audio))
+    if not candidates:
+        return None
+    _, video, audio = max(candidates, key=lambda candidate: candidate[0])
+    return f"{video.id}+{audio.id}" if audio else video.id
+
+
+def split_format_id(format_id: str) -> Tuple[str, Optional[str]]:
+    """"137+140" -> ('137', '140'), "22" -> ('22', None)"""
+    video_id, _, audio_id = format_id.partition('+')
+    return video_id, audio_id or None
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Журнал задач скачивания: append-only JSON lines на диске
+
+Каждое изменение задачи дописывается отдельной строкой и сбрасывается на
+диск (fsync), поэтому после падения или закрытия приложения известно, какие
+задачи не завершены и какие этапы (видео, аудио, объединение) уже пройдены.
+
+    {"key": "3f2a...", "event": "queued", "time": 1700000000.0, "url": "...", ...}
+    {"key": "3f2a...", "event": "video_fetched", "time": ...}
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from disk_cache import default_cache_dir
+
+
+# Этапы задачи и события, после которых задача не возобновляется
+PHASE_EVENTS = {
+    'video': 'video_fetched',
+    'audio': 'audio_fetched',
+    'merge': 'merged',
+}
+TERMINAL_EVENTS = ('done', 'error', 'cancelled')
+
+
+class JobJournal:
+    """Журнал задач с восстановлением незавершенных после перезапуска"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(default_cache_dir(), 'jobs.jsonl')
+        self._lock = threading.Lock()
+
+    def record(self, key: str, event: str, **data):
+        """Дописывает событие задачи и сбрасывает его на диск"""
+        entry = {'key': key, 'event': event, 'time': time.time()}
+        entry.update(data)
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _read(self) -> List[Dict]:
+        entries = []
+        try:
+            with open(self.path, encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # Строка, недописанная при падении
+                        continue
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def states(self) -> Dict[str, Dict]:
+        """Последнее состояние каждой задачи: поля всех событий и список пройденных этапов"""
+        states: Dict[str, Dict] = {}
+        for entry in self._read():
+            state = states.setdefault(entry['key'], {'events': []})
+            state['events'].append(entry['event'])
+            state.update({k: v for k, v in entry.items() if k not in ('event', 'time')})
+            state['last_event'] = entry['event']
+        return states
+
+    def unfinished(self) -> List[Dict]:
+        """Задачи без завершающего события, в порядке добавления"""
+        return [state for state in self.states().values() if state['last_event'] not in TERMINAL_EVENTS]
+
+    def compact(self) -> int:
+        """Переписывает журнал, оставляя только незавершенные задачи; возвращает их число
+
+        Новый файл пишется рядом и подменяет старый атомарно.
+        """
+        with self._lock:
+            entries = self._read()
+            finished = {e['key'] for e in entries if e['event'] in TERMINAL_EVENTS}
+            kept = [e for e in entries if e['key'] not in finished]
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entry in kept:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        return len({e['key'] for e in kept})
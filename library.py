@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Библиотека скачанных файлов (SQLite): повторно одно и то же не скачивается
+
+Запись - готовый файл задачи по ключу (ID видео, выбор формата, папка
+загрузок): путь, размер, SHA-256 и время изменения. Выбор формата - ID
+формата или политика очереди ('policy:best'), поэтому повторно отправленный
+пакет пропускается еще до получения информации о видео. Запись действительна,
+пока файл на месте с тем же размером и временем изменения.
+
+Скачивание одного ключа защищено блокировкой файла (flock, на Windows -
+msvcrt.locking): второй процесс ждет первый и затем находит готовый файл в
+библиотеке. Отключается через YTDL_LIBRARY=0.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from cancellation import CancelToken
+from disk_cache import default_cache_dir
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+# Размер блока при подсчете контрольной суммы
+HASH_CHUNK = 1024 * 1024
+# Интервал повторных попыток занять ключ, который скачивает другой процесс (сек)
+LOCK_POLL_INTERVAL = 0.2
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 файла (читается блоками, без загрузки целиком в память)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def policy_selection(policy: str) -> str:
+    """Выбор формата для задачи очереди без явного ID формата"""
+    return f"policy:{policy}"
+
+
+class LibraryIndex:
+    """Скачанные файлы по ключу (ID видео, выбор формата, папка загрузок)"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(default_cache_dir(), 'library.sqlite3')
+        self.lock_dir = os.path.join(os.path.dirname(os.path.abspath(self.path)), 'library-locks')
+        os.makedirs(self.lock_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS downloads (
+                    video_id TEXT NOT NULL,
+                    selection TEXT NOT NULL,
+                    output_dir TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    mtime REAL NOT NULL,
+                    completed_at REAL NOT NULL,
+                    PRIMARY KEY (video_id, selection, output_dir)
+                )
+            ''')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _key(video_id: str, selection: str, output_dir: str) -> tuple:
+        return video_id, selection, os.path.abspath(output_dir)
+
+    def lookup(self, video_id: str, selection: str, output_dir: str) -> Optional[Dict]:
+        """Запись о готовом файле или None; запись об измененном или удаленном файле удаляется"""
+        key = self._key(video_id, selection, output_dir)
+        with self._connect() as conn:
+            row = conn.execute('SELECT path, size, sha256, mtime, completed_at FROM downloads '
+                               'WHERE video_id = ? AND selection = ? AND output_dir = ?', key).fetchone()
+        if row is None:
+            return None
+        entry = dict(zip(('path', 'size', 'sha256', 'mtime', 'completed_at'), row))
+        try:
+            stat = os.stat(entry['path'])
+        except OSError:
+            stat = None
+        if stat is None or stat.st_size != entry['size'] or stat.st_mtime != entry['mtime']:
+            self.forget(video_id, selection, output_dir)
+            return None
+        return dict(entry, video_id=video_id, selection=selection, output_dir=key[2])
+
+    def record(self, video_id: str, selection: str, output_dir: str, path: str) -> Dict:
+        """Добавляет готовый файл (контрольная сумма считается по файлу)"""
+        stat = os.stat(path)
+        entry = {'path': os.path.abspath(path), 'size': stat.st_size, 'sha256': file_sha256(path),
+                 'mtime': stat.st_mtime, 'completed_at': time.time()}
+        key = self._key(video_id, selection, output_dir)
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO downloads (video_id, selection, output_dir, path, size, sha256, '
+                         'mtime, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         key + (entry['path'], entry['size'], entry['sha256'], entry['mtime'],
+                                entry['completed_at']))
+        return dict(entry, video_id=video_id, selection=selection, output_dir=key[2])
+
+    def forget(self, video_id: str, selection: str, output_dir: str):
+        """Удаление записи"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM downloads WHERE video_id = ? AND selection = ? AND output_dir = ?',
+                         self._key(video_id, selection, output_dir))
+
+    def entries(self, output_dir: Optional[str] = None, video_id: Optional[str] = None) -> List[Dict]:
+        """Записи (всех папок или одной папки загрузок, всех видео или одного), новые первыми"""
+        query = 'SELECT video_id, selection, output_dir, path, size, sha256, mtime, completed_at FROM downloads'
+        conditions, params = [], []
+        if output_dir is not None:
+            conditions.append('output_dir = ?')
+            params.append(os.path.abspath(output_dir))
+        if video_id is not None:
+            conditions.append('video_id = ?')
+            params.append(video_id)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        with self._connect() as conn:
+            rows = conn.execute(query + ' ORDER BY completed_at DESC', params).fetchall()
+        names = ('video_id', 'selection', 'output_dir', 'path', 'size', 'sha256', 'mtime', 'completed_at')
+        return [dict(zip(names, row)) for row in rows]
+
+    def verify(self, entry: Dict) -> bool:
+        """Совпадает ли содержимое файла с контрольной суммой записи"""
+        try:
+            return file_sha256(entry['path']) == entry['sha256']
+        except OSError:
+            return False
+
+    @contextmanager
+    def lock(self, video_id: str, selection: str, output_dir: str,
+             cancel_token: Optional[CancelToken] = None) -> Iterator[None]:
+        """Блокировка скачивания ключа между процессами (и потоками одного процесса)
+
+        Пока ключ занят, попытки повторяются; отмена задачи прерывает ожидание (JobCancelled).
+        """
+        name = hashlib.sha256('\0'.join(self._key(video_id, selection, output_dir)).encode('utf-8')).hexdigest()
+        # Файлы блокировок не удаляются: иначе второй процесс мог бы заблокировать уже удаленный файл
+        fd = os.open(os.path.join(self.lock_dir, f"{name[:32]}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        locked = False
+        try:
+            while not locked:
+                try:
+                    if os.name == 'nt':
+                        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                    else:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                except OSError:
+                    if cancel_token:
+                        cancel_token.raise_if_cancelled()
+                    time.sleep(LOCK_POLL_INTERVAL)
+            yield
+        finally:
+            if locked and os.name == 'nt':
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            # Закрытие дескриптора снимает блокировку flock
+            os.close(fd)
@@ -1,615 +1,112 @@
 import sys
 import os
-import subprocess
-import re
-import json
-import glob
-from typing import List, Dict, Optional
+import time
+
+# Начало отсчета времени до первой отрисовки окна (до импорта PyQt)
+STARTED_AT = time.perf_counter()
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QLineEdit, QPushButton, 
                              QMessageBox, QTextEdit, QComboBox, QProgressBar,
                              QGroupBox, QGridLayout, QScrollArea, QFrame,
-                             QFileDialog, QHBoxLayout)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
+                             QFileDialog, QHBoxLayout, QSpinBox, QTableWidget,
+                             QTableWidgetItem, QHeaderView, QAbstractItemView, QCheckBox,
+                             QDoubleSpinBox)
+from PyQt5.QtCore import Qt, QObject, QThread, pyqtSignal, QTimer
 from PyQt5.QtGui import QFont, QPixmap
 
+from bandwidth import format_rate
+from cancellation import CancelToken, JobCancelled
+from download_queue import DownloadQueue, parse_url_list
+from downloader_core import STREAM_LABELS, YouTubeDownloader
+from engines import MAX_FRAGMENTS
+from format_model import FormatList
+from format_selector import FORMAT_POLICIES
+from job_journal import JobJournal
+from metadata_cache import is_playlist_url
+from tool_probe import probe_tools
 
-class YouTubeDownloader:
-    """Класс для скачивания видео с YouTube используя yt-dlp"""
-    
-    def __init__(self):
-        self.ytdlp_path = self._find_ytdlp()
-        if not self.ytdlp_path:
-            raise RuntimeError("yt-dlp не найден! Установите его: pip install yt-dlp")
-        
-        # Проверяем FFmpeg
-        self.ffmpeg_available = self._check_ffmpeg()
-        if not self.ffmpeg_available:
-            print("⚠️  Предупреждение: FFmpeg не найден. Video-only форматы могут не объединяться.")
-    
-    def _find_ytdlp(self) -> Optional[str]:
-        """Поиск yt-dlp в системе"""
-        try:
-            result = subprocess.run(['yt-dlp', '--version'], 
-                                  capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
-                return 'yt-dlp'
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            pass
-        
-        try:
-            result = subprocess.run([sys.executable, '-m', 'yt_dlp', '--version'], 
-                                  capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
-                return f"{sys.executable} -m yt_dlp"
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            pass
-        
-        return None
-    
-    def _check_ffmpeg(self) -> bool:
-        """Проверка наличия FFmpeg"""
-        try:
-            result = subprocess.run(['ffmpeg', '-version'], 
-                                  capture_output=True, text=True, timeout=10)
-            return result.returncode == 0
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            return False
-    
-    def get_video_info(self, url: str) -> Dict:
-        """Получение информации о видео"""
-        try:
-            # Разбиваем команду на части для лучшей обработки
-            if isinstance(self.ytdlp_path, str) and ' ' in self.ytdlp_path:
-                cmd = self.ytdlp_path.split() + [
-                    '--dump-json', 
-                    '--no-download',
-                    '--socket-timeout', '30',
-                    '--retries', '3',
-                    '--fragment-retries', '3',
-                    url
-                ]
-            else:
-                cmd = [
-                    self.ytdlp_path, 
-                    '--dump-json', 
-                    '--no-download',
-                    '--socket-timeout', '30',
-                    '--retries', '3',
-                    '--fragment-retries', '3',
-                    url
-                ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            
-            if result.returncode != 0:
-                error_msg = result.stderr.strip()
-                if "Video unavailable" in error_msg:
-                    raise RuntimeError("Видео недоступно или приватное")
-                elif "Private video" in error_msg:
-                    raise RuntimeError("Видео приватное")
-                elif "Video unavailable" in error_msg:
-                    raise RuntimeError("Видео недоступно")
-                elif "HTTP Error 403" in error_msg:
-                    raise RuntimeError("Доступ запрещен (403). Попробуйте другую ссылку")
-                elif "HTTP Error 404" in error_msg:
-                    raise RuntimeError("Видео не найдено (404)")
-                else:
-                    raise RuntimeError(f"Ошибка получения информации: {error_msg}")
-            
-            return json.loads(result.stdout)
-        except subprocess.TimeoutExpired:
-            raise RuntimeError("Таймаут при получении информации о видео (60 сек). Проверьте интернет-соединение")
-        except json.JSONDecodeError as e:
-            raise RuntimeError(f"Ошибка парсинга JSON: {e}")
-        except FileNotFoundError:
-            raise RuntimeError("yt-dlp не найден в системе")
-    
-    def get_format_size(self, url: str, format_id: str) -> str:
-        """Получение размера файла для конкретного формата"""
-        try:
-            # Получаем детальную информацию о формате
-            if isinstance(self.ytdlp_path, str) and ' ' in self.ytdlp_path:
-                cmd = self.ytdlp_path.split() + [
-                    '--dump-json',
-                    '--no-download',
-                    '--format', format_id,
-                    '--socket-timeout', '30',
-                    '--retries', '3',
-                    '--fragment-retries', '3',
-                    url
-                ]
-            else:
-                cmd = [
-                    self.ytdlp_path,
-                    '--dump-json',
-                    '--no-download',
-                    '--format', format_id,
-                    '--socket-timeout', '30',
-                    '--retries', '3',
-                    '--fragment-retries', '3',
-                    url
-                ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            
-            if result.returncode != 0:
-                return "Размер неизвестен"
-            
-            data = json.loads(result.stdout)
-            
-            # Ищем информацию о размере в форматах
-            if 'formats' in data:
-                for fmt in data['formats']:
-                    if fmt.get('format_id') == format_id:
-                        filesize = fmt.get('filesize')
-                        if filesize:
-                            return self._format_file_size(filesize)
-            
-            # Если не нашли в форматах, ищем общий размер
-            if 'filesize' in data and data['filesize']:
-                return self._format_file_size(data['filesize'])
-            
-            return "Размер неизвестен"
-            
-        except Exception:
-            return "Размер неизвестен"
-    
-    def _format_file_size(self, size_bytes: int) -> str:
-        """Форматирование размера файла"""
-        if size_bytes is None:
-            return "Размер неизвестен"
-        
-        if size_bytes >= 1024 * 1024 * 1024:  # GB
-            return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
-        elif size_bytes >= 1024 * 1024:  # MB
-            return f"{size_bytes / (1024 * 1024):.1f} MB"
-        elif size_bytes >= 1024:  # KB
-            return f"{size_bytes / 1024:.1f} KB"
-        else:
-            return f"{size_bytes} байт"
-    
-    def get_available_formats(self, url: str) -> List[Dict]:
-        """Получение доступных форматов видео"""
-        try:
-            # Разбиваем команду на части для лучшей обработки
-            if isinstance(self.ytdlp_path, str) and ' ' in self.ytdlp_path:
-                cmd = self.ytdlp_path.split() + [
-                    '--list-formats',
-                    '--socket-timeout', '30',
-                    '--retries', '3',
-                    '--fragment-retries', '3',
-                    url
-                ]
-            else:
-                cmd = [
-                    self.ytdlp_path, 
-                    '--list-formats',
-                    '--socket-timeout', '30',
-                    '--retries', '3',
-                    '--fragment-retries', '3',
-                    url
-                ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            
-            if result.returncode != 0:
-                error_msg = result.stderr.strip()
-                raise RuntimeError(f"Ошибка получения форматов: {error_msg}")
-            
-            return self._parse_formats(result.stdout)
-        except subprocess.TimeoutExpired:
-            raise RuntimeError("Таймаут при получении форматов (60 сек). Проверьте интернет-соединение")
-        except FileNotFoundError:
-            raise RuntimeError("yt-dlp не найден в системе")
-    
-    def _parse_formats(self, formats_output: str) -> List[Dict]:
-        """Парсинг вывода форматов yt-dlp"""
-        formats = []
-        lines = formats_output.split('\n')
-        
-        for line in lines:
-            if re.match(r'^\d+\s+', line):
-                parts = line.split()
-                if len(parts) >= 4:
-                    format_id = parts[0]
-                    extension = parts[1]
-                    resolution = parts[2] if len(parts) > 2 else "unknown"
-                    note = " ".join(parts[3:]) if len(parts) > 3 else ""
-                    
-                    is_video_only = "video only" in note.lower()
-                    is_audio_only = "audio only" in note.lower()
-                    has_audio = not is_video_only and not is_audio_only
-                    
-                    quality = self._extract_quality(resolution, note)
-                    
-                    formats.append({
-                        'id': format_id,
-                        'extension': extension,
-                        'resolution': resolution,
-                        'quality': quality,
-                        'note': note,
-                        'is_video_only': is_video_only,
-                        'is_audio_only': is_audio_only,
-                        'has_audio': has_audio
-                    })
-        
-        return formats
-    
-    def _extract_quality(self, resolution: str, note: str) -> str:
-        """Извлечение качества из разрешения и заметки"""
-        resolution_match = re.search(r'(\d+x\d+|\d+p)', resolution)
-        if resolution_match:
-            return resolution_match.group(1)
-        
-        note_match = re.search(r'(\d+x\d+|\d+p)', note)
-        if note_match:
-            return note_match.group(1)
-        
-        return resolution
-    
-    def download_video(self, url: str, format_id: str, output_dir: str = ".") -> Dict:
-        """Скачивание видео с выбранным форматом"""
-        try:
-            formats = self.get_available_formats(url)
-            selected_format = next((f for f in formats if f['id'] == format_id), None)
-            
-            if not selected_format:
-                raise ValueError(f"Формат {format_id} не найден")
-            
-            result = {
-                'success': False,
-                'video_file': None,
-                'audio_file': None,
-                'final_file': None,
-                'message': '',
-                'format_type': 'unknown'
-            }
-            
-            if selected_format['is_video_only']:
-                # Скачиваем video only + лучший аудио отдельно, затем объединяем
-                result['format_type'] = 'video_only'
-                return self._download_video_with_audio(url, format_id, output_dir, formats)
-                
-            elif selected_format['is_audio_only']:
-                # Скачиваем только аудио
-                result['format_type'] = 'audio_only'
-                return self._download_audio_only(url, format_id, output_dir)
-                
-            else:
-                # Скачиваем видео с аудио (обычный формат)
-                result['format_type'] = 'video_with_audio'
-                return self._download_video_with_audio_direct(url, format_id, output_dir)
-                
-        except subprocess.TimeoutExpired:
-            raise RuntimeError("Таймаут при скачивании видео")
-    
-    def _download_video_with_audio(self, url: str, video_format_id: str, output_dir: str, formats: List[Dict]) -> Dict:
-        """Скачивание video only + аудио с последующим объединением"""
-        result = {
-            'success': False,
-            'video_file': None,
-            'audio_file': None,
-            'final_file': None,
-            'message': '',
-            'format_type': 'video_only'
-        }
-        
-        try:
-            # Находим лучший аудио формат
-            audio_formats = [f for f in formats if f['is_audio_only']]
-            if not audio_formats:
-                raise RuntimeError("Не найден аудио формат для объединения")
-            
-            # Сортируем аудио форматы по приоритету
-            audio_formats.sort(key=lambda x: (
-                x['extension'] == 'mp3',
-                x['extension'] == 'm4a', 
-                x['extension'] == 'webm',
-                x['quality']
-            ), reverse=True)
-            
-            best_audio = audio_formats[0]
-            
-            # Сразу используем ручное объединение, так как yt-dlp с + не всегда работает корректно
-            print("Используем ручное объединение для гарантированного результата...")
-            return self._download_and_merge_manually(url, video_format_id, best_audio['id'], output_dir)
-                
-        except Exception as e:
-            result['message'] = f"Ошибка при скачивании video+audio: {e}"
-            
-        return result
-    
-    def _download_and_merge_manually(self, url: str, video_format_id: str, audio_format_id: str, output_dir: str) -> Dict:
-        """Альтернативный метод: скачивание и ручное объединение"""
-        result = {
-            'success': False,
-            'video_file': None,
-            'audio_file': None,
-            'final_file': None,
-            'message': '',
-            'format_type': 'video_only'
-        }
-        
-        try:
-            # Проверяем наличие FFmpeg
-            if not self.ffmpeg_available:
-                raise RuntimeError("FFmpeg не найден! Установите FFmpeg для объединения video-only форматов.")
-            
-            # Получаем название видео для финального файла
-            video_info = self.get_video_info(url)
-            title = video_info.get('title', 'video')
-            # Очищаем название от недопустимых символов
-            title = re.sub(r'[<>:"/\\|?*]', '_', title)
-            final_file = os.path.join(output_dir, f"{title}.mp4")
-            
-            # Генерируем уникальные имена для временных файлов
-            import time
-            timestamp = str(int(time.time()))
-            temp_video = os.path.join(output_dir, f"temp_video_{timestamp}.%(ext)s")
-            temp_audio = os.path.join(output_dir, f"temp_audio_{timestamp}.%(ext)s")
-            
-            # Скачиваем видео отдельно
-            video_cmd = [
-                self.ytdlp_path,
-                '--format', video_format_id,
-                '--output', temp_video,
-                '--no-playlist'
-            ]
-            
-            print(f"Скачивание видео: {' '.join(video_cmd + [url])}")
-            video_result = subprocess.run(video_cmd + [url], capture_output=True, text=True, timeout=300)
-            
-            if video_result.returncode != 0:
-                raise RuntimeError(f"Ошибка скачивания видео: {video_result.stderr}")
-            
-            # Скачиваем аудио отдельно
-            audio_cmd = [
-                self.ytdlp_path,
-                '--format', audio_format_id,
-                '--output', temp_audio,
-                '--no-playlist'
-            ]
-            
-            print(f"Скачивание аудио: {' '.join(audio_cmd + [url])}")
-            audio_result = subprocess.run(audio_cmd + [url], capture_output=True, text=True, timeout=300)
-            
-            if audio_result.returncode != 0:
-                raise RuntimeError(f"Ошибка скачивания аудио: {audio_result.stderr}")
-            
-            # Ищем скачанные файлы
-            video_pattern = os.path.join(output_dir, f"temp_video_{timestamp}.*")
-            audio_pattern = os.path.join(output_dir, f"temp_audio_{timestamp}.*")
-            
-            video_files = glob.glob(video_pattern)
-            audio_files = glob.glob(audio_pattern)
-            
-            if not video_files or not audio_files:
-                print(f"Ищем файлы по паттернам:")
-                print(f"  Видео: {video_pattern}")
-                print(f"  Аудио: {audio_pattern}")
-                print(f"  Найдено видео: {video_files}")
-                print(f"  Найдено аудио: {audio_files}")
-                raise RuntimeError("Не удалось найти скачанные файлы")
-            
-            video_file = video_files[0]
-            audio_file = audio_files[0]
-            
-            print(f"Найдены файлы:")
-            print(f"  Видео: {video_file}")
-            print(f"  Аудио: {audio_file}")
-            
-            # Объединяем с помощью ffmpeg
-            ffmpeg_cmd = [
-                'ffmpeg',
-                '-i', video_file,
-                '-i', audio_file,
-                '-c:v', 'copy',
-                '-c:a', 'aac',
-                '-y',  # Перезаписывать файл если существует
-                final_file
-            ]
-            
-            print(f"Объединение файлов: {' '.join(ffmpeg_cmd)}")
-            merge_result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, timeout=300)
-            
-            if merge_result.returncode != 0:
-                print(f"Ошибка FFmpeg stderr: {merge_result.stderr}")
-                print(f"Ошибка FFmpeg stdout: {merge_result.stdout}")
-                raise RuntimeError(f"Ошибка объединения: {merge_result.stderr}")
-            
-            # Проверяем, что финальный файл создан
-            if not os.path.exists(final_file):
-                raise RuntimeError("Финальный файл не был создан")
-            
-            # Удаляем временные файлы
-            try:
-                os.remove(video_file)
-                os.remove(audio_file)
-                print("Временные файлы удалены")
-            except Exception as e:
-                print(f"Предупреждение: не удалось удалить временные файлы: {e}")
-            
-            result['final_file'] = final_file
-            result['success'] = True
-            result['message'] = f"Видео и аудио успешно скачаны и объединены в: {os.path.basename(final_file)}"
-            
-        except Exception as e:
-            result['message'] = f"Ошибка при ручном объединении: {e}"
-            print(f"Ошибка: {e}")
-            
-        return result
-    
-    def _download_audio_only(self, url: str, audio_format_id: str, output_dir: str) -> Dict:
-        """Скачивание только аудио"""
-        result = {
-            'success': False,
-            'video_file': None,
-            'audio_file': None,
-            'final_file': None,
-            'message': '',
-            'format_type': 'audio_only'
-        }
-        
-        try:
-            cmd = [
-                self.ytdlp_path,
-                '--format', audio_format_id,
-                '--output', os.path.join(output_dir, '%(title)s.%(ext)s'),
-                '--no-playlist'
-            ]
-            
-            result_cmd = subprocess.run(cmd + [url], capture_output=True, text=True, timeout=300)
-            
-            if result_cmd.returncode != 0:
-                raise RuntimeError(f"Ошибка скачивания: {result_cmd.stderr}")
-            
-            # Ищем скачанный файл
-            output_match = re.search(r'\[download\] Destination: (.+)', result_cmd.stdout)
-            if output_match:
-                result['final_file'] = output_match.group(1)
-                result['success'] = True
-                result['message'] = f"Аудио успешно скачано: {os.path.basename(result['final_file'])}"
-            else:
-                raise RuntimeError("Не удалось определить путь к скачанному файлу")
-                
-        except Exception as e:
-            result['message'] = f"Ошибка при скачивании аудио: {e}"
-            
-        return result
-    
-    def _download_video_with_audio_direct(self, url: str, format_id: str, output_dir: str) -> Dict:
-        """Скачивание видео с аудио напрямую"""
-        result = {
-            'success': False,
-            'video_file': None,
-            'audio_file': None,
-            'final_file': None,
-            'message': '',
-            'format_type': 'video_with_audio'
-        }
-        
-        try:
-            cmd = [
-                self.ytdlp_path,
-                '--format', format_id,
-                '--output', os.path.join(output_dir, '%(title)s.%(ext)s'),
-                '--no-playlist'
-            ]
-            
-            result_cmd = subprocess.run(cmd + [url], capture_output=True, text=True, timeout=300)
-            
-            if result_cmd.returncode != 0:
-                raise RuntimeError(f"Ошибка скачивания: {result_cmd.stderr}")
-            
-            # Ищем скачанный файл
-            output_match = re.search(r'\[download\] Destination: (.+)', result_cmd.stdout)
-            if output_match:
-                result['final_file'] = output_match.group(1)
-                result['success'] = True
-                result['message'] = f"Видео с аудио успешно скачано: {os.path.basename(result['final_file'])}"
-            else:
-                raise RuntimeError("Не удалось определить путь к скачанному файлу")
-                
-        except Exception as e:
-            result['message'] = f"Ошибка при скачивании: {e}"
-            
-        return result
+
+# Состояния задач очереди и политики выбора формата для добавленных списком ссылок
+JOB_STATE_LABELS = {
+    'queued': '⏳ В очереди',
+    'running': '⬇️ Скачивается',
+    'done': '✅ Готово',
+    'error': '❌ Ошибка',
+    'cancelled': '🚫 Отменено',
+}
+FORMAT_POLICY_LABELS = {
+    'best': 'Лучшее видео',
+    'audio': 'Только аудио',
+    'best-500mb': 'Лучшее до 500 MB',
+    '1080p-compact': 'До 1080p, AV1/VP9',
+    'audio-small': 'Компактное аудио (от 128 кбит/с)',
+    'mp4': 'MP4 без перекодирования',
+}
+MB = 1024 * 1024
+# Сколько ждать завершения отмененного InfoThread при закрытии окна
+INFO_THREAD_STOP_TIMEOUT_MS = 5000
 
 
 class InfoThread(QThread):
     """Поток для получения информации о видео"""
     progress = pyqtSignal(str)
     video_info_ready = pyqtSignal(dict)
-    formats_ready = pyqtSignal(list)
+    formats_ready = pyqtSignal(object)  # FormatList (индексы не теряются при передаче)
     error = pyqtSignal(str)
     
     def __init__(self, downloader, url):
         super().__init__()
         self.downloader = downloader
         self.url = url
+        self.cancel_token = CancelToken()
+    
+    def cancel(self):
+        """Остановка процесса yt-dlp; после отмены поток завершается без сигналов"""
+        self.cancel_token.cancel()
     
     def run(self):
         try:
             self.progress.emit("Получение информации о видео...")
-            video_info = self.downloader.get_video_info(self.url)
+            video_info = self.downloader.get_video_info(self.url, cancel_token=self.cancel_token)
+            if self.cancel_token.cancelled:
+                return
             self.video_info_ready.emit(video_info)
             
-            self.progress.emit("Получение доступных форматов...")
-            formats = self.downloader.get_available_formats(self.url)
-            self.formats_ready.emit(formats)
+            # Форматы берем из того же JSON, без повторного обращения к yt-dlp
+            self.progress.emit("Разбор доступных форматов...")
+            formats = self.downloader.formats_from_info(video_info)
+            if not self.cancel_token.cancelled:
+                self.formats_ready.emit(formats)
             
+        except JobCancelled:
+            pass
         except Exception as e:
-            self.error.emit(str(e))
+            if not self.cancel_token.cancelled:
+                self.error.emit(str(e))
 
 
-class FormatSizeThread(QThread):
-    """Поток для получения размера файла"""
-    size_ready = pyqtSignal(dict)
+class StartupThread(QThread):
+    """Поиск yt-dlp и FFmpeg и создание загрузчика вне потока GUI"""
+    ready = pyqtSignal(object)
     error = pyqtSignal(str)
     
-    def __init__(self, downloader, url, format_id, selected_format):
-        super().__init__()
-        self.downloader = downloader
-        self.url = url
-        self.format_id = format_id
-        self.selected_format = selected_format
-    
     def run(self):
         try:
-            # Получаем размер файла
-            size = self.downloader.get_format_size(self.url, self.format_id)
-            
-            # Определяем тип формата
-            if self.selected_format['is_video_only']:
-                format_type = 'video_only'
-            elif self.selected_format['is_audio_only']:
-                format_type = 'audio_only'
-            else:
-                format_type = 'video_with_audio'
-            
-            self.size_ready.emit({
-                'size': size,
-                'format_type': format_type
-            })
-            
-        except Exception as e:
+            tools = probe_tools()
+            print(f"⏱️  Проверка программ: {tools['probe_time']:.2f} сек"
+                  f"{' (из кэша)' if tools['cached'] else ''}")
+            downloader = YouTubeDownloader(tools=tools)
+            # Устаревшие записи кэша показываются сразу и обновляются в фоне
+            downloader.refresh_in_background = True
+            self.ready.emit(downloader)
+        except RuntimeError as e:
             self.error.emit(str(e))
 
 
-class DownloadThread(QThread):
-    """Поток для скачивания видео"""
-    progress = pyqtSignal(str)
-    finished = pyqtSignal(dict)  # Теперь передаем словарь с результатом
-    error = pyqtSignal(str)
-    
-    def __init__(self, downloader, url, format_id, output_dir="."):
-        super().__init__()
-        self.downloader = downloader
-        self.url = url
-        self.format_id = format_id
-        self.output_dir = output_dir
-    
-    def run(self):
-        try:
-            # Получаем информацию о выбранном формате
-            formats = self.downloader.get_available_formats(self.url)
-            selected_format = next((f for f in formats if f['id'] == self.format_id), None)
-            
-            if selected_format:
-                if selected_format['is_video_only']:
-                    self.progress.emit("Скачивание видео и аудио с последующим объединением...")
-                elif selected_format['is_audio_only']:
-                    self.progress.emit("Скачивание аудио...")
-                else:
-                    self.progress.emit("Скачивание видео с аудио...")
-            else:
-                self.progress.emit("Начинаем скачивание...")
-            
-            result = self.downloader.download_video(self.url, self.format_id, self.output_dir)
-            self.finished.emit(result)
-        except Exception as e:
-            self.error.emit(str(e))
+class QueueSignals(QObject):
+    """Передача обновлений задач очереди из рабочих потоков в поток GUI"""
+    job_updated = pyqtSignal(dict)
 
 
 class LinkInputWindow(QMainWindow):
@@ -617,17 +114,29 @@ class LinkInputWindow(QMainWindow):
         super().__init__()
         self.downloader = None
         self.video_info = None
-        self.formats = []
-        self.download_thread = None
+        self.formats = FormatList()
         self.info_thread = None
-        self.size_thread = None
+        self.startup_thread = None
+        self.first_paint_time = None  # сек от запуска до первой отрисовки окна
+        self.stopping_threads = set()  # отмененные потоки InfoThread, которые еще завершаются
         self.download_dir = os.getcwd()  # Текущая папка по умолчанию
+        
+        # Очередь загрузок: строки таблицы по номеру задачи
+        self.queue = None
+        self.queue_signals = QueueSignals()
+        self.queue_signals.job_updated.connect(self.on_job_updated)
+        self.job_rows = {}
+        self.single_jobs = set()  # задачи кнопки "Скачать": по завершении показываем сообщение
+        self.current_job_id = None
+        self.batch_jobs = set()  # задачи, добавленные с момента, когда очередь была пуста
+        
+        self.setAcceptDrops(True)
         self.init_ui()
         
     def init_ui(self):
         # Настройка основного окна
         self.setWindowTitle("YouTube Video Downloader")
-        self.setGeometry(300, 300, 800, 600)
+        self.setGeometry(300, 300, 800, 760)
         self.setMinimumSize(600, 400)
         
         # Центральный виджет
@@ -653,7 +162,7 @@ class LinkInputWindow(QMainWindow):
         url_group.setLayout(url_layout)
         
         self.link_input = QLineEdit()
-        self.link_input.setPlaceholderText("https://www.youtube.com/watch?v=...")
+        self.link_input.setPlaceholderText("https://www.youtube.com/watch?v=... (несколько ссылок - в очередь)")
         self.link_input.setFont(QFont("Arial", 11))
         url_layout.addWidget(self.link_input)
         
@@ -738,6 +247,92 @@ class LinkInputWindow(QMainWindow):
         
         main_layout.addWidget(self.format_group)
         
+        # Очередь загрузок: ссылки списком, перетаскиванием или из файла
+        queue_group = QGroupBox("Очередь загрузок (можно перетащить ссылки или .txt файл)")
+        queue_layout = QVBoxLayout()
+        queue_group.setLayout(queue_layout)
+        
+        queue_controls = QHBoxLayout()
+        queue_controls.addWidget(QLabel("Одновременно:"))
+        self.parallel_spin = QSpinBox()
+        self.parallel_spin.setRange(1, 8)
+        self.parallel_spin.setValue(2)
+        self.parallel_spin.valueChanged.connect(self.on_parallel_changed)
+        queue_controls.addWidget(self.parallel_spin)
+        
+        queue_controls.addWidget(QLabel("Формат:"))
+        self.policy_combo = QComboBox()
+        for policy in FORMAT_POLICIES:
+            self.policy_combo.addItem(FORMAT_POLICY_LABELS[policy], policy)
+        queue_controls.addWidget(self.policy_combo)
+        
+        # Параллельные фрагменты и aria2c применяются к задачам, добавленным после изменения
+        queue_controls.addWidget(QLabel("Фрагменты:"))
+        self.fragments_spin = QSpinBox()
+        self.fragments_spin.setRange(1, MAX_FRAGMENTS)
+        self.fragments_spin.setValue(1)
+        self.fragments_spin.setToolTip("Сколько фрагментов DASH/HLS одной загрузки качать одновременно")
+        self.fragments_spin.valueChanged.connect(self.on_transfer_changed)
+        queue_controls.addWidget(self.fragments_spin)
+        
+        self.aria2c_check = QCheckBox("aria2c")
+        self.aria2c_check.setEnabled(False)
+        self.aria2c_check.setToolTip("aria2c не найден")
+        self.aria2c_check.toggled.connect(self.on_transfer_changed)
+        queue_controls.addWidget(self.aria2c_check)
+        queue_controls.addStretch()
+        
+        self.paste_urls_button = QPushButton("Вставить ссылки")
+        self.paste_urls_button.clicked.connect(self.on_paste_urls_clicked)
+        queue_controls.addWidget(self.paste_urls_button)
+        
+        self.load_urls_button = QPushButton("Из файла...")
+        self.load_urls_button.clicked.connect(self.on_load_urls_clicked)
+        queue_controls.addWidget(self.load_urls_button)
+        
+        self.cancel_jobs_button = QPushButton("Отменить")
+        self.cancel_jobs_button.setToolTip("Отменить выбранные задачи (или все, если ничего не выбрано)")
+        self.cancel_jobs_button.clicked.connect(self.on_cancel_jobs_clicked)
+        queue_controls.addWidget(self.cancel_jobs_button)
+        
+        self.clear_finished_button = QPushButton("Убрать завершенные")
+        self.clear_finished_button.clicked.connect(self.on_clear_finished_clicked)
+        queue_controls.addWidget(self.clear_finished_button)
+        queue_layout.addLayout(queue_controls)
+        
+        # Общий лимит скорости делится между выполняемыми задачами
+        bandwidth_controls = QHBoxLayout()
+        bandwidth_controls.addWidget(QLabel("Лимит скорости, MB/s:"))
+        self.bandwidth_spin = QDoubleSpinBox()
+        self.bandwidth_spin.setRange(0, 1000)
+        self.bandwidth_spin.setSingleStep(0.5)
+        self.bandwidth_spin.setSpecialValueText("без лимита")
+        self.bandwidth_spin.setToolTip("Общий лимит всех загрузок, делится между ними поровну")
+        self.bandwidth_spin.valueChanged.connect(self.on_bandwidth_changed)
+        bandwidth_controls.addWidget(self.bandwidth_spin)
+        
+        bandwidth_controls.addWidget(QLabel("На задачу:"))
+        self.job_rate_spin = QDoubleSpinBox()
+        self.job_rate_spin.setRange(0, 1000)
+        self.job_rate_spin.setSingleStep(0.5)
+        self.job_rate_spin.setSpecialValueText("без лимита")
+        self.job_rate_spin.setToolTip("Ограничение одной загрузки (для задач, добавленных после изменения)")
+        self.job_rate_spin.valueChanged.connect(self.on_bandwidth_changed)
+        bandwidth_controls.addWidget(self.job_rate_spin)
+        bandwidth_controls.addStretch()
+        queue_layout.addLayout(bandwidth_controls)
+        
+        self.queue_table = QTableWidget(0, 5)
+        self.queue_table.setHorizontalHeaderLabels(["Видео", "Формат", "Состояние", "Прогресс", "Скорость / доля"])
+        self.queue_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.queue_table.verticalHeader().setVisible(False)
+        self.queue_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.queue_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.queue_table.setMinimumHeight(120)
+        queue_layout.addWidget(self.queue_table)
+        
+        main_layout.addWidget(queue_group)
+        
         # Прогресс бар
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
@@ -754,17 +349,73 @@ class LinkInputWindow(QMainWindow):
         # Фокус на поле ввода
         self.link_input.setFocus()
         
-        # Инициализация загрузчика
-        try:
-            self.downloader = YouTubeDownloader()
-            if self.downloader.ffmpeg_available:
-                self.status_label.setText("✅ yt-dlp и FFmpeg готовы к работе")
-            else:
-                self.status_label.setText("⚠️ yt-dlp готов, но FFmpeg не найден. Video-only форматы могут не объединяться.")
-        except RuntimeError as e:
-            self.status_label.setText(f"❌ {e}")
-            self.get_info_button.setEnabled(False)
+        # Загрузчик создается в фоне: окно отрисовывается, не дожидаясь проверки yt-dlp и FFmpeg
+        self.set_downloader_controls_enabled(False)
+        self.status_label.setText("🔍 Поиск yt-dlp и FFmpeg...")
+        self.startup_thread = StartupThread()
+        self.startup_thread.ready.connect(self.on_downloader_ready)
+        self.startup_thread.error.connect(self.on_downloader_error)
+        self.startup_thread.start()
+    
+    def paintEvent(self, event):
+        """Первая отрисовка окна: время от запуска (time-to-first-paint)"""
+        super().paintEvent(event)
+        if self.first_paint_time is None:
+            self.first_paint_time = time.perf_counter() - STARTED_AT
+            print(f"⏱️  Окно отрисовано через {self.first_paint_time:.2f} сек после запуска")
+    
+    def set_downloader_controls_enabled(self, enabled):
+        """Кнопки, которым нужен загрузчик"""
+        for button in (self.get_info_button, self.paste_urls_button, self.load_urls_button):
+            button.setEnabled(enabled)
+    
+    def on_downloader_ready(self, downloader):
+        """Загрузчик создан: очередь, настройки из окружения, возобновление задач"""
+        self.downloader = downloader
+        self.queue = DownloadQueue(self.downloader, self.parallel_spin.value(),
+                                   on_update=self.queue_signals.job_updated.emit,
+                                   journal=self.open_journal(),
+                                   fragments=self.fragments_spin.value())
+        if self.downloader.aria2c_path:
+            self.aria2c_check.setEnabled(True)
+            self.aria2c_check.setToolTip(f"Скачивать через {self.downloader.aria2c_path}: "
+                                         "несколько соединений на файл (по числу фрагментов)")
+        # Лимит из YTDL_BANDWIDTH_LIMIT; профиль по времени суток (YTDL_BANDWIDTH_PROFILE) остается в силе.
+        # Без него действуют значения, выставленные в окне, пока шла проверка программ
+        if self.downloader.bandwidth.base_limit:
+            self.bandwidth_spin.blockSignals(True)
+            self.bandwidth_spin.setValue(self.downloader.bandwidth.base_limit / MB)
+            self.bandwidth_spin.blockSignals(False)
+        self.on_bandwidth_changed()
+        self.set_downloader_controls_enabled(True)
+        if self.downloader.ffmpeg_available:
+            ytdlp = self.downloader.tools['ytdlp']
+            self.status_label.setText(f"✅ yt-dlp {ytdlp['version'] if ytdlp else ''} и "
+                                      f"FFmpeg {self.downloader.ffmpeg_info['version']} готовы к работе")
+        else:
+            self.status_label.setText("⚠️ yt-dlp готов, но FFmpeg не найден. Video-only форматы могут не объединяться.")
         
+        # Задачи, прерванные закрытием или падением приложения, продолжаются
+        resumed = self.queue.resume_unfinished()
+        if resumed:
+            self.status_label.setText(f"🔁 Возобновлено незавершенных загрузок: {resumed}")
+    
+    def on_downloader_error(self, error):
+        """yt-dlp не найден: получение информации и очередь недоступны"""
+        self.status_label.setText(f"❌ {error}")
+    
+    def open_journal(self):
+        """Журнал задач для возобновления после перезапуска (отключается через YTDL_JOURNAL=0)"""
+        if os.environ.get('YTDL_JOURNAL', '1') == '0':
+            return None
+        try:
+            journal = JobJournal()
+            journal.compact()
+            return journal
+        except OSError as e:
+            print(f"⚠️  Предупреждение: журнал задач недоступен: {e}")
+            return None
+    
     def on_get_info_clicked(self):
         """Обработчик нажатия кнопки 'Получить информацию'"""
         url = self.link_input.text().strip()
@@ -774,13 +425,21 @@ class LinkInputWindow(QMainWindow):
             return
         
         if not self.downloader:
+            if self.startup_thread and self.startup_thread.isRunning():
+                self.status_label.setText("⏳ yt-dlp и FFmpeg еще проверяются, попробуйте через секунду")
+                return
             QMessageBox.critical(self, "Ошибка", "yt-dlp не инициализирован!")
             return
         
+        # Несколько ссылок, плейлист или канал сразу уходят в очередь с выбранной политикой формата
+        urls = parse_url_list(url)
+        if len(urls) > 1 or (urls and is_playlist_url(urls[0])):
+            self.enqueue_urls(urls)
+            self.link_input.clear()
+            return
+        
         # Останавливаем предыдущий поток, если он запущен
-        if self.info_thread and self.info_thread.isRunning():
-            self.info_thread.terminate()
-            self.info_thread.wait()
+        self.stop_info_thread()
         
         # Создаем новый поток для получения информации
         self.info_thread = InfoThread(self.downloader, url)
@@ -827,6 +486,7 @@ class LinkInputWindow(QMainWindow):
     
     def on_formats_ready(self, formats):
         """Обработчик получения форматов"""
+        formats = FormatList.of(formats)
         self.formats = formats
         
         if not formats:
@@ -863,6 +523,10 @@ class LinkInputWindow(QMainWindow):
         self.download_button.setEnabled(True)
         self.status_label.setText("✅ Выберите формат для скачивания")
         self.get_info_button.setEnabled(True)
+        
+        # Статистика кэша метаданных (сэкономленные обращения к yt-dlp)
+        stats = self.downloader.cache_stats()
+        self.status_label.setToolTip(f"Кэш метаданных: попаданий {stats['hits']}, промахов {stats['misses']}")
     
     def on_info_error(self, error):
         """Обработчик ошибки получения информации"""
@@ -883,39 +547,26 @@ class LinkInputWindow(QMainWindow):
                 return
             
             # Находим выбранный формат
-            selected_format = next((f for f in self.formats if f['id'] == format_id), None)
+            selected_format = self.formats.by_id(format_id)
             if not selected_format:
                 self.size_label.setText("")
                 return
             
-            # Показываем загрузку размера
-            self.size_label.setText("📊 Получение размера файла...")
+            # Размер считается по уже полученным форматам, без обращения к yt-dlp
+            duration = (self.video_info or {}).get('duration')
+            size = self.downloader.describe_size(
+                self.downloader.estimate_download_size(self.formats, format_id, duration))
             
-            # Получаем размер файла в отдельном потоке
-            self.size_thread = FormatSizeThread(self.downloader, self.link_input.text().strip(), format_id, selected_format)
-            self.size_thread.size_ready.connect(self.on_size_ready)
-            self.size_thread.error.connect(self.on_size_error)
-            self.size_thread.start()
+            if selected_format['is_video_only']:
+                self.size_label.setText(f"📊 Размер: {size} (видео + аудио + объединение)")
+            elif selected_format['is_audio_only']:
+                self.size_label.setText(f"📊 Размер: {size} (только аудио)")
+            else:  # video_with_audio
+                self.size_label.setText(f"📊 Размер: {size} (видео с аудио)")
             
         except Exception as e:
             self.size_label.setText(f"❌ Ошибка: {e}")
     
-    def on_size_ready(self, size_info):
-        """Обработчик получения размера файла"""
-        format_type = size_info['format_type']
-        size = size_info['size']
-        
-        if format_type == 'video_only':
-            self.size_label.setText(f"📊 Размер: {size} (видео + аудио + объединение)")
-        elif format_type == 'audio_only':
-            self.size_label.setText(f"📊 Размер: {size} (только аудио)")
-        else:  # video_with_audio
-            self.size_label.setText(f"📊 Размер: {size} (видео с аудио)")
-    
-    def on_size_error(self, error):
-        """Обработчик ошибки получения размера"""
-        self.size_label.setText(f"❌ Размер неизвестен: {error}")
-    
     def on_browse_clicked(self):
         """Обработчик нажатия кнопки 'Выбрать папку'"""
         folder = QFileDialog.getExistingDirectory(
@@ -939,7 +590,7 @@ class LinkInputWindow(QMainWindow):
         url = self.link_input.text().strip()
         
         # Проверяем, является ли выбранный формат video-only
-        selected_format = next((f for f in self.formats if f['id'] == format_id), None)
+        selected_format = self.formats.by_id(format_id)
         if selected_format and selected_format['is_video_only'] and not self.downloader.ffmpeg_available:
             reply = QMessageBox.question(
                 self, 
@@ -953,48 +604,237 @@ class LinkInputWindow(QMainWindow):
             if reply == QMessageBox.No:
                 return
         
-        # Создаем поток для скачивания с выбранной папкой
-        self.download_thread = DownloadThread(self.downloader, url, format_id, self.download_dir)
-        self.download_thread.progress.connect(self.on_download_progress)
-        self.download_thread.finished.connect(self.on_download_finished)
-        self.download_thread.error.connect(self.on_download_error)
-        
-        # Показываем прогресс
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setRange(0, 0)  # Неопределенный прогресс
-        self.download_button.setEnabled(False)
+        # Задача с выбранным форматом идет в общую очередь
+        job_id = self.queue.add(url, self.download_dir, format_id=format_id)
+        self.single_jobs.add(job_id)
+        self.current_job_id = job_id
         self.cancel_button.setEnabled(True)
         self.status_label.setText(f"⬇️ Скачивание в папку: {self.download_dir}")
-        
-        # Запускаем скачивание
-        self.download_thread.start()
     
     def on_cancel_clicked(self):
         """Обработчик нажатия кнопки 'Отмена'"""
-        if self.download_thread and self.download_thread.isRunning():
-            self.download_thread.terminate()
-            self.download_thread.wait()
-        
-        self.progress_bar.setVisible(False)
-        self.download_button.setEnabled(True)
+        if self.current_job_id is not None:
+            self.queue.cancel(self.current_job_id)
         self.cancel_button.setEnabled(False)
-        self.status_label.setText("❌ Скачивание отменено")
+        self.status_label.setText("❌ Скачивание отменяется...")
+    
+    def enqueue_urls(self, urls):
+        """Добавление списка ссылок в очередь с выбранной политикой формата"""
+        if not self.queue:
+            QMessageBox.critical(self, "Ошибка", "yt-dlp не инициализирован!")
+            return
+        if not urls:
+            QMessageBox.warning(self, "Предупреждение", "Ссылки не найдены!")
+            return
+        policy = self.policy_combo.currentData()
+        self.queue.add_many(urls, self.download_dir, policy=policy)
+        self.status_label.setText(f"📥 Добавлено в очередь: {len(urls)} ({FORMAT_POLICY_LABELS[policy]})")
+    
+    def on_paste_urls_clicked(self):
+        """Обработчик нажатия кнопки 'Вставить ссылки' (из буфера обмена)"""
+        self.enqueue_urls(parse_url_list(QApplication.clipboard().text()))
+    
+    def on_load_urls_clicked(self):
+        """Обработчик нажатия кнопки 'Из файла...'"""
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Выберите файл со ссылками",
+            self.download_dir,
+            "Текстовые файлы (*.txt);;Все файлы (*)"
+        )
+        if path:
+            self.enqueue_urls(self.read_url_file(path))
     
-    def on_download_progress(self, message):
-        """Обработчик прогресса скачивания"""
-        self.status_label.setText(f"⬇️ {message}")
+    def read_url_file(self, path):
+        """Ссылки из текстового файла"""
+        try:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                return parse_url_list(f.read())
+        except OSError as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось прочитать файл: {e}")
+            return []
+    
+    def on_parallel_changed(self, value):
+        """Изменение числа одновременных загрузок"""
+        if self.queue:
+            self.queue.set_max_workers(value)
+    
+    def on_transfer_changed(self, *args):
+        """Число фрагментов и aria2c для новых задач"""
+        if self.queue:
+            self.queue.fragments = self.fragments_spin.value()
+            self.queue.use_aria2c = self.aria2c_check.isChecked()
+    
+    def on_bandwidth_changed(self, *args):
+        """Общий лимит скорости (сразу) и ограничение для новых задач"""
+        if not self.queue:
+            return
+        self.downloader.bandwidth.set_limit(int(self.bandwidth_spin.value() * MB) or None)
+        self.queue.rate_cap = int(self.job_rate_spin.value() * MB) or None
+    
+    def on_cancel_jobs_clicked(self):
+        """Отмена выбранных задач или всех, если ничего не выбрано"""
+        if not self.queue:
+            return
+        rows = {index.row() for index in self.queue_table.selectionModel().selectedRows()}
+        if not rows:
+            self.queue.cancel_all()
+            return
+        for job_id, row in self.job_rows.items():
+            if row in rows:
+                self.queue.cancel(job_id)
+    
+    def on_clear_finished_clicked(self):
+        """Удаление завершенных задач из таблицы"""
+        finished = [job_id for job_id, row in self.job_rows.items()
+                    if self.queue_table.item(row, 2).data(Qt.UserRole) in ('done', 'error', 'cancelled')]
+        for job_id in sorted(finished, key=self.job_rows.get, reverse=True):
+            self.queue_table.removeRow(self.job_rows.pop(job_id))
+        # Номера строк после удаления сдвинулись
+        for row in range(self.queue_table.rowCount()):
+            self.job_rows[self.queue_table.item(row, 0).data(Qt.UserRole)] = row
+    
+    def dragEnterEvent(self, event):
+        """Перетаскивание ссылок или текстовых файлов в окно"""
+        if event.mimeData().hasUrls() or event.mimeData().hasText():
+            event.acceptProposedAction()
+    
+    def dropEvent(self, event):
+        """Ссылки из перетащенного текста, ссылок браузера или .txt файлов"""
+        mime = event.mimeData()
+        urls = []
+        for qurl in mime.urls():
+            if qurl.isLocalFile():
+                urls.extend(self.read_url_file(qurl.toLocalFile()))
+            else:
+                urls.append(qurl.toString())
+        if not urls and mime.hasText():
+            urls = parse_url_list(mime.text())
+        event.acceptProposedAction()
+        self.enqueue_urls(list(dict.fromkeys(urls)))
+    
+    def on_job_updated(self, job):
+        """Обновление строки задачи в таблице (в потоке GUI)"""
+        job_id = job['job_id']
+        row = self.job_rows.get(job_id)
+        if row is None:
+            row = self.queue_table.rowCount()
+            self.queue_table.insertRow(row)
+            self.job_rows[job_id] = row
+            for column in (0, 1, 2, 4):
+                self.queue_table.setItem(row, column, QTableWidgetItem())
+            self.queue_table.item(row, 0).setData(Qt.UserRole, job_id)
+            bar = QProgressBar()
+            bar.setRange(0, 1000)
+            self.queue_table.setCellWidget(row, 3, bar)
+            self.batch_jobs.add(job_id)
+        
+        title_item = self.queue_table.item(row, 0)
+        title_item.setText(job['title'] or job['url'])
+        title_item.setToolTip(job['url'])
+        self.queue_table.item(row, 1).setText(job['format_id'] or FORMAT_POLICY_LABELS.get(job['policy'], ''))
+        
+        state_item = self.queue_table.item(row, 2)
+        state_item.setData(Qt.UserRole, job['state'])
+        state_text = JOB_STATE_LABELS[job['state']]
+        if job['state'] == 'running' and job['event']:
+            state_text = self.describe_progress(job['event'])
+        elif job['state'] == 'done' and (job['result'] or {}).get('skipped'):
+            state_text = "⏭️ Уже скачано"
+        state_item.setText(state_text)
+        state_item.setToolTip(job['error'] or (job['result'] or {}).get('final_file') or '')
+        
+        self.queue_table.item(row, 4).setText(self.describe_bandwidth(job))
+        
+        bar = self.queue_table.cellWidget(row, 3)
+        if job['state'] == 'done':
+            bar.setRange(0, 1000)
+            bar.setValue(1000)
+        elif job['percent'] is not None:
+            bar.setRange(0, 1000)
+            bar.setValue(int(job['percent'] * 10))
+        elif job['state'] == 'running' and job['event'] and job['event'].get('status') == 'started':
+            bar.setRange(0, 0)  # Размер пока неизвестен
+        elif job['state'] != 'running':
+            bar.setRange(0, 1000)
+        
+        if job_id == self.current_job_id and job['state'] == 'running' and job['event']:
+            self.status_label.setText(self.describe_progress(job['event']))
+        if job['state'] in ('done', 'error', 'cancelled') and job_id in self.single_jobs:
+            self.single_jobs.discard(job_id)
+            if job_id == self.current_job_id:
+                self.current_job_id = None
+                self.cancel_button.setEnabled(False)
+            if job['state'] == 'cancelled':
+                latency = job['timings'].get('cancel')
+                suffix = f" за {latency:.1f} сек" if latency is not None else ""
+                self.status_label.setText(f"❌ Скачивание отменено{suffix}")
+            elif job['result']:
+                self.on_download_finished(job['result'])
+            else:
+                self.on_download_error(job['error'])
+        self.update_queue_progress()
+    
+    def update_queue_progress(self):
+        """Общий прогресс задач, добавленных с момента, когда очередь была пуста"""
+        jobs = {job['job_id']: job for job in self.queue.jobs() if job['job_id'] in self.batch_jobs}
+        active = [job for job in jobs.values() if job['state'] in ('queued', 'running')]
+        if not active:
+            self.batch_jobs.clear()
+            self.progress_bar.setVisible(False)
+            return
+        
+        counted = [job for job in jobs.values() if job['state'] != 'cancelled']
+        total = sum(100.0 if job['state'] in ('done', 'error') else job['percent'] or 0 for job in counted)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setValue(int(total * 10 / max(len(counted), 1)))
+        running = sum(1 for job in active if job['state'] == 'running')
+        self.progress_bar.setFormat(f"%p% · скачивается {running}, в очереди {len(active) - running}")
+    
+    def describe_bandwidth(self, job):
+        """Измеренная скорость задачи и ее доля общего лимита"""
+        if job['state'] != 'running':
+            return ""
+        info = self.downloader.bandwidth.shares().get(job['key'])
+        if not info:
+            return ""
+        rate = format_rate(info['rate']) if info['rate'] else "—"
+        return f"{rate} / {format_rate(info['share'])}"
+    
+    def describe_progress(self, event):
+        """Текст о прогрессе этапа задачи"""
+        icon = "🔄" if event['phase'] == 'merge' else "⬇️"
+        if event.get('message'):
+            return f"{icon} {event['message']}"
+        parts = [STREAM_LABELS.get(event['phase'], event['phase'])]
+        if event['status'] == 'error':
+            parts.append("ошибка")
+        elif event['status'] == 'finished':
+            parts.append("готово")
+        if event.get('percent') is not None and event['status'] != 'finished':
+            parts.append(f"{event['percent']:.1f}%")
+        if event.get('downloaded_bytes') and event.get('total_bytes'):
+            parts.append(f"{self.downloader._format_file_size(event['downloaded_bytes'])} из "
+                         f"{self.downloader._format_file_size(event['total_bytes'])}")
+        if event.get('speed'):
+            parts.append(f"{self.downloader._format_file_size(int(event['speed']))}/с")
+        if event.get('speed_factor'):
+            parts.append(f"x{event['speed_factor']:.1f}")
+        if event.get('eta') and event['status'] != 'finished':
+            parts.append(f"осталось {int(event['eta'])} сек")
+        return f"{icon} " + " · ".join(parts)
     
     def on_download_finished(self, result):
         """Обработчик завершения скачивания"""
-        self.progress_bar.setVisible(False)
-        self.download_button.setEnabled(True)
-        self.cancel_button.setEnabled(False)
-        
         if result['success']:
             self.status_label.setText("✅ Скачивание завершено!")
             
             # Формируем сообщение в зависимости от типа скачивания
-            if result['format_type'] == 'video_only':
+            if result.get('skipped'):
+                self.status_label.setText("⏭️ Уже скачано")
+                message = f"⏭️ Этот файл уже есть в библиотеке загрузок, повторно не скачивается.\n\n"
+            elif result['format_type'] == 'video_only':
                 message = f"🎥 Видео и аудио успешно скачаны и объединены!\n\n"
             elif result['format_type'] == 'audio_only':
                 message = f"🎵 Аудио успешно скачано!\n\n"
@@ -1006,8 +846,11 @@ class LinkInputWindow(QMainWindow):
                 full_path = os.path.abspath(result['final_file'])
                 message += f"📁 Папка: {self.download_dir}\n"
                 message += f"📄 Файл: {os.path.basename(result['final_file'])}\n"
-                message += f"🔗 Полный путь: {full_path}\n\n"
-                message += f"💬 {result['message']}"
+                message += f"🔗 Полный путь: {full_path}\n"
+                if result.get('throughput'):
+                    speed = self.downloader._format_file_size(int(result['throughput']))
+                    message += f"⚡ Скорость: {speed}/с ({result['transfer']})\n"
+                message += f"\n💬 {result['message']}"
             
             QMessageBox.information(self, "Успех", message)
         else:
@@ -1016,9 +859,6 @@ class LinkInputWindow(QMainWindow):
     
     def on_download_error(self, error):
         """Обработчик ошибки скачивания"""
-        self.progress_bar.setVisible(False)
-        self.download_button.setEnabled(True)
-        self.cancel_button.setEnabled(False)
         self.status_label.setText(f"❌ Ошибка скачивания: {error}")
         
         QMessageBox.critical(self, "Ошибка", f"Ошибка скачивания:\n{error}")
@@ -1026,40 +866,39 @@ class LinkInputWindow(QMainWindow):
     def on_clear_url_clicked(self):
         """Обработчик нажатия кнопки 'Очистить'"""
         # Останавливаем все потоки
-        if self.info_thread and self.info_thread.isRunning():
-            self.info_thread.terminate()
-            self.info_thread.wait()
-        
-        if self.download_thread and self.download_thread.isRunning():
-            self.download_thread.terminate()
-            self.download_thread.wait()
-        
-        if self.size_thread and self.size_thread.isRunning():
-            self.size_thread.terminate()
-            self.size_thread.wait()
+        self.stop_info_thread()
         
         self.link_input.clear()
         self.video_info_label.setText("")
         self.format_group.setVisible(False)
-        self.progress_bar.setVisible(False)
         self.size_label.setText("")
         self.status_label.setText("✅ yt-dlp готов к работе")
         self.link_input.setFocus()
     
+    def stop_info_thread(self):
+        """Отмена получения информации без QThread.terminate(): процесс yt-dlp останавливается, поток завершается сам"""
+        thread = self.info_thread
+        self.info_thread = None
+        if not thread or not thread.isRunning():
+            return
+        thread.cancel()
+        self.get_info_button.setEnabled(self.downloader is not None)
+        # QThread нельзя удалять, пока он работает: храним ссылку до сигнала finished
+        self.stopping_threads.add(thread)
+        thread.finished.connect(lambda: self.stopping_threads.discard(thread))
+    
     def closeEvent(self, event):
         """Обработчик закрытия окна"""
         # Останавливаем все потоки перед закрытием
-        if self.info_thread and self.info_thread.isRunning():
-            self.info_thread.terminate()
-            self.info_thread.wait()
-        
-        if self.download_thread and self.download_thread.isRunning():
-            self.download_thread.terminate()
-            self.download_thread.wait()
-        
-        if self.size_thread and self.size_thread.isRunning():
-            self.size_thread.terminate()
-            self.size_thread.wait()
+        if self.startup_thread:
+            self.startup_thread.wait()
+        self.stop_info_thread()
+        for thread in list(self.stopping_threads):
+            thread.wait(INFO_THREAD_STOP_TIMEOUT_MS)
+        
+        # Задачи очереди прерываются, но остаются в журнале и продолжатся при следующем запуске
+        if self.queue and self.queue.active_count():
+            self.queue.shutdown(timeout=5)
         
         event.accept()
 
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Планировщик объединения видео и аудио через FFmpeg
+
+По кодекам потоков выбирает контейнер, в который оба потока копируются
+без перекодирования. Перекодирование - только если подходящего контейнера нет
+(или контейнер задан жестко).
+"""
+
+import subprocess
+from typing import Dict, List, NamedTuple, Optional
+
+
+# Семейства кодеков: строки yt-dlp (avc1.640028, mp4a.40.2) и имена ffprobe (h264, aac)
+_CODEC_FAMILIES = {
+    'avc1': 'h264', 'avc3': 'h264', 'h264': 'h264',
+    'hev1': 'hevc', 'hvc1': 'hevc', 'hevc': 'hevc', 'h265': 'hevc',
+    'vp09': 'vp9', 'vp9': 'vp9',
+    'vp08': 'vp8', 'vp8': 'vp8',
+    'av01': 'av1', 'av1': 'av1',
+    'mp4a': 'aac', 'aac': 'aac',
+    'opus': 'opus',
+    'vorbis': 'vorbis',
+    'mp3': 'mp3',
+    'ac-3': 'ac3', 'ac3': 'ac3',
+    'ec-3': 'eac3', 'eac3': 'eac3',
+    'flac': 'flac',
+}
+
+# Кодеки, которые контейнер принимает без перекодирования
+CONTAINER_CODECS = {
+    'mp4': {
+        'video': {'h264', 'hevc', 'vp9', 'av1'},
+        'audio': {'aac', 'mp3', 'ac3', 'eac3'},
+    },
+    'webm': {
+        'video': {'vp8', 'vp9', 'av1'},
+        'audio': {'opus', 'vorbis'},
+    },
+    'mkv': {
+        'video': {'h264', 'hevc', 'vp8', 'vp9', 'av1'},
+        'audio': {'aac', 'mp3', 'ac3', 'eac3', 'opus', 'vorbis', 'flac'},
+    },
+}
+
+# Порядок предпочтения контейнеров и кодеки для крайнего случая перекодирования
+DEFAULT_CONTAINERS = ('mp4', 'webm', 'mkv')
+TRANSCODE_AUDIO = {'mp4': 'aac', 'webm': 'libopus', 'mkv': 'aac'}
+TRANSCODE_VIDEO = {'mp4': 'libx264', 'webm': 'libvpx-vp9', 'mkv': 'libx264'}
+
+
+class MergePlan(NamedTuple):
+    """План объединения: контейнер, аргументы кодеков и стратегия"""
+    container: str
+    video_codec: str
+    audio_codec: str
+    # copy - копирование в предпочтительный контейнер,
+    # container_switch - копирование в другой контейнер,
+    # transcode_audio / transcode - перекодирование (крайний случай)
+    strategy: str
+
+    def ffmpeg_args(self) -> List[str]:
+        return ['-c:v', self.video_codec, '-c:a', self.audio_codec]
+
+
+def codec_family(codec: Optional[str]) -> Optional[str]:
+    """Семейство кодека или None, если кодек неизвестен"""
+    if not codec or codec == 'none':
+        return None
+    codec = codec.lower()
+    return _CODEC_FAMILIES.get(codec) or _CODEC_FAMILIES.get(codec.split('.')[0])
+
+
+def probe_codec(path: str, stream: str) -> Optional[str]:
+    """Кодек первого видео ('v') или аудио ('a') потока файла через ffprobe"""
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', f'{stream}:0',
+             '-show_entries', 'stream=codec_name', '-of', 'csv=p=0', path],
+            capture_output=True, text=True, timeout=30)
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip().splitlines()[0] if result.stdout.strip() else None
+
+
+def plan_merge(video_codec: Optional[str], audio_codec: Optional[str],
+               containers=DEFAULT_CONTAINERS) -> MergePlan:
+    """Выбор способа объединения
+
+    containers - допустимые контейнеры в порядке предпочтения. Если ни один
+    не принимает оба кодека как есть, в первом из них перекодируется то,
+    что не подходит (сначала аудио, видео - в последнюю очередь).
+    """
+    video = codec_family(video_codec)
+    audio = codec_family(audio_codec)
+    preferred = containers[0]
+
+    if video and audio:
+        for container in containers:
+            codecs = CONTAINER_CODECS[container]
+            if video in codecs['video'] and audio in codecs['audio']:
+                strategy = 'copy' if container == preferred else 'container_switch'
+                return MergePlan(container, 'copy', 'copy', strategy)
+
+    codecs = CONTAINER_CODECS[preferred]
+    audio_args = 'copy' if audio in codecs['audio'] else TRANSCODE_AUDIO[preferred]
+    # Неизвестный кодек видео копируется как есть, как это делалось всегда
+    if video is None or video in codecs['video']:
+        strategy = 'copy' if audio_args == 'copy' else 'transcode_audio'
+        return MergePlan(preferred, 'copy', audio_args, strategy)
+    return MergePlan(preferred, TRANSCODE_VIDEO[preferred], audio_args, 'transcode')
+
+
+def describe_plan(plan: MergePlan) -> str:
+    """Описание стратегии для сообщений пользователю"""
+    descriptions: Dict[str, str] = {
+        'copy': "без перекодирования",
+        'container_switch': f"без перекодирования, контейнер {plan.container}",
+        'transcode_audio': f"перекодирование аудио в {plan.audio_codec}",
+        'transcode': f"перекодирование видео в {plan.video_codec}",
+    }
+    return descriptions.get(plan.strategy, plan.strategy)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Потокобезопасный LRU-кэш метаданных видео с TTL
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+_YOUTUBE_ID = re.compile(r'^[A-Za-z0-9_-]{11}$')
+_YOUTUBE_HOSTS = ('youtube.com', 'youtu.be', 'youtube-nocookie.com')
+
+
+def _normalized_host(parsed) -> str:
+    """Хост без префиксов www./m./music."""
+    host = (parsed.hostname or '').lower()
+    if host.startswith('www.') or host.startswith('m.') or host.startswith('music.'):
+        host = host.split('.', 1)[1]
+    return host
+
+
+def extract_video_id(url: str) -> str:
+    """Канонический ключ видео: ID для ссылок YouTube, иначе сама ссылка"""
+    url = url.strip()
+    if _YOUTUBE_ID.match(url):
+        return url
+
+    parsed = urlparse(url if '://' in url else f"https://{url}")
+    host = _normalized_host(parsed)
+
+    if host in _YOUTUBE_HOSTS:
+        video_id = None
+        if host == 'youtu.be':
+            video_id = parsed.path.strip('/').split('/')[0]
+        elif parsed.path == '/watch':
+            video_id = (parse_qs(parsed.query).get('v') or [None])[0]
+        else:
+            # /shorts/<id>, /embed/<id>, /live/<id>, /v/<id>
+            parts = parsed.path.strip('/').split('/')
+            if len(parts) >= 2 and parts[0] in ('shorts', 'embed', 'live', 'v'):
+                video_id = parts[1]
+        if video_id and _YOUTUBE_ID.match(video_id):
+            return video_id
+
+    return url
+
+
+def is_playlist_url(url: str) -> bool:
+    """Ссылка на плейлист или канал YouTube (а не на одно видео)"""
+    url = url.strip()
+    parsed = urlparse(url if '://' in url else f"https://{url}")
+    if _normalized_host(parsed) != 'youtube.com':
+        return False
+
+    if parsed.path == '/playlist':
+        return 'list' in parse_qs(parsed.query)
+    # Ссылка на видео внутри плейлиста скачивает одно видео, как и раньше
+    parts = parsed.path.strip('/').split('/')
+    return bool(parts[0]) and (parts[0].startswith('@') or parts[0] in ('channel', 'c', 'user'))
+
+
+class MetadataCache:
+    """LRU-кэш с вытеснением по TTL и счетчиками попаданий
+
+    Параллельные запросы одного ключа через get_or_load выполняют загрузку
+    один раз: остальные потоки ждут и получают готовое значение.
+    """
+
+    def __init__(self, max_entries: int = 64, ttl: float = 1800):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # ключ -> (срок годности, значение)
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _get_locked(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key: str) -> Optional[Any]:
+        """Значение из кэша или None"""
+        with self._lock:
+            value = self._get_locked(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Сохранение значения, самые старые записи вытесняются"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Значение из кэша, при промахе - результат loader() (один раз на ключ)"""
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Пока ждали, значение мог загрузить другой поток
+            with self._lock:
+                value = self._get_locked(key)
+                if value is not None:
+                    self.hits += 1
+                    return value
+                self.misses += 1
+            try:
+                value = loader()
+                self.put(key, value)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return value
+
+    def invalidate(self, key: Optional[str] = None):
+        """Удаление одной записи или всего кэша"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict:
+        """Счетчики попаданий и промахов"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'hit_rate': self.hits / total if total else 0.0,
+            }
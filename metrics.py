@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Метрики этапов задач: длительность, объем и исход каждого этапа
+
+Этапы - проверка программ (probe), получение информации (info), список
+форматов (formats), скачивание каждого потока (download), объединение
+(merge), перенос в папку загрузок (finalize), удаление временных файлов
+(cleanup) и задача целиком (job).
+Каждый завершенный этап дописывается строкой в журнал JSON lines:
+
+    {"time": 1700000000.0, "stage": "download", "duration": 3.2, "bytes": 10485760,
+     "outcome": "ok", "job": "3f2a...", "stream": "video", "format_id": "137"}
+
+Гистограммы длительности по этапам выводятся в текстовом формате Prometheus:
+в файл (для node_exporter textfile collector) или по HTTP на /metrics.
+
+    YTDL_METRICS_LOG=metrics.jsonl YTDL_METRICS_FILE=ytdl.prom YTDL_METRICS_PORT=9464
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from cancellation import JobCancelled
+
+
+STAGES = ('probe', 'info', 'formats', 'download', 'merge', 'finalize', 'cleanup', 'job')
+# Границы корзин (сек): от проверки программ из кэша до скачивания больших файлов
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+OUTCOMES = ('ok', 'error', 'cancelled')
+
+
+class Span:
+    """Один этап: время измеряется блоком with, bytes и outcome задаются внутри блока
+
+    Исключение внутри блока дает исход error (или cancelled для отмены задачи)
+    и передается дальше.
+    """
+
+    def __init__(self, metrics: 'StageMetrics', stage: str, labels: Dict):
+        self.metrics = metrics
+        self.stage = stage
+        self.labels = labels
+        self.bytes: Optional[int] = None
+        self.outcome = 'ok'
+        self.error_class: Optional[str] = None
+        self.start = 0.0
+
+    def __enter__(self) -> 'Span':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.outcome = 'cancelled' if isinstance(exc, JobCancelled) else 'error'
+            self.error_class = type(exc).__name__
+        self.metrics.record(self.stage, time.perf_counter() - self.start, self.bytes, self.outcome,
+                            self.error_class, **self.labels)
+        return False
+
+
+class StageMetrics:
+    """Гистограммы длительности по этапам, журнал JSON lines и вывод Prometheus"""
+
+    def __init__(self, log_path: Optional[str] = None, prom_path: Optional[str] = None,
+                 port: Optional[int] = None):
+        self.log_path = log_path
+        self.prom_path = prom_path
+        self._lock = threading.Lock()
+        # Этап -> количество по корзинам (не накопительное, последняя - +Inf), сумма и число
+        self._buckets: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+        self._bytes: Dict[str, int] = {}
+        self._outcomes: Dict[tuple, int] = {}
+        self._server = None
+        if port is not None:
+            try:
+                self.serve(port)
+            except OSError as e:
+                print(f"⚠️  Сервер метрик на порту {port} не запущен: {e}")
+
+    @classmethod
+    def from_env(cls, log_path: Optional[str] = None, prom_path: Optional[str] = None,
+                 port: Optional[int] = None) -> 'StageMetrics':
+        """Настройки из аргументов или переменных YTDL_METRICS_LOG, YTDL_METRICS_FILE, YTDL_METRICS_PORT"""
+        port_value = port if port is not None else os.environ.get('YTDL_METRICS_PORT')
+        try:
+            port = int(port_value) if port_value not in (None, '') else None
+        except ValueError:
+            print(f"⚠️  Некорректный порт метрик: {port_value}")
+            port = None
+        return cls(log_path or os.environ.get('YTDL_METRICS_LOG') or None,
+                   prom_path or os.environ.get('YTDL_METRICS_FILE') or None, port)
+
+    def span(self, stage: str, **labels) -> Span:
+        """Контекстный менеджер этапа; метки со значением None не записываются"""
+        return Span(self, stage, labels)
+
+    def record(self, stage: str, duration: float, bytes: Optional[int] = None, outcome: str = 'ok',
+               error_class: Optional[str] = None, **labels):
+        """Учитывает завершенный этап (для этапов, время которых измерено заранее)"""
+        entry = {'time': time.time(), 'stage': stage, 'duration': round(duration, 6),
+                 'bytes': bytes, 'outcome': outcome}
+        if error_class:
+            entry['error_class'] = error_class
+        entry.update({key: value for key, value in labels.items() if value is not None})
+
+        with self._lock:
+            counts = self._buckets.setdefault(stage, [0] * (len(DURATION_BUCKETS) + 1))
+            index = next((i for i, bound in enumerate(DURATION_BUCKETS) if duration <= bound),
+                         len(DURATION_BUCKETS))
+            counts[index] += 1
+            self._sums[stage] = self._sums.get(stage, 0.0) + duration
+            self._bytes[stage] = self._bytes.get(stage, 0) + (bytes or 0)
+            self._outcomes[(stage, outcome)] = self._outcomes.get((stage, outcome), 0) + 1
+            try:
+                if self.log_path:
+                    with open(self.log_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                if self.prom_path:
+                    self._write_prometheus_locked(self.prom_path)
+            except OSError as e:
+                print(f"⚠️  Не удалось записать метрики: {e}")
+
+    def summary(self) -> Dict[str, Dict]:
+        """Число, суммарное время, байты и исходы по каждому этапу"""
+        with self._lock:
+            return {stage: {
+                'count': sum(counts),
+                'sum': self._sums[stage],
+                'bytes': self._bytes[stage],
+                'outcomes': {outcome: n for (name, outcome), n in self._outcomes.items() if name == stage},
+            } for stage, counts in self._buckets.items()}
+
+    def prometheus_text(self) -> str:
+        """Метрики в текстовом формате Prometheus (exposition format 0.0.4)"""
+        with self._lock:
+            return self._prometheus_text_locked()
+
+    def _prometheus_text_locked(self) -> str:
+        stages = [stage for stage in STAGES if stage in self._buckets]
+        stages += sorted(stage for stage in self._buckets if stage not in STAGES)
+        lines = [
+            '# HELP ytdl_stage_duration_seconds Длительность этапов задач скачивания',
+            '# TYPE ytdl_stage_duration_seconds histogram',
+        ]
+        for stage in stages:
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS + ('+Inf',), self._buckets[stage]):
+                cumulative += count
+                lines.append(f'ytdl_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'ytdl_stage_duration_seconds_sum{{stage="{stage}"}} {self._sums[stage]:.6f}')
+            lines.append(f'ytdl_stage_duration_seconds_count{{stage="{stage}"}} {cumulative}')
+        lines += [
+            '# HELP ytdl_stage_bytes_total Байты, обработанные этапом',
+            '# TYPE ytdl_stage_bytes_total counter',
+        ]
+        lines += [f'ytdl_stage_bytes_total{{stage="{stage}"}} {self._bytes[stage]}' for stage in stages]
+        lines += [
+            '# HELP ytdl_stage_total Завершенные этапы по исходу',
+            '# TYPE ytdl_stage_total counter',
+        ]
+        for stage in stages:
+            for outcome in OUTCOMES:
+                lines.append(f'ytdl_stage_total{{stage="{stage}",outcome="{outcome}"}} '
+                             f'{self._outcomes.get((stage, outcome), 0)}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: Optional[str] = None):
+        """Записывает метрики в файл атомарно (сборщик не увидит недописанный файл)"""
+        with self._lock:
+            self._write_prometheus_locked(path or self.prom_path)
+
+    def _write_prometheus_locked(self, path: str):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self._prometheus_text_locked())
+        os.replace(temp_path, path)
+
+    def serve(self, port: int = 0, host: str = '127.0.0.1') -> int:
+        """HTTP-сервер /metrics в фоновом потоке; возвращает порт (0 - любой свободный)"""
+        # http.server нужен только с включенным сервером метрик
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def close(self):
+        """Останавливает HTTP-сервер метрик"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+_default_metrics: Optional[StageMetrics] = None
+_default_lock = threading.Lock()
+
+
+def default_metrics() -> StageMetrics:
+    """Общие метрики процесса (создаются из переменных окружения при первом обращении)"""
+    global _default_metrics
+    with _default_lock:
+        if _default_metrics is None:
+            _default_metrics = StageMetrics.from_env()
+        return _default_metrics
+
+
+def set_default_metrics(metrics: StageMetrics):
+    """Заменяет общие метрики процесса (пакетный режим с параметрами --metrics-*)"""
+    global _default_metrics
+    with _default_lock:
+        _default_metrics = metrics
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Разбор прогресса yt-dlp и FFmpeg из вывода дочерних процессов
+
+yt-dlp запускается с --newline и --progress-template, FFmpeg - с -progress pipe:1.
+Прогресс передается обработчику словарями с полями downloaded_bytes,
+total_bytes, percent, speed (байт/с) и eta (сек).
+"""
+
+import os
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from cancellation import CancelToken, process_group_kwargs, terminate_process_tree
+
+
+PROGRESS_PREFIX = '[progress]'
+# Поля прогресса yt-dlp в порядке вывода; отсутствующие значения выводятся как NA
+PROGRESS_FIELDS = ('status', 'downloaded_bytes', 'total_bytes', 'total_bytes_estimate', 'speed', 'eta')
+PROGRESS_TEMPLATE = 'download:' + PROGRESS_PREFIX + ''.join(f' %(progress.{field})s' for field in PROGRESS_FIELDS)
+
+
+def _number(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def progress_event(downloaded: Optional[float], total: Optional[float],
+                   speed: Optional[float], eta: Optional[float], status: str = 'downloading') -> Dict:
+    """Единый словарь прогресса для всех источников"""
+    percent = downloaded * 100 / total if downloaded is not None and total else None
+    return {
+        'status': status,
+        'downloaded_bytes': int(downloaded) if downloaded is not None else None,
+        'total_bytes': int(total) if total else None,
+        'percent': min(percent, 100.0) if percent is not None else None,
+        'speed': speed,
+        'eta': eta,
+    }
+
+
+def parse_ytdlp_progress(line: str) -> Optional[Dict]:
+    """Строка, выведенная по PROGRESS_TEMPLATE, или None для прочих строк"""
+    if not line.startswith(PROGRESS_PREFIX):
+        return None
+    values = line[len(PROGRESS_PREFIX):].split()
+    if len(values) != len(PROGRESS_FIELDS):
+        return None
+    fields = dict(zip(PROGRESS_FIELDS, values))
+    total = _number(fields['total_bytes']) or _number(fields['total_bytes_estimate'])
+    return progress_event(_number(fields['downloaded_bytes']), total,
+                          _number(fields['speed']), _number(fields['eta']), fields['status'])
+
+
+def progress_from_hook(status: Dict) -> Dict:
+    """Словарь progress_hooks yt_dlp в едином виде"""
+    total = status.get('total_bytes') or status.get('total_bytes_estimate')
+    return progress_event(status.get('downloaded_bytes'), total,
+                          status.get('speed'), status.get('eta'), status.get('status', 'downloading'))
+
+
+class FFmpegProgressParser:
+    """Разбор блоков key=value, которые FFmpeg пишет с -progress"""
+
+    def __init__(self, duration: Optional[float]):
+        self.duration = duration
+        self._block = {}
+
+    def feed(self, line: str) -> Optional[Dict]:
+        """Возвращает событие в конце каждого блока (строка progress=...)"""
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            return None
+        self._block[key] = value
+        if key != 'progress':
+            return None
+
+        block, self._block = self._block, {}
+        out_time_us = _number(block.get('out_time_us', 'N/A'))
+        position = out_time_us / 1e6 if out_time_us is not None else None
+        speed_factor = _number(block.get('speed', 'N/A').rstrip('x'))
+
+        percent = None
+        eta = None
+        if self.duration and position is not None:
+            percent = min(position * 100 / self.duration, 100.0)
+            if speed_factor:
+                eta = max(self.duration - position, 0) / speed_factor
+        if value == 'end':
+            percent = 100.0
+            eta = 0
+
+        total_size = _number(block.get('total_size', 'N/A'))
+        return {
+            'status': 'finished' if value == 'end' else 'processing',
+            'downloaded_bytes': int(total_size) if total_size is not None else None,
+            'total_bytes': None,
+            'percent': percent,
+            'speed': None,
+            'speed_factor': speed_factor,
+            'eta': eta,
+        }
+
+
+def _watch_inactivity(process: subprocess.Popen, last_activity: List[float], timeout: float,
+                      timed_out: threading.Event):
+    """Завершает процесс, если он ничего не выводит дольше timeout секунд"""
+    while process.poll() is None:
+        if time.monotonic() - last_activity[0] > timeout:
+            timed_out.set()
+            terminate_process_tree(process, grace_period=0)
+            return
+        time.sleep(0.5)
+
+
+def run_with_progress(cmd: List[str], on_line: Callable[[str], None], timeout: float,
+                      merge_stderr: bool = True,
+                      cancel_token: Optional[CancelToken] = None,
+                      output_fd: Optional[int] = None, pass_fds: Sequence[int] = ()) -> Tuple[int, str]:
+    """Запуск процесса с построчным чтением stdout
+
+    timeout - допустимое время без вывода (а не общее время работы), так что
+    большие файлы не прерываются, пока идет прогресс. Возвращает код завершения
+    и stderr; при merge_stderr=True stderr идет в on_line вместе с stdout.
+    Процесс запускается в своей группе; при отмене через cancel_token группа
+    останавливается, не дожидаясь следующей строки вывода, и выбрасывается
+    JobCancelled (JobInterrupted).
+    
+    output_fd - дескриптор для stdout процесса (поток данных в канал), тогда
+    построчно читается stderr. pass_fds передаются процессу под теми же номерами
+    (FFmpeg читает их как pipe:N). Эти дескрипторы закрываются в вызывающем
+    процессе сразу после запуска: конец данных определяется дочерними процессами.
+    """
+    try:
+        process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE if output_fd is None else output_fd,
+            stderr=subprocess.STDOUT if merge_stderr and output_fd is None else subprocess.PIPE,
+            text=True, bufsize=1, errors='replace', pass_fds=tuple(pass_fds), **process_group_kwargs())
+    finally:
+        for fd in ([output_fd] if output_fd is not None else []) + list(pass_fds):
+            os.close(fd)
+    lines = process.stdout if output_fd is None else process.stderr
+    if cancel_token is None:
+        cancel_token = CancelToken()
+
+    last_activity = [time.monotonic()]
+    timed_out = threading.Event()
+    threading.Thread(target=_watch_inactivity, args=(process, last_activity, timeout, timed_out),
+                     daemon=True).start()
+
+    stderr_lines: List[str] = []
+    stderr_thread = None
+    if not merge_stderr and output_fd is None:
+        def drain_stderr():
+            for line in process.stderr:
+                last_activity[0] = time.monotonic()
+                stderr_lines.append(line)
+        stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+        stderr_thread.start()
+
+    with cancel_token.track(process):
+        try:
+            for line in lines:
+                last_activity[0] = time.monotonic()
+                on_line(line.rstrip('\n'))
+        except BaseException:
+            # Обработчик прервал чтение: процесс не должен остаться жить. При отмене
+            # через cancel_token группа уже получила мягкий сигнал - ждем ее завершения
+            if cancel_token.cancelled:
+                process.wait()
+            else:
+                terminate_process_tree(process, grace_period=0)
+            raise
+        returncode = process.wait()
+
+    if stderr_thread:
+        stderr_thread.join()
+    cancel_token.raise_if_cancelled()
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    return returncode, ''.join(stderr_lines)
@@ -1,69 +1,67 @@
 #!/usr/bin/env python3
 """
 Скрипт для показа скачанных файлов
+
+Папка загрузок (по умолчанию текущая) обходится рекурсивно; при повторном
+запуске перечитываются только измененные каталоги (см. download_scanner.py).
+
+    python show_downloads.py downloads
+    python show_downloads.py downloads --no-cache
 """
 
+import argparse
 import os
-import glob
+import sys
 from datetime import datetime
+from typing import List, Optional
+
+from download_scanner import DownloadScanner, format_size
 
-def show_downloads():
-    """Показать скачанные файлы в текущей папке"""
-    current_dir = os.getcwd()
-    print(f"📁 Текущая папка: {current_dir}")
+
+def show_downloads(directory: Optional[str] = None, use_cache: bool = True):
+    """Показать скачанные и оставшиеся временные файлы в папке и вложенных папках"""
+    current_dir = os.path.abspath(directory or os.getcwd())
+    print(f"📁 Папка: {current_dir}")
     print("=" * 60)
-    
-    # Ищем видео файлы
-    video_extensions = ['*.mp4', '*.mkv', '*.webm', '*.avi', '*.mov', '*.flv']
-    video_files = []
-    
-    for ext in video_extensions:
-        video_files.extend(glob.glob(ext))
-        video_files.extend(glob.glob(ext.upper()))
-    
-    if video_files:
-        print("🎥 Найденные видео файлы:")
-        for i, file in enumerate(video_files, 1):
-            file_path = os.path.join(current_dir, file)
-            file_size = os.path.getsize(file_path)
-            file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-            
-            # Форматируем размер файла
-            if file_size > 1024 * 1024 * 1024:  # GB
-                size_str = f"{file_size / (1024 * 1024 * 1024):.1f} GB"
-            elif file_size > 1024 * 1024:  # MB
-                size_str = f"{file_size / (1024 * 1024):.1f} MB"
-            else:  # KB
-                size_str = f"{file_size / 1024:.1f} KB"
-            
-            print(f"{i:2d}. {file}")
-            print(f"    📏 Размер: {size_str}")
+
+    scan = DownloadScanner().scan(current_dir, use_cache)
+
+    if scan['media']:
+        print("🎥 Найденные видео и аудио файлы:")
+        for i, item in enumerate(scan['media'], 1):
+            file_time = datetime.fromtimestamp(item['mtime'])
+            print(f"{i:2d}. {os.path.relpath(item['path'], current_dir)}")
+            print(f"    📏 Размер: {format_size(item['size'])}")
             print(f"    📅 Дата: {file_time.strftime('%Y-%m-%d %H:%M:%S')}")
             print()
     else:
         print("❌ Видео файлы не найдены")
-    
-    # Ищем временные файлы (.part)
-    part_files = glob.glob("*.part")
-    if part_files:
-        print("⚠️  Найдены незавершенные скачивания:")
-        for file in part_files:
-            print(f"   - {file}")
+
+    # Временные файлы (.part, потоки до объединения, каталоги задач)
+    if scan['temp']:
+        print("⚠️  Найдены незавершенные скачивания и временные файлы:")
+        for item in scan['temp']:
+            print(f"   - {os.path.relpath(item['path'], current_dir)} ({format_size(item['size'])})")
+        print(f"🧹 Можно освободить: {format_size(scan['reclaimable_bytes'])}")
         print()
-    
+
     # Показываем общую информацию
-    total_files = len(video_files)
-    total_size = sum(os.path.getsize(f) for f in video_files)
-    
-    if total_size > 1024 * 1024 * 1024:
-        total_size_str = f"{total_size / (1024 * 1024 * 1024):.1f} GB"
-    elif total_size > 1024 * 1024:
-        total_size_str = f"{total_size / (1024 * 1024):.1f} MB"
-    else:
-        total_size_str = f"{total_size / 1024:.1f} KB"
-    
-    print(f"📊 Всего файлов: {total_files}")
-    print(f"📊 Общий размер: {total_size_str}")
+    print(f"📊 Всего файлов: {len(scan['media'])}")
+    print(f"📊 Общий размер: {format_size(scan['media_bytes'])}")
+    print(f"⏱️  Каталогов: {scan['dirs']} (перечитано {scan['rescanned']}), {scan['elapsed']:.2f} сек")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Скачанные файлы в папке загрузок")
+    parser.add_argument('directory', nargs='?', help="папка загрузок (по умолчанию текущая)")
+    parser.add_argument('--no-cache', action='store_true', help="перечитать все каталоги")
+    args = parser.parse_args(argv)
+    if args.directory and not os.path.isdir(args.directory):
+        print(f"❌ Папка не найдена: {args.directory}")
+        return 2
+    show_downloads(args.directory, not args.no_cache)
+    return 0
+
 
 if __name__ == "__main__":
-    show_downloads()
+    sys.exit(main())
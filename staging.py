@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Промежуточный каталог задачи и атомарный перенос готового файла в папку загрузок
+
+Временные потоки, .part файлы и итоговый файл пишутся в каталог задачи
+<root>/<ключ задачи>, а в папку загрузок файл попадает целиком одним rename:
+программы просмотра и синхронизации не видят недописанных файлов.
+
+root задается переменной YTDL_STAGING_DIR (например, tmpfs или быстрый SSD),
+по умолчанию - скрытый каталог .ytdl-staging в папке загрузок: та же файловая
+система, перенос без копирования. Если каталоги на разных устройствах, файл
+копируется ядром (copy_file_range, sendfile) во временный файл рядом с целью
+и переименовывается; скопированные байты (записанные дважды) учитываются.
+"""
+
+import errno
+import os
+import shutil
+from typing import Dict, Optional
+
+
+STAGING_DIR_NAME = '.ytdl-staging'
+# Сколько байт копировать за один системный вызов
+COPY_CHUNK = 64 * 1024 * 1024
+# Ошибки, после которых способ копирования недоступен для этой пары файлов
+_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+
+
+def staging_root(output_dir: str) -> str:
+    """Общий промежуточный каталог: YTDL_STAGING_DIR или .ytdl-staging в папке загрузок"""
+    return os.environ.get('YTDL_STAGING_DIR') or os.path.join(output_dir, STAGING_DIR_NAME)
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, size: int) -> bool:
+    copied = 0
+    while copied < size:
+        n = os.copy_file_range(src_fd, dst_fd, min(size - copied, COPY_CHUNK), copied, copied)
+        if n == 0:
+            return False
+        copied += n
+    return True
+
+
+def _sendfile(src_fd: int, dst_fd: int, size: int) -> bool:
+    # Позиция записи - текущая позиция dst_fd, поэтому перед вызовом она должна быть 0
+    copied = 0
+    while copied < size:
+        n = os.sendfile(dst_fd, src_fd, copied, min(size - copied, COPY_CHUNK))
+        if n == 0:
+            return False
+        copied += n
+    return True
+
+
+def kernel_copy(src_fd: int, dst_fd: int, size: int) -> str:
+    """Копирует size байт между файлами и возвращает способ
+
+    Данные не проходят через память процесса: copy_file_range (Linux, в том
+    числе reflink на Btrfs/XFS), затем sendfile; если ядро не поддерживает
+    ни один, копирование обычным циклом чтения и записи ('copy').
+    """
+    for name, copy in (('copy_file_range', _copy_file_range), ('sendfile', _sendfile)):
+        if not hasattr(os, name):
+            continue
+        try:
+            if copy(src_fd, dst_fd, size):
+                return name
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+        # Частично скопированное начинается заново следующим способом
+        os.ftruncate(dst_fd, 0)
+        os.lseek(dst_fd, 0, os.SEEK_SET)
+
+    os.lseek(src_fd, 0, os.SEEK_SET)
+    with open(src_fd, 'rb', closefd=False) as src, open(dst_fd, 'wb', closefd=False) as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK)
+    return 'copy'
+
+
+class JobStaging:
+    """Каталог одной задачи; finalize переносит готовый файл в папку загрузок
+
+    Без ключа задачи файлы пишутся прямо в output_dir (вызовы в обход
+    download_video), finalize тогда ничего не переносит.
+    """
+
+    def __init__(self, output_dir: str, key: Optional[str] = None, root: Optional[str] = None):
+        self.output_dir = output_dir
+        self.root = (root or staging_root(output_dir)) if key else None
+        self.path = os.path.join(self.root, key) if key else output_dir
+        self.method: Optional[str] = None
+        self.copied_bytes = 0
+        # Соседняя задача могла удалить опустевший общий каталог между его созданием и созданием нашего
+        for _ in range(3):
+            try:
+                os.makedirs(self.path, exist_ok=True)
+                break
+            except FileNotFoundError:
+                continue
+
+    def finalize(self, staged_path: str, name: Optional[str] = None) -> str:
+        """Переносит готовый файл в папку загрузок (заменяя одноименный) и возвращает новый путь"""
+        target = os.path.join(self.output_dir, name or os.path.basename(staged_path))
+        if os.path.abspath(staged_path) == os.path.abspath(target):
+            return target
+        try:
+            os.replace(staged_path, target)
+            self.method = 'rename'
+            return target
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+        # Разные устройства: копия рядом с целью, затем атомарная замена
+        temp_path = os.path.join(self.output_dir, f".{os.path.basename(target)}.{os.urandom(4).hex()}.part")
+        try:
+            with open(staged_path, 'rb') as src, open(temp_path, 'wb') as dst:
+                size = os.fstat(src.fileno()).st_size
+                self.method = kernel_copy(src.fileno(), dst.fileno(), size)
+                os.fsync(dst.fileno())
+            os.replace(temp_path, target)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        os.remove(staged_path)
+        self.copied_bytes += size
+        return target
+
+    def cleanup(self):
+        """Удаляет каталог задачи с оставшимися файлами и общий каталог, если он опустел"""
+        if not self.root:
+            return
+        shutil.rmtree(self.path, ignore_errors=True)
+        if os.path.basename(self.root) != STAGING_DIR_NAME:
+            return  # каталог YTDL_STAGING_DIR не удаляется
+        try:
+            os.rmdir(self.root)
+        except OSError:
+            pass  # в нем каталоги других задач
+
+    def report(self) -> Dict:
+        """Каталог, способ переноса и байты, записанные дважды (копия между устройствами)"""
+        return {'dir': self.path, 'method': self.method, 'copied_bytes': self.copied_bytes}
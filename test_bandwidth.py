@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Тест общего лимита скорости: доли задач, профили по времени, token bucket (без сети)
+"""
+
+import sys
+import os
+import datetime
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bandwidth import BandwidthGovernor, format_rate, parse_profiles, parse_rate
+from cancellation import CancelToken
+from engines import TransferSettings
+from progress import run_with_progress
+
+MB = 1024 * 1024
+
+
+def test_parse():
+    """Скорости и профили из строк настроек"""
+    print("🔍 Тестирование лимита скорости...")
+    print("=" * 60)
+
+    assert parse_rate("2M") == 2 * MB and parse_rate("500k") == 500 * 1024
+    assert parse_rate("1.5MiB/s") == int(1.5 * MB) and parse_rate("100000") == 100000
+    assert parse_rate("0") is None
+    assert format_rate(None) == "без лимита" and format_rate(1.5 * MB) == "1.5 MB/s"
+    assert parse_profiles("09:00-18:00=1M, 23:00-07:00=0") == [(540, 1080, MB), (1380, 420, None)]
+    for bad in ("fast", "09:00=1M", "25:00-26:00=1M"):
+        try:
+            parse_profiles(bad) if ':' in bad else parse_rate(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"Ожидалась ошибка для {bad}")
+    print("✅ Скорости и профили разобраны")
+
+
+def test_rebalance():
+    """Лимит делится поровну, cap ниже доли отдает остаток, доли пересчитываются"""
+    governor = BandwidthGovernor(3 * MB)
+    a = governor.register('a', cap=MB // 2)
+    assert a.share == MB // 2
+    b = governor.register('b')
+    c = governor.register('c')
+    assert (a.share, b.share, c.share) == (MB // 2, 1.25 * MB, 1.25 * MB)
+    governor.unregister('c')
+    assert b.share == 2.5 * MB
+    governor.set_limit(None)
+    assert (a.share, b.share) == (MB // 2, None)
+    assert set(governor.shares()) == {'a', 'b'}
+    print("✅ Доли пересчитываются при старте и завершении задач")
+
+
+def test_time_of_day_profile():
+    """Днем действует профиль, ночью - базовый лимит"""
+    clock = [datetime.datetime(2026, 1, 1, 12, 0)]
+    governor = BandwidthGovernor(4 * MB, parse_profiles("09:00-18:00=1M"), now=lambda: clock[0])
+    job = governor.register('a')
+    assert governor.limit == MB and job.share == MB
+    clock[0] = datetime.datetime(2026, 1, 1, 20, 0)
+    governor._checked = 0  # не ждем REFRESH_INTERVAL
+    job.consume(0)
+    assert governor.limit == 4 * MB and job.share == 4 * MB
+    print("✅ Профиль по времени суток применяется")
+
+
+def test_token_bucket():
+    """Пауза равна времени, за которое доля покрывает превышение"""
+    governor = BandwidthGovernor(MB)
+    job = governor.register('a')
+    first = job.consume(MB // 2)
+    assert 0.45 < first < 0.55, first
+    time.sleep(first)
+    delay = job.consume(MB)
+    assert 0.9 < delay < 1.1, delay
+    unlimited = BandwidthGovernor().register('b')
+    assert unlimited.consume(100 * MB) == 0
+
+    settings = TransferSettings(bandwidth=governor.register('c', cap=MB // 4))
+    assert settings.ydl_params()['ratelimit'] == MB // 4
+    if os.name != 'nt':
+        assert settings.ytdlp_args() == ['--limit-rate', str(MB // 4)]
+    print(f"✅ 1 MB при доле 1 MB/s -> пауза {delay:.2f} сек")
+
+
+def test_pause_process_group():
+    """Пауза останавливает процесс задачи (SIGSTOP), вывод возобновляется после нее"""
+    if os.name == 'nt':
+        print("⏭️  Пропущено: SIGSTOP есть только в POSIX")
+        return
+    code = "import time\nfor i in range(40):\n    print(time.time(), flush=True)\n    time.sleep(0.02)"
+    token = CancelToken()
+    stamps = []
+    threading.Timer(0.3, token.pause, args=(0.5,)).start()
+    run_with_progress([sys.executable, '-c', code], lambda line: stamps.append(float(line)),
+                      timeout=30, cancel_token=token)
+    gap = max(b - a for a, b in zip(stamps, stamps[1:]))
+    assert len(stamps) == 40 and 0.4 < gap < 1.0, (len(stamps), gap)
+    print(f"✅ Процесс приостановлен на {gap:.2f} сек")
+
+
+if __name__ == "__main__":
+    test_parse()
+    test_rebalance()
+    test_time_of_day_profile()
+    test_token_bucket()
+    test_pause_process_group()
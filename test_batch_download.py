@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Тест пакетного режима: строки результатов JSON и отсутствие PyQt (без сети)
+"""
+
+import sys
+import os
+import io
+import json
+import subprocess
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from batch_download import run_batch, throughput_by_host
+from test_download_queue import FakeDownloader
+
+
+def test_batch_records():
+    """По строке JSON на задачу: статус, путь, размер, длительности, класс ошибки"""
+    print("🔍 Тестирование пакетного режима...")
+    print("=" * 60)
+
+    results = io.StringIO()
+    with tempfile.TemporaryDirectory() as tmp:
+        records = run_batch(FakeDownloader(delay=0.1),
+                            ["https://youtu.be/one", "https://youtu.be/fail", "https://youtu.be/two"],
+                            tmp, policy='audio', workers=2, results=results)
+
+    lines = [json.loads(line) for line in results.getvalue().splitlines()]
+    assert lines == records and len(lines) == 3, lines
+    by_url = {record['url']: record for record in lines}
+    assert by_url['https://youtu.be/one']['status'] == 'done'
+    assert by_url['https://youtu.be/one']['output'].endswith('.mp4')
+    assert by_url['https://youtu.be/fail']['status'] == 'error'
+    assert by_url['https://youtu.be/fail']['error_class'] == 'RuntimeError'
+    for record in lines:
+        assert {'info', 'download', 'queued', 'total'} <= set(record['durations']), record
+    print(f"✅ Записей результатов: {len(lines)}")
+
+
+def test_throughput_by_host():
+    """Средняя скорость по хостам медиа: скачанные байты и время, а не размер готового файла"""
+    page = "https://www.youtube.com/watch?v="
+    records = [
+        # После объединения файл меньше скачанного: считаются download_bytes
+        {'url': page + "1", 'status': 'done', 'bytes': 90, 'download_bytes': 100, 'download_time': 1.0,
+         'media_host': 'a.example'},
+        {'url': page + "2", 'status': 'done', 'bytes': 300, 'download_bytes': 300, 'download_time': 3.0,
+         'media_host': 'a.example'},
+        {'url': page + "3", 'status': 'done', 'bytes': 50, 'download_bytes': 50, 'download_time': 2.0,
+         'media_host': 'b.example'},
+        {'url': page + "4", 'status': 'error', 'bytes': None, 'download_bytes': None, 'download_time': None,
+         'media_host': None},
+        # Пропущенная задача (уже в библиотеке) ничего не скачивала
+        {'url': page + "5", 'status': 'done', 'bytes': 500, 'download_bytes': 0, 'download_time': None,
+         'media_host': None},
+    ]
+    hosts = throughput_by_host(records)
+    assert set(hosts) == {'a.example', 'b.example'}, hosts
+    assert hosts['a.example'] == {'jobs': 2, 'bytes': 400, 'seconds': 4.0, 'throughput': 100.0}, hosts
+    assert hosts['b.example']['throughput'] == 25.0 and hosts['b.example']['jobs'] == 1
+    print("✅ Скорость по хостам посчитана")
+
+
+def test_batch_without_pyqt():
+    """Пакетный режим не импортирует PyQt"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    code = "import sys, batch_download; print('PyQt5' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, timeout=60)
+    assert output.stdout.strip() == 'False', output.stdout + output.stderr
+    print("✅ PyQt не импортируется")
+
+
+if __name__ == "__main__":
+    test_batch_records()
+    test_throughput_by_host()
+    test_batch_without_pyqt()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Тест отмены задач: остановка группы процессов, удаление недокачанных файлов (без сети)
+"""
+
+import sys
+import os
+import signal
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cancellation import CancelToken, JobCancelled, JobInterrupted
+from download_queue import DownloadQueue
+from progress import run_with_progress
+from test_download_queue import FakeDownloader
+
+
+def cancel_later(token, delay, **kwargs):
+    timer = threading.Timer(delay, token.cancel, kwargs=kwargs)
+    timer.start()
+    return timer
+
+
+def run_cancelled(code, token, delay=0.2):
+    """Запуск python -c code и отмена через delay, возвращает (исключение, задержку отмены)"""
+    lines = []
+    cancel_later(token, delay)
+    try:
+        run_with_progress([sys.executable, '-c', code], lines.append, timeout=60, cancel_token=token)
+    except JobCancelled as e:
+        return e, time.monotonic() - token.requested_at, lines
+    raise AssertionError("Отмена не сработала")
+
+
+def is_alive(pid):
+    """Процесс существует и не зомби (осиротевшего зомби может не сразу забрать init)"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+    except OSError:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        return True
+
+
+def test_cancel_silent_process():
+    """Процесс без вывода останавливается сразу, а не по таймауту"""
+    print("🔍 Тестирование отмены процессов...")
+    print("=" * 60)
+
+    token = CancelToken()
+    error, latency, _ = run_cancelled("import time; time.sleep(30)", token)
+    assert type(error) is JobCancelled
+    assert latency < 2, latency
+    print(f"✅ Процесс без вывода остановлен за {latency:.2f} сек")
+
+
+def test_cancel_kills_process_group():
+    """Сигнал получает вся группа: дочерние процессы yt-dlp (ffmpeg) не остаются жить"""
+    if os.name == 'nt':
+        print("⏭️  Пропущено: группы процессов POSIX")
+        return
+    code = ("import subprocess, sys, time; "
+            "p = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']); "
+            "print(p.pid, flush=True); time.sleep(30)")
+    token = CancelToken()
+    _, latency, lines = run_cancelled(code, token, delay=0.5)
+    grandchild = int(lines[0])
+    deadline = time.monotonic() + 2
+    while is_alive(grandchild):
+        if time.monotonic() > deadline:
+            os.kill(grandchild, signal.SIGKILL)
+            raise AssertionError("Дочерний процесс не остановлен")
+        time.sleep(0.05)
+    print(f"✅ Группа процессов остановлена за {latency:.2f} сек")
+
+
+def test_force_kill_after_grace_period():
+    """Процесс, игнорирующий мягкий сигнал, завершается принудительно после grace_period"""
+    if os.name == 'nt':
+        print("⏭️  Пропущено: SIGTERM есть только в POSIX")
+        return
+    code = ("import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+            "print('ready', flush=True); time.sleep(30)")
+    token = CancelToken(grace_period=0.5)
+    error, latency, _ = run_cancelled(code, token, delay=0.5)
+    assert 0.4 < latency < 3, latency
+    print(f"✅ Принудительное завершение через {latency:.2f} сек")
+
+
+def test_partial_files_policy():
+    """Недокачанные части удаляются при отмене и сохраняются при keep_partial"""
+    with tempfile.TemporaryDirectory() as tmp:
+        target = os.path.join(tmp, 'video [1].mp4')
+        partial = [target + '.part', target + '.ytdl', target + '.part-Frag3']
+        for path in partial + [target + '.info.json']:
+            open(path, 'wb').close()
+
+        token = CancelToken()
+        token.add_file(target)
+        token.cancel(keep_partial=True)
+        try:
+            token.raise_if_cancelled()
+        except JobInterrupted:
+            pass
+        else:
+            raise AssertionError("Ожидалось JobInterrupted")
+
+        assert token.remove_partial_files() == 3
+        assert not any(os.path.exists(path) for path in partial)
+        assert os.path.exists(target + '.info.json')
+    print("✅ Политика недокачанных файлов работает")
+
+
+def test_queue_cancel_latency():
+    """Очередь записывает время от запроса отмены до завершения задачи"""
+    queue = DownloadQueue(FakeDownloader(delay=2.0), max_workers=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        job_id = queue.add("https://youtu.be/a", tmp)
+        time.sleep(0.2)
+        queue.cancel(job_id)
+        assert queue.wait(timeout=5)
+
+    job = queue.jobs()[0]
+    assert job['state'] == 'cancelled', job
+    assert 0 <= job['timings']['cancel'] < 1.5, job['timings']
+    print(f"✅ Задача отменена за {job['timings']['cancel']:.2f} сек")
+
+
+if __name__ == "__main__":
+    test_cancel_silent_process()
+    test_cancel_kills_process_group()
+    test_force_kill_after_grace_period()
+    test_partial_files_policy()
+    test_queue_cancel_latency()
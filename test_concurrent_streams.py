@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Тест параллельного скачивания видео и аудио потоков (без сети)
+"""
+
+import sys
+import os
+import contextlib
+import io
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from engines import EngineError, TransferSettings
+from downloader_core import YouTubeDownloader
+from progress import progress_event
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Поддельный yt-dlp вместо проверки установленных программ
+FAKE_TOOLS = {'ytdlp': {'command': f'{sys.executable} -m fake_ytdlp', 'version': 'fake'},
+              'ffmpeg': None, 'aria2c': None}
+
+
+@contextlib.contextmanager
+def offline_downloader():
+    """Загрузчик с поддельным yt-dlp и кэшами во временной папке (общий кэш не трогается)"""
+    saved_env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            os.environ.update({'YTDL_CACHE_DIR': os.path.join(tmp, 'cache'), 'PYTHONPATH': ROOT})
+            with contextlib.redirect_stdout(io.StringIO()):
+                downloader = YouTubeDownloader('subprocess', tools=FAKE_TOOLS)
+            yield downloader
+        finally:
+            os.environ.clear()
+            os.environ.update(saved_env)
+
+
+class FakeEngine:
+    """Движок-заглушка: пишет файл по шаблону после задержки"""
+
+    name = 'fake'
+
+    def __init__(self, delay=0.2, fail_format=None):
+        self.delay = delay
+        self.fail_format = fail_format
+        self.transfers = []
+        self.intervals = {}  # ID формата -> (начало, конец) скачивания
+
+    def download(self, url, format_id, output_template, timeout=300, progress_callback=None, cancel_token=None,
+                 transfer=None):
+        self.transfers.append(transfer)
+        started = time.perf_counter()
+        path = output_template.replace('%(ext)s', 'mp4' if format_id == 'v' else 'm4a')
+        with open(path + '.part', 'wb') as f:
+            f.write(b'\0' * 1024)
+        if progress_callback:
+            progress_callback(progress_event(1024, 4096, None, None))
+        time.sleep(self.delay)
+        self.intervals[format_id] = (started, time.perf_counter())
+        if format_id == self.fail_format:
+            raise EngineError(f"HTTP Error 403 для {format_id}")
+        os.replace(path + '.part', path)
+        return path
+
+
+def test_concurrent_streams():
+    """Потоки идут одновременно, при ошибке временные файлы удаляются"""
+    print("🔍 Тестирование параллельного скачивания потоков...")
+    print("=" * 60)
+
+    events = []
+
+    with offline_downloader() as downloader, tempfile.TemporaryDirectory() as tmp:
+        temp_video = os.path.join(tmp, "temp_video_1.%(ext)s")
+        temp_audio = os.path.join(tmp, "temp_audio_1.%(ext)s")
+
+        engine = downloader.engine = FakeEngine(delay=0.3)
+        video_file, audio_file = downloader._download_streams_concurrently(
+            'url', 'v', 'a', temp_video, temp_audio, events.append)
+        assert video_file.endswith('temp_video_1.mp4') and audio_file.endswith('temp_audio_1.m4a')
+        # Потоки идут одновременно: интервалы скачивания пересекаются (без расчета на время на машине)
+        (video_start, video_end), (audio_start, audio_end) = engine.intervals['v'], engine.intervals['a']
+        overlap = min(video_end, audio_end) - max(video_start, audio_start)
+        assert overlap > 0, engine.intervals
+        assert [e['status'] for e in events].count('finished') == 2
+        assert events[-1]['streams_done'] == 2
+        overall = [e['overall_percent'] for e in events if e.get('status') == 'downloading']
+        assert overall[-1] == 25.0, overall
+        print(f"✅ Два потока по 0.3 с скачивались одновременно {overlap:.2f} с")
+
+        for path in (video_file, audio_file):
+            os.remove(path)
+
+        downloader.engine = FakeEngine(delay=0.1, fail_format='a')
+        try:
+            downloader._download_streams_concurrently('url', 'v', 'a', temp_video, temp_audio)
+            assert False, "ожидалась ошибка"
+        except RuntimeError as e:
+            assert "аудио" in str(e)
+        assert os.listdir(tmp) == [], os.listdir(tmp)
+        print("✅ Ошибка аудио: временные файлы обоих потоков удалены")
+
+
+def test_transfer_settings():
+    """Параллельные фрагменты и aria2c передаются движку, скорость попадает в результат"""
+    assert TransferSettings().ytdlp_args() == [] and TransferSettings().ydl_params() == {}
+    assert TransferSettings(4).ytdlp_args() == ['--concurrent-fragments', '4']
+    aria2c = TransferSettings(8, '/usr/bin/aria2c')
+    args = aria2c.ytdlp_args()
+    assert args[args.index('--downloader') + 1] == '/usr/bin/aria2c'
+    assert '-x 8 -s 8' in args[args.index('--downloader-args') + 1]
+    assert aria2c.ydl_params()['concurrent_fragment_downloads'] == 8
+    assert aria2c.ydl_params()['external_downloader'] == {'default': '/usr/bin/aria2c'}
+
+    with offline_downloader() as downloader, tempfile.TemporaryDirectory() as tmp:
+        downloader.aria2c_path = None
+        assert downloader.transfer_settings(99, use_aria2c=True) == TransferSettings(16, None)
+        assert downloader.transfer_settings(0) == TransferSettings(1, None)
+
+        engine = downloader.engine = FakeEngine(delay=0.05)
+        downloader._download_streams_concurrently(
+            'url', 'v', 'a', os.path.join(tmp, "temp_video_2.%(ext)s"), os.path.join(tmp, "temp_audio_2.%(ext)s"),
+            transfer=TransferSettings(4))
+        assert engine.transfers == [TransferSettings(4)] * 2, engine.transfers
+
+        result = {}
+        downloader._record_throughput(result, [os.path.join(tmp, "temp_video_2.mp4")], 0.5, TransferSettings(4))
+        assert result['download_bytes'] == 1024 and result['throughput'] == 2048, result
+    print("✅ Параметры фрагментов переданы, скорость посчитана")
+
+
+if __name__ == "__main__":
+    test_concurrent_streams()
+    test_transfer_settings()
+    print("\n🎉 Тест параллельного скачивания прошел успешно!")
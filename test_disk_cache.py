@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Тест кэша метаданных на диске (без сети)
+"""
+
+import sys
+import os
+import contextlib
+import io
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from disk_cache import DiskMetadataCache, EXPIRY_MARGIN, media_url_expiry
+from downloader_core import YouTubeDownloader
+
+VIDEO_URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+
+def _info(expire: int) -> dict:
+    return {
+        'id': 'dQw4w9WgXcQ',
+        'title': 'Пример',
+        'formats': [
+            {'format_id': '18', 'url': f"https://rr1.googlevideo.com/videoplayback?expire={expire}&itag=18"},
+            {'format_id': '137', 'manifest_url': f"https://manifest.googlevideo.com/api/manifest/dash/expire/{expire - 60}/id/x"},
+        ],
+    }
+
+
+def test_disk_cache():
+    """Сохранение, срок свежести по expire и устаревшие записи"""
+    print("🔍 Тестирование кэша на диске...")
+    now = int(time.time())
+
+    assert media_url_expiry(_info(now + 3600)) == now + 3600 - 60
+    assert media_url_expiry({'formats': [{'url': 'https://example.com/a.mp4'}]}) is None
+    print("✅ Срок истечения берется из ссылок на медиа")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'metadata.sqlite3')
+        cache = DiskMetadataCache(path)
+        cache.put('fresh', _info(now + 3600))
+        cache.put('stale', _info(now + EXPIRY_MARGIN))
+        assert cache.get('missing') is None
+
+        # Новый экземпляр - как после перезапуска приложения
+        reopened = DiskMetadataCache(path)
+        info, fresh = reopened.get('fresh')
+        assert fresh and info['title'] == 'Пример'
+        info, fresh = reopened.get('stale')
+        assert not fresh and info['id'] == 'dQw4w9WgXcQ'
+        print("✅ Записи переживают перезапуск, устаревшие помечаются")
+
+        reopened.delete('stale')
+        assert reopened.get('stale') is None
+        print("✅ Удаление записи работает")
+
+
+def test_stale_refresh():
+    """Устаревшая запись: в консоли запрашивается заново, в GUI обновляется в фоне"""
+    saved_env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            os.environ['YTDL_CACHE_DIR'] = os.path.join(tmp, 'cache')
+            os.environ.pop('YTDL_DISK_CACHE', None)
+            tools = {'ytdlp': {'command': f'{sys.executable} -c "import sys; sys.exit(3)"', 'version': 'none'},
+                     'ffmpeg': None, 'aria2c': None}
+            now = int(time.time())
+            fresh_info = dict(_info(now + 3600), title='Обновлено')
+            extracted = []
+
+            def extract(url, cancel_token=None):
+                extracted.append(url)
+                return fresh_info
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                downloader = YouTubeDownloader('subprocess', tools=tools)
+            downloader._extract_video_info = extract
+            downloader.disk_cache.put('dQw4w9WgXcQ', _info(now + EXPIRY_MARGIN))
+            assert not downloader.refresh_in_background
+            assert downloader.get_video_info(VIDEO_URL)['title'] == 'Обновлено' and len(extracted) == 1
+            assert downloader.disk_cache.get('dQw4w9WgXcQ')[1], "новая запись сохранена"
+            print("✅ Без фонового обновления устаревшая запись запрашивается заново")
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                gui = YouTubeDownloader('subprocess', tools=tools)
+            gui._extract_video_info = extract
+            gui.refresh_in_background = True
+            gui.disk_cache.put('dQw4w9WgXcQ', _info(now + EXPIRY_MARGIN))
+            assert gui.get_video_info(VIDEO_URL)['title'] == 'Пример', "устаревшая запись возвращается сразу"
+            deadline = time.monotonic() + 10
+            while gui._refreshing and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert len(extracted) == 2 and gui.get_video_info(VIDEO_URL)['title'] == 'Обновлено'
+            print("✅ С фоновым обновлением (GUI) запись обновляется в фоне")
+        finally:
+            os.environ.clear()
+            os.environ.update(saved_env)
+
+
+if __name__ == "__main__":
+    test_disk_cache()
+    test_stale_refresh()
+    print("\n🎉 Тест кэша на диске прошел успешно!")
@@ -7,7 +7,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from main import YouTubeDownloader
+from downloader_core import YouTubeDownloader
 
 def test_download_logic():
     """Тестирование логики скачивания"""
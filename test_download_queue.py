@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Тест очереди загрузок: лимит параллельных задач, отмена, разбор списков ссылок (без сети)
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from download_queue import DownloadQueue, parse_url_list
+from progress import progress_event
+from test_formats_json import SAMPLE_INFO
+
+
+class FakeDownloader:
+    """Загрузчик-заглушка: считает одновременные задачи, отчитывается о прогрессе"""
+
+    ffmpeg_available = True
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self.job_keys = []
+        self.fragments = []
+        self.rate_caps = {}
+        self.containers = {}
+        self.intervals = []  # (начало, конец) каждого скачивания
+        self.first_listed = None  # сколько элементов плейлиста было прочитано к началу первой загрузки
+        self.lock = threading.Lock()
+
+    def iter_playlist(self, url):
+        """Список из 30 видео, который "приходит страницами" с задержкой"""
+        self.listed = 0
+        for i in range(30):
+            if i % 10 == 0:
+                time.sleep(0.05)
+            self.listed += 1
+            yield {'url': f"https://youtu.be/entry{i}", 'id': f"entry{i}", 'title': f"Видео {i}", 'duration': None}
+
+    def get_video_info(self, url, cancel_token=None):
+        return dict(SAMPLE_INFO, title=f"Видео {url}")
+
+    @staticmethod
+    def formats_from_info(video_info):
+        from downloader_core import YouTubeDownloader
+        return YouTubeDownloader.formats_from_info(video_info)
+
+    def library_lookup(self, url, selection, output_dir):
+        return None
+
+    def download_video(self, url, format_id, output_dir=".", progress_callback=None, job_key=None,
+                       cancel_token=None, fragments=1, use_aria2c=False, rate_cap=None,
+                       selection=None, force=False, container=None):
+        with self.lock:
+            self.job_keys.append(job_key)
+            self.containers[url] = container
+            self.rate_caps[url] = rate_cap
+            self.fragments.append((url, fragments))
+            if self.first_listed is None:
+                self.first_listed = getattr(self, 'listed', None)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        started = time.perf_counter()
+        try:
+            for step in range(1, 5):
+                time.sleep(self.delay / 4)
+                event = progress_event(step * 256, 1024, 1024.0, None)
+                progress_callback(dict(event, phase='video', overall_percent=event['percent']))
+            if 'fail' in url:
+                return {'success': False, 'final_file': None, 'message': "Ошибка скачивания"}
+            return {'success': True, 'final_file': os.path.join(output_dir, f"{format_id}.mp4"), 'message': ''}
+        finally:
+            with self.lock:
+                self.running -= 1
+                self.intervals.append((started, time.perf_counter()))
+
+
+def test_parse_url_list():
+    """Ссылки по строкам, комментарии и повторы пропускаются"""
+    text = """
+    # список на вечер
+    https://www.youtube.com/watch?v=dQw4w9WgXcQ
+    смотри https://youtu.be/jNQXAC9IVRw и https://youtu.be/dQw4w9WgXcQ
+    https://www.youtube.com/watch?v=dQw4w9WgXcQ
+    youtu.be/9bZkp7q19f0
+    просто текст
+    """
+    urls = parse_url_list(text)
+    assert urls == [
+        'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        'https://youtu.be/jNQXAC9IVRw',
+        'https://youtu.be/dQw4w9WgXcQ',
+        'youtu.be/9bZkp7q19f0',
+    ], urls
+    print(f"✅ Разобрано ссылок: {len(urls)}")
+
+
+def test_queue_parallel_limit():
+    """Не больше max_workers задач одновременно, все задачи завершаются"""
+    print("🔍 Тестирование очереди загрузок...")
+    print("=" * 60)
+
+    downloader = FakeDownloader(delay=0.2)
+    updates = []
+    queue = DownloadQueue(downloader, max_workers=2, on_update=updates.append)
+    with tempfile.TemporaryDirectory() as tmp:
+        job_ids = queue.add_many([f"https://youtu.be/video{i}" for i in range(6)] + ["https://youtu.be/fail"], tmp)
+        assert queue.wait(timeout=10)
+
+    states = {job['job_id']: job['state'] for job in queue.jobs()}
+    assert downloader.max_running == 2, downloader.max_running
+    assert [states[i] for i in job_ids] == ['done'] * 6 + ['error'], states
+    # Задачи шли параллельно: есть пересекающиеся интервалы скачивания
+    overlapping = sum(1 for i, (start, end) in enumerate(downloader.intervals)
+                      for other_start, other_end in downloader.intervals[i + 1:]
+                      if min(end, other_end) > max(start, other_start))
+    assert overlapping > 0, downloader.intervals
+    assert all(job['title'] for job in queue.jobs())
+    assert any(update['state'] == 'running' and update['percent'] for update in updates)
+    print(f"✅ 7 задач по 2 одновременно, пересекающихся пар: {overlapping}")
+
+
+def test_queue_cancel():
+    """Ожидающая задача снимается сразу, выполняемая - на событии прогресса"""
+    downloader = FakeDownloader(delay=0.4)
+    queue = DownloadQueue(downloader, max_workers=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        first, second = queue.add_many(["https://youtu.be/a", "https://youtu.be/b"], tmp)
+        time.sleep(0.05)
+        queue.cancel(second)
+        queue.cancel(first)
+        assert queue.wait(timeout=5)
+
+    states = {job['job_id']: job['state'] for job in queue.jobs()}
+    assert states == {first: 'cancelled', second: 'cancelled'}, states
+    print("✅ Отмена задач работает")
+
+
+def test_job_fragments():
+    """Число фрагментов берется из настроек очереди на момент добавления или задается для задачи"""
+    downloader = FakeDownloader(delay=0.02)
+    queue = DownloadQueue(downloader, max_workers=1, fragments=4)
+    with tempfile.TemporaryDirectory() as tmp:
+        queue.add("https://youtu.be/a", tmp)
+        queue.add("https://youtu.be/b", tmp, fragments=8)
+        queue.fragments = 2
+        queue.add("https://youtu.be/c", tmp)
+        assert queue.wait(timeout=5)
+
+    assert sorted(downloader.fragments) == [("https://youtu.be/a", 4), ("https://youtu.be/b", 8),
+                                            ("https://youtu.be/c", 2)], downloader.fragments
+    print("✅ Фрагменты задаются для каждой задачи")
+
+
+def test_job_rate_cap():
+    """Ограничение скорости задачи: из очереди, свое или явно без ограничения (0)"""
+    downloader = FakeDownloader(delay=0.01)
+    queue = DownloadQueue(downloader, max_workers=1, rate_cap=1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        queue.add("https://youtu.be/a", tmp)
+        queue.add("https://youtu.be/b", tmp, rate_cap=500)
+        queue.add("https://youtu.be/c", tmp, rate_cap=0)
+        assert queue.wait(timeout=5)
+    assert downloader.rate_caps == {"https://youtu.be/a": 1000, "https://youtu.be/b": 500,
+                                   "https://youtu.be/c": None}, downloader.rate_caps
+    print("✅ Задача с rate_cap=0 скачивается без ограничения")
+
+
+def test_policy_container():
+    """Контейнер из политики (container=) передается в скачивание"""
+    downloader = FakeDownloader(delay=0.01)
+    queue = DownloadQueue(downloader, max_workers=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        queue.add("https://youtu.be/a", tmp, policy='best,container=webm')
+        queue.add("https://youtu.be/b", tmp, policy='best')
+        assert queue.wait(timeout=5)
+    assert downloader.containers == {"https://youtu.be/a": 'webm', "https://youtu.be/b": None}, downloader.containers
+    print("✅ Контейнер из политики передается задаче")
+
+
+def test_playlist_streaming():
+    """Загрузки начинаются до конца списка, в ожидании не больше max_pending задач"""
+    downloader = FakeDownloader(delay=0.02)
+    pending = []
+    queue = DownloadQueue(downloader, max_workers=2, max_pending=5, keep_finished=False,
+                          on_update=lambda job: pending.append((job['state'], len(queue._pending))))
+    with tempfile.TemporaryDirectory() as tmp:
+        queue.add_many(["https://www.youtube.com/playlist?list=PL123"], tmp)
+        assert queue.wait(timeout=10)
+
+    assert downloader.first_listed < 30, downloader.first_listed
+    assert max(count for _, count in pending) <= 5, pending
+    assert [state for state, _ in pending].count('done') == 30
+    assert queue.jobs() == []  # завершенные задачи не хранятся
+    print(f"✅ Первая загрузка после {downloader.first_listed} из 30 элементов списка")
+
+
+if __name__ == "__main__":
+    test_parse_url_list()
+    test_queue_parallel_limit()
+    test_queue_cancel()
+    test_job_fragments()
+    test_job_rate_cap()
+    test_policy_container()
+    test_playlist_streaming()
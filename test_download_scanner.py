@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Тест сканера папки загрузок: рекурсивный обход, кэш каталогов, временные файлы
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from download_scanner import DownloadScanner
+from staging import STAGING_DIR_NAME
+
+
+def write_file(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+
+
+def age_dirs(root):
+    """Каталоги "изменены" час назад: кэш доверяет им без повторного чтения"""
+    old = time.time() - 3600
+    for path, _, _ in os.walk(root):
+        os.utime(path, (old, old))
+
+
+def test_scan():
+    """Медиа и временные файлы во вложенных папках, повторный обход из кэша"""
+    print("🔍 Тестирование сканера папки загрузок...")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'downloads')
+        write_file(os.path.join(root, 'clip.mp4'), 1000)
+        write_file(os.path.join(root, 'Channel', 'talk.MKV'), 2000)
+        write_file(os.path.join(root, 'Channel', 'notes.txt'), 10)
+        write_file(os.path.join(root, 'movie.webm.part'), 300)
+        write_file(os.path.join(root, 'temp_audio_ab12.m4a'), 40)
+        write_file(os.path.join(root, STAGING_DIR_NAME, 'job1', 'clip.mp4'), 500)
+        age_dirs(root)
+
+        scanner = DownloadScanner(os.path.join(tmp, 'scan.sqlite3'))
+        scan = scanner.scan(root)
+        names = sorted(os.path.relpath(item['path'], root) for item in scan['media'])
+        assert names == ['Channel/talk.MKV'.replace('/', os.sep), 'clip.mp4'], names
+        assert scan['media_bytes'] == 3000
+        assert len(scan['temp']) == 3 and scan['reclaimable_bytes'] == 840, scan['temp']
+        assert scan['rescanned'] == scan['dirs'] == 4
+        print("✅ Вложенные папки, расширения без учета регистра, временные файлы: 840 байт")
+
+        warm = DownloadScanner(scanner.cache_path).scan(root)
+        assert warm['rescanned'] == 0 and warm['media'] == scan['media'] and warm['temp'] == scan['temp']
+        print(f"✅ Повторный обход из кэша: {warm['elapsed'] * 1000:.1f} мс, каталоги не перечитаны")
+
+        # Новый файл меняет время изменения своего каталога - перечитывается только он
+        write_file(os.path.join(root, 'Channel', 'next.mp4'), 100)
+        os.utime(os.path.join(root, 'Channel'), (time.time() - 60, time.time() - 60))
+        shutil.rmtree(os.path.join(root, STAGING_DIR_NAME))
+        os.utime(root, (time.time() - 60, time.time() - 60))
+        changed = scanner.scan(root)
+        assert changed['rescanned'] == 2 and changed['dirs'] == 2, changed
+        assert len(changed['media']) == 3 and len(changed['temp']) == 2
+        print("✅ Перечитаны только измененные каталоги, удаленные забыты")
+
+
+if __name__ == "__main__":
+    test_scan()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Тест компактной модели форматов: MediaFormat и индексы FormatList (без сети)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from format_model import FormatList, MediaFormat
+from test_formats_json import SAMPLE_INFO
+
+
+def test_media_format():
+    """Записи со __slots__: числовые поля разобраны, доступ по ключу как у словаря"""
+    print("🔍 Тестирование модели форматов...")
+    print("=" * 60)
+    formats = FormatList.from_info(SAMPLE_INFO)
+    audio = formats.by_id('251-drc')
+    assert isinstance(audio, MediaFormat) and not hasattr(audio, '__dict__')
+    assert audio.is_audio_only and audio['quality'] == '130k' and audio.resolution == 'audio only'
+    assert audio.note == 'medium, DRC, opus, audio only'
+    video = formats.by_id('hls-1080p')
+    assert video['is_video_only'] and video.height == 1080 and isinstance(video.fps, float)
+    assert video.get('filesize') is None and video.get('missing', 'x') == 'x' and 'tbr' in video
+    try:
+        video['format_note']
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("ключи - только ключи словаря формата")
+    assert formats.by_id('18').to_dict()['resolution'] == '640x360'
+    print("✅ Поля, строки для показа и доступ по ключу")
+
+
+def test_format_list_indexes():
+    """Поиск по ID и списки по типу; список словарей преобразуется"""
+    formats = FormatList.from_info(SAMPLE_INFO)
+    assert [f.id for f in formats.audio_only] == ['251-drc', '140']
+    assert [f.id for f in formats.video_only] == ['hls-1080p']
+    assert [f.id for f in formats.with_audio] == ['18']
+    assert [f.id for f in formats.with_video] == ['18', 'hls-1080p']
+    assert formats.by_id('sb0') is None and FormatList.of(formats) is formats
+
+    converted = FormatList.of(formats.to_dicts())
+    assert [f.id for f in converted] == [f.id for f in formats]
+    assert [f.quality for f in converted] == [f.quality for f in formats]
+    assert converted.by_id('140').filesize_approx == 3433514
+    print("✅ Индексы по ID и типу, преобразование словарей")
+
+
+if __name__ == "__main__":
+    test_media_format()
+    test_format_list_indexes()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Тест выбора формата по ограничениям (без сети)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from downloader_core import YouTubeDownloader
+from format_selector import FORMAT_POLICIES, parse_policy, pick_audio, select_format, split_format_id
+from test_formats_json import SAMPLE_INFO
+
+DURATION = 600
+
+
+def fmt(format_id, ext, vcodec, acodec, height=None, fps=None, tbr=None, abr=None, filesize=None):
+    """Формат в виде formats_from_info"""
+    return {
+        'id': format_id, 'extension': ext, 'vcodec': vcodec, 'acodec': acodec,
+        'is_video_only': vcodec != 'none' and acodec == 'none',
+        'is_audio_only': vcodec == 'none' and acodec != 'none',
+        'has_audio': vcodec != 'none' and acodec != 'none',
+        'height': height, 'fps': fps, 'tbr': tbr, 'abr': abr, 'filesize': filesize, 'filesize_approx': None,
+    }
+
+
+# Типичный набор YouTube: H.264/VP9/AV1 по высотам, AAC и Opus, один формат с аудио
+FORMATS = [
+    fmt('18', 'mp4', 'avc1.42001E', 'mp4a.40.2', 360, 30, tbr=600),
+    fmt('137', 'mp4', 'avc1.640028', 'none', 1080, 30, tbr=4400),
+    fmt('248', 'webm', 'vp9', 'none', 1080, 30, tbr=2600),
+    fmt('399', 'mp4', 'av01.0.08M.08', 'none', 1080, 30, tbr=2100),
+    fmt('313', 'webm', 'vp9', 'none', 2160, 30, tbr=17000),
+    fmt('136', 'mp4', 'avc1.4d401f', 'none', 720, 30, tbr=2200),
+    fmt('139', 'm4a', 'none', 'mp4a.40.5', abr=48),
+    fmt('140', 'm4a', 'none', 'mp4a.40.2', abr=129),
+    fmt('249', 'webm', 'none', 'opus', abr=50),
+    fmt('251', 'webm', 'none', 'opus', abr=135),
+]
+
+
+def test_parse_policy():
+    """Готовые политики разбираются, ошибки в строке - ValueError"""
+    for name in FORMAT_POLICIES:
+        parse_policy(name)
+    query = parse_policy('best, height≤1080p, codec=av1/vp09, size<=1.5G')
+    assert query.max_height == 1080 and query.vcodecs == ('av1', 'vp9') and query.max_size == int(1.5 * 1024 ** 3)
+    for bad in ('worst', 'best,size>=1M', 'best,container=avi', 'height<=720,best'):
+        try:
+            parse_policy(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"политика должна быть отклонена: {bad}")
+    print("✅ Разбор политик и ограничений")
+
+
+def test_select_format():
+    """Ограничения по качеству, размеру, кодекам и контейнеру"""
+    print("🔍 Тестирование выбора формата...")
+    print("=" * 60)
+    assert select_format(FORMATS, 'best', duration=DURATION) == '313+140'
+    assert select_format(FORMATS, 'best', ffmpeg_available=False, duration=DURATION) == '18'
+    # До 1080p: без предпочтений - больший битрейт (H.264), с codec=av1/vp9 - AV1
+    assert select_format(FORMATS, 'best,height<=1080', duration=DURATION) == '137+140'
+    assert select_format(FORMATS, '1080p-compact', duration=DURATION) == '399+140'
+    # 500 MB за 10 минут: 2160p (~1.2 GB) и H.264 1080p (~330 MB + 9 MB) - второй входит
+    assert select_format(FORMATS, 'best-500mb', duration=DURATION) == '137+140'
+    # 180 MB: VP9 1080p (~195 MB) уже не входит, AV1 1080p (~158 MB) входит
+    assert select_format(FORMATS, 'best,size<=180M', duration=DURATION) == '399+140'
+    # Без длительности размер неизвестен: с ограничением размера ничего не выбирается
+    assert select_format(FORMATS, 'best,size<=180M') is None
+    # webm: VP9 с Opus копируются без перекодирования
+    assert select_format(FORMATS, 'best,height<=1080,container=webm', duration=DURATION) == '248+251'
+    print("✅ best, до 1080p, до 500 MB, контейнер webm")
+
+    # Лучшая дорожка (AAC, копируется в mp4) не входит в лимит, Opus меньше, но требует смены контейнера
+    tight = [f for f in FORMATS if f['id'] in ('137', '140', '249')]
+    assert select_format(tight, 'best,size<=320M', duration=DURATION) == '137+249'
+    print("✅ В лимит размера входит пара с меньшей дорожкой другой группы объединения")
+
+    assert select_format(FORMATS, 'audio') == '251'
+    assert select_format(FORMATS, 'audio-small', duration=DURATION) == '140'
+    assert select_format(FORMATS, 'audio,abr<=64,acodec=aac') == '139'
+    print("✅ Аудио: лучшее, самое маленькое от 128 кбит/с, AAC до 64 кбит/с")
+
+
+def test_pick_audio():
+    """Дорожка к видео копируется в контейнер; сравнение по битрейту, а не по строке качества"""
+    h264 = next(f for f in FORMATS if f['id'] == '137')
+    assert pick_audio(FORMATS, h264)['id'] == '140', "к H.264 - AAC (mp4 без перекодирования)"
+    assert pick_audio(FORMATS, h264, parse_policy('best,container=webm'))['id'] == '251', \
+        "в webm H.264 перекодируется с любой дорожкой: выбирается больший битрейт"
+    formats = YouTubeDownloader.formats_from_info(SAMPLE_INFO)
+    video = next(f for f in formats if f['id'] == 'hls-1080p')
+    assert pick_audio(formats, video)['id'] == '140'
+    assert split_format_id('137+140') == ('137', '140') and split_format_id('22') == ('22', None)
+    print("✅ Аудиодорожка подбирается к кодеку видео")
+
+
+if __name__ == "__main__":
+    test_parse_policy()
+    test_select_format()
+    test_pick_audio()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Тест построения списка форматов из JSON (без сети)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from downloader_core import YouTubeDownloader
+
+# Фрагмент вывода yt-dlp --dump-json
+SAMPLE_INFO = {
+    'id': 'dQw4w9WgXcQ',
+    'title': 'Sample',
+    'duration': 212,
+    'formats': [
+        {'format_id': 'sb0', 'ext': 'mhtml', 'vcodec': 'none', 'acodec': 'none', 'format_note': 'storyboard'},
+        {'format_id': '251-drc', 'ext': 'webm', 'vcodec': 'none', 'acodec': 'opus', 'abr': 129.5,
+         'tbr': 129.5, 'filesize': 3437753, 'format_note': 'medium, DRC'},
+        {'format_id': '140', 'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a.40.2', 'abr': 129.4,
+         'filesize_approx': 3433514},
+        {'format_id': '18', 'ext': 'mp4', 'vcodec': 'avc1.42001E', 'acodec': 'mp4a.40.2', 'width': 640,
+         'height': 360, 'fps': 25, 'tbr': 500.2, 'resolution': '640x360'},
+        {'format_id': 'hls-1080p', 'ext': 'mp4', 'vcodec': 'avc1.640028', 'acodec': 'none', 'width': 1920,
+         'height': 1080, 'fps': 25, 'tbr': 4500.0, 'protocol': 'm3u8_native'},
+    ],
+}
+
+
+def test_formats_json():
+    """Тестирование разбора форматов из JSON"""
+    print("🔍 Тестирование разбора форматов из JSON...")
+    print("=" * 60)
+
+    formats = YouTubeDownloader.formats_from_info(SAMPLE_INFO)
+    by_id = {f['id']: f for f in formats}
+
+    # Раскадровка пропускается, нечисловые ID сохраняются
+    assert 'sb0' not in by_id
+    assert set(by_id) == {'251-drc', '140', '18', 'hls-1080p'}
+    print(f"✅ Найдено {len(formats)} форматов: {', '.join(by_id)}")
+
+    assert by_id['251-drc']['is_audio_only'] and by_id['251-drc']['quality'] == '130k'
+    assert by_id['140']['filesize_approx'] == 3433514
+    assert by_id['18']['has_audio'] and by_id['18']['quality'] == '360p'
+    assert by_id['hls-1080p']['is_video_only'] and by_id['hls-1080p']['height'] == 1080
+    assert by_id['hls-1080p']['protocol'] == 'm3u8_native'
+    print("✅ Типы форматов и числовые поля корректны")
+
+    assert YouTubeDownloader.formats_from_info({}) == []
+    print("✅ JSON без форматов дает пустой список")
+
+
+if __name__ == "__main__":
+    test_formats_json()
+    print("\n🎉 Тест разбора форматов прошел успешно!")
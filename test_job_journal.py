@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Тест журнала задач и возобновления после перезапуска (без сети)
+"""
+
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from download_queue import DownloadQueue
+from job_journal import JobJournal
+from test_concurrent_streams import FakeEngine, offline_downloader
+from test_download_queue import FakeDownloader
+
+
+def test_journal_replay():
+    """Состояние задач восстанавливается из журнала, недописанная строка пропускается"""
+    print("🔍 Тестирование журнала задач...")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = JobJournal(os.path.join(tmp, 'jobs.jsonl'))
+        journal.record('a', 'queued', url='https://youtu.be/a', output_dir=tmp, format_id=None, policy='best')
+        journal.record('a', 'started', format_id='137', title="Видео A")
+        journal.record('a', 'video_fetched')
+        journal.record('b', 'queued', url='https://youtu.be/b', output_dir=tmp, format_id='140', policy='audio')
+        journal.record('b', 'done', final_file=os.path.join(tmp, 'b.m4a'))
+        with open(journal.path, 'a', encoding='utf-8') as f:
+            f.write('{"key": "a", "event": "audio_fe')  # падение посреди записи
+
+        unfinished = journal.unfinished()
+        assert [state['key'] for state in unfinished] == ['a'], unfinished
+        assert unfinished[0]['format_id'] == '137' and unfinished[0]['events'][-1] == 'video_fetched'
+
+        assert journal.compact() == 1
+        with open(journal.path, encoding='utf-8') as f:
+            assert len(f.readlines()) == 3
+    print("✅ Незавершенные задачи восстанавливаются из журнала")
+
+
+def test_queue_resume():
+    """Задачи, прерванные закрытием, продолжаются с тем же ключом (и временными файлами)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = JobJournal(os.path.join(tmp, 'jobs.jsonl'))
+
+        downloader = FakeDownloader(delay=1.0)
+        queue = DownloadQueue(downloader, max_workers=1, journal=journal)
+        queue.add_many(["https://youtu.be/first", "https://youtu.be/second"], tmp)
+        time.sleep(0.4)
+        assert queue.shutdown(timeout=5)
+        unfinished = journal.unfinished()
+        assert len(unfinished) == 2, unfinished
+        first_key = unfinished[0]['key']
+        assert downloader.job_keys == [first_key]
+
+        downloader = FakeDownloader(delay=0.1)
+        queue = DownloadQueue(downloader, max_workers=1, journal=journal)
+        assert queue.resume_unfinished() == 2
+        assert queue.wait(timeout=5)
+        assert downloader.job_keys[0] == first_key
+        assert journal.unfinished() == []
+        assert journal.compact() == 0
+    print("✅ Прерванные задачи возобновлены")
+
+
+def test_resume_reuses_stream_files():
+    """Уже скачанный поток повторно не скачивается"""
+    engine = FakeEngine(delay=0.05)
+    calls = []
+    original = engine.download
+    engine.download = lambda url, format_id, *args, **kwargs: calls.append(format_id) or original(url, format_id, *args, **kwargs)
+    events = []
+
+    with offline_downloader() as downloader, tempfile.TemporaryDirectory() as tmp:
+        downloader.engine = engine
+        temp_video = os.path.join(tmp, "temp_video_key1.%(ext)s")
+        temp_audio = os.path.join(tmp, "temp_audio_key1.%(ext)s")
+        with open(os.path.join(tmp, "temp_video_key1.mp4"), 'wb') as f:
+            f.write(b'\0' * 2048)
+
+        video_file, audio_file = downloader._download_streams_concurrently(
+            'url', 'v', 'a', temp_video, temp_audio, events.append)
+        assert calls == ['a'], calls
+        assert video_file.endswith('temp_video_key1.mp4') and audio_file.endswith('temp_audio_key1.m4a')
+        assert any(e.get('resumed') for e in events)
+    print("✅ Скачанный поток использован повторно")
+
+
+if __name__ == "__main__":
+    test_journal_replay()
+    test_queue_resume()
+    test_resume_reuses_stream_files()
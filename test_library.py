@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Тест библиотеки загрузок: пропуск скачанного, проверка файла, блокировка между процессами (без сети)
+"""
+
+import sys
+import os
+import contextlib
+import io
+import subprocess
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cancellation import CancelToken, JobCancelled
+from download_queue import DownloadQueue
+from downloader_core import YouTubeDownloader
+from library import LibraryIndex, file_sha256, policy_selection
+
+VIDEO_URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+# Второй процесс занимает ключ библиотеки на заданное время
+HOLD_LOCK = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from library import LibraryIndex
+with LibraryIndex(sys.argv[2]).lock('dQw4w9WgXcQ', '137', sys.argv[3]):
+    print('locked', flush=True)
+    time.sleep(float(sys.argv[4]))
+"""
+
+
+def write_file(path, data=b'media' * 1000):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_library_index():
+    """Запись переживает перезапуск и удаляется, если файл изменился или исчез"""
+    print("🔍 Тестирование библиотеки загрузок...")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'library.sqlite3')
+        output_dir = os.path.join(tmp, 'downloads')
+        os.makedirs(output_dir)
+        path = write_file(os.path.join(output_dir, 'clip.mp4'))
+
+        library = LibraryIndex(db)
+        entry = library.record('dQw4w9WgXcQ', '137', output_dir, path)
+        assert entry['sha256'] == file_sha256(path) and entry['size'] == 5000
+
+        reopened = LibraryIndex(db)
+        found = reopened.lookup('dQw4w9WgXcQ', '137', output_dir + os.sep)
+        assert found and found['path'] == os.path.abspath(path) and reopened.verify(found)
+        assert reopened.lookup('dQw4w9WgXcQ', '22', output_dir) is None, "другой формат - другой ключ"
+        assert reopened.lookup('dQw4w9WgXcQ', '137', tmp) is None, "другая папка - другой ключ"
+        assert [e['path'] for e in reopened.entries(output_dir, 'dQw4w9WgXcQ')] == [found['path']]
+        print("✅ Ключ (ID видео, формат, папка), запись переживает перезапуск")
+
+        write_file(path, b'other' * 999)
+        assert reopened.lookup('dQw4w9WgXcQ', '137', output_dir) is None
+        assert reopened.entries() == [], "запись об измененном файле удаляется"
+        library.record('dQw4w9WgXcQ', '137', output_dir, path)
+        os.remove(path)
+        assert library.lookup('dQw4w9WgXcQ', '137', output_dir) is None
+        print("✅ Измененный или удаленный файл скачивается заново")
+
+
+def test_cross_process_lock():
+    """Пока другой процесс скачивает ключ, задача ждет; отмена прерывает ожидание"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'library.sqlite3')
+        library = LibraryIndex(db)
+        holder = subprocess.Popen([sys.executable, '-c', HOLD_LOCK, os.path.dirname(os.path.abspath(__file__)),
+                                   db, tmp, '1.0'], stdout=subprocess.PIPE, text=True)
+        try:
+            assert holder.stdout.readline().strip() == 'locked'
+            with library.lock('dQw4w9WgXcQ', '22', tmp):
+                pass  # другой ключ не ждет
+
+            token = CancelToken()
+            token.cancel()
+            try:
+                with library.lock('dQw4w9WgXcQ', '137', tmp, token):
+                    raise AssertionError("ключ занят другим процессом")
+            except JobCancelled:
+                pass
+
+            start = time.monotonic()
+            with library.lock('dQw4w9WgXcQ', '137', tmp):
+                waited = time.monotonic() - start
+            assert waited > 0.3, waited
+        finally:
+            holder.wait(timeout=30)
+        print(f"✅ Второй процесс ждал {waited:.1f} сек, отмена прерывает ожидание")
+
+
+def test_download_skipped():
+    """download_video и очередь не обращаются к yt-dlp, если файл уже в библиотеке"""
+    saved_env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            os.environ['YTDL_CACHE_DIR'] = os.path.join(tmp, 'cache')
+            os.environ.pop('YTDL_LIBRARY', None)
+            # Команда yt-dlp, которая всегда завершается с ошибкой: любое обращение к ней - провал теста
+            tools = {'ytdlp': {'command': f'{sys.executable} -c "import sys; sys.exit(3)"', 'version': 'none'},
+                     'ffmpeg': None, 'aria2c': None}
+            with contextlib.redirect_stdout(io.StringIO()):
+                downloader = YouTubeDownloader('subprocess', tools=tools)
+            path = write_file(os.path.join(tmp, 'clip.mp4'))
+            downloader.library.record('dQw4w9WgXcQ', '137', tmp, path)
+            downloader.library.record('dQw4w9WgXcQ', policy_selection('best'), tmp, path)
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = downloader.download_video(VIDEO_URL, '137', tmp)
+            assert result['success'] and result['skipped'] and result['final_file'] == os.path.abspath(path)
+
+            queue = DownloadQueue(downloader)
+            job_id = queue.add('https://youtu.be/dQw4w9WgXcQ', tmp)
+            assert queue.wait(30)
+            job = next(job for job in queue.jobs() if job['job_id'] == job_id)
+            assert job['state'] == 'done' and job['result']['skipped'], job
+            assert 'info' not in job['timings'], "информация о видео не запрашивается"
+
+            forced = DownloadQueue(downloader, skip_existing=False)
+            forced.add(VIDEO_URL, tmp)
+            assert forced.wait(30)
+            assert forced.jobs()[0]['state'] == 'error', "с skip_existing=False задача выполняется"
+            print("✅ Уже скачанное пропускается без обращения к yt-dlp")
+        finally:
+            os.environ.clear()
+            os.environ.update(saved_env)
+
+
+if __name__ == "__main__":
+    test_library_index()
+    test_cross_process_lock()
+    test_download_skipped()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Тест планировщика объединения (без сети и FFmpeg)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from merge_planner import codec_family, plan_merge
+
+
+def test_merge_planner():
+    """Копирование потоков везде, где контейнер позволяет"""
+    print("🔍 Тестирование планировщика объединения...")
+    print("=" * 60)
+
+    assert codec_family('avc1.640028') == 'h264'
+    assert codec_family('mp4a.40.2') == 'aac'
+    assert codec_family('none') is None and codec_family(None) is None
+
+    cases = [
+        # (видео, аудио, контейнер, стратегия)
+        ('avc1.640028', 'mp4a.40.2', 'mp4', 'copy'),
+        ('vp09.00.40.08', 'mp4a.40.2', 'mp4', 'copy'),
+        ('vp9', 'opus', 'webm', 'container_switch'),
+        ('av01.0.08M.08', 'opus', 'webm', 'container_switch'),
+        ('avc1.4d401f', 'opus', 'mkv', 'container_switch'),
+        (None, None, 'mp4', 'transcode_audio'),  # прежнее поведение для неизвестных кодеков
+    ]
+    for video, audio, container, strategy in cases:
+        plan = plan_merge(video, audio)
+        assert (plan.container, plan.strategy) == (container, strategy), (video, audio, plan)
+        print(f"✅ {video} + {audio} -> {plan.container} ({plan.strategy})")
+
+    # Жестко заданный контейнер: перекодирование только несовместимого потока
+    plan = plan_merge('avc1.4d401f', 'opus', containers=('mp4',))
+    assert plan.ffmpeg_args() == ['-c:v', 'copy', '-c:a', 'aac'] and plan.strategy == 'transcode_audio'
+    plan = plan_merge('vp8', 'mp4a.40.2', containers=('mp4',))
+    assert plan.strategy == 'transcode' and plan.audio_codec == 'copy'
+    print("✅ Перекодирование только в крайнем случае")
+
+
+if __name__ == "__main__":
+    test_merge_planner()
+    print("\n🎉 Тест планировщика объединения прошел успешно!")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Тест кэша метаданных (без сети)
+"""
+
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from metadata_cache import MetadataCache, extract_video_id, is_playlist_url
+
+
+def test_extract_video_id():
+    """Канонический ID для разных форм ссылок YouTube"""
+    print("🔍 Тестирование извлечения ID видео...")
+    urls = [
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "https://youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=10",
+        "https://youtu.be/dQw4w9WgXcQ?si=abc",
+        "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+        "https://m.youtube.com/embed/dQw4w9WgXcQ",
+        "dQw4w9WgXcQ",
+    ]
+    for url in urls:
+        assert extract_video_id(url) == 'dQw4w9WgXcQ', url
+    assert extract_video_id("https://example.com/video.mp4") == "https://example.com/video.mp4"
+    print("✅ Все варианты ссылок дают один ключ")
+
+
+def test_is_playlist_url():
+    """Плейлисты и каналы отличаются от ссылок на одно видео"""
+    playlists = [
+        "https://www.youtube.com/playlist?list=PLrAXtmErZgOeiKm4sgNOknGvNjby9efdf",
+        "https://www.youtube.com/@veritasium",
+        "https://www.youtube.com/@veritasium/videos",
+        "https://youtube.com/channel/UCHnyfMqiRRG1u-2MsSQLbXA",
+        "youtube.com/c/Veritasium",
+    ]
+    videos = [
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLrAXtmErZgOeiKm4sgNOknGvNjby9efdf",
+        "https://youtu.be/dQw4w9WgXcQ",
+        "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+        "https://example.com/@user",
+    ]
+    for url in playlists:
+        assert is_playlist_url(url), url
+    for url in videos:
+        assert not is_playlist_url(url), url
+    print("✅ Плейлисты и каналы распознаются")
+
+
+def test_metadata_cache():
+    """LRU, TTL, счетчики и однократная загрузка"""
+    print("🔍 Тестирование кэша метаданных...")
+    cache = MetadataCache(max_entries=2, ttl=60)
+
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1      # 'a' становится самым свежим
+    cache.put('c', 3)               # вытесняется 'b'
+    assert cache.get('b') is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    print("✅ Вытеснение LRU работает")
+
+    cache.put('short', 'x', ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get('short') is None
+    print("✅ Записи истекают по TTL")
+
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return {'title': 'Sample'}
+
+    cache = MetadataCache()
+    threads = [threading.Thread(target=cache.get_or_load, args=('id', loader)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['hits'] == 3
+    print(f"✅ Четыре параллельных запроса - одна загрузка ({stats})")
+
+
+if __name__ == "__main__":
+    test_extract_video_id()
+    test_is_playlist_url()
+    test_metadata_cache()
+    print("\n🎉 Тест кэша метаданных прошел успешно!")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Тест метрик этапов: гистограммы, журнал JSON lines, вывод Prometheus (без сети)
+"""
+
+import sys
+import os
+import json
+import tempfile
+import urllib.request
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cancellation import JobCancelled
+from metrics import StageMetrics
+
+
+def test_stage_spans():
+    """Длительность, байты и исход этапов попадают в журнал и гистограммы"""
+    print("🔍 Тестирование метрик этапов...")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, 'stages.jsonl')
+        prom_path = os.path.join(tmp, 'ytdl.prom')
+        metrics = StageMetrics(log_path, prom_path)
+
+        with metrics.span('download', job='a1', stream='video', format_id=None) as span:
+            span.bytes = 1024
+        try:
+            with metrics.span('merge', job='a1'):
+                raise RuntimeError("ffmpeg")
+        except RuntimeError:
+            pass
+        try:
+            with metrics.span('download', job='a1', stream='audio'):
+                raise JobCancelled()
+        except JobCancelled:
+            pass
+        metrics.record('probe', 12.0, cached=False)
+
+        with open(log_path, encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        assert [e['stage'] for e in entries] == ['download', 'merge', 'download', 'probe']
+        assert entries[0]['bytes'] == 1024 and entries[0]['outcome'] == 'ok' and entries[0]['stream'] == 'video'
+        assert 'format_id' not in entries[0], "метки None не записываются"
+        assert entries[1]['outcome'] == 'error' and entries[1]['error_class'] == 'RuntimeError'
+        assert entries[2]['outcome'] == 'cancelled'
+        print("✅ Журнал JSON lines: исходы ok, error, cancelled")
+
+        summary = metrics.summary()
+        assert summary['download']['count'] == 2 and summary['download']['bytes'] == 1024
+        assert summary['download']['outcomes'] == {'ok': 1, 'cancelled': 1}
+
+        with open(prom_path, encoding='utf-8') as f:
+            text = f.read()
+        assert text == metrics.prometheus_text()
+        assert 'ytdl_stage_duration_seconds_count{stage="download"} 2' in text
+        assert 'ytdl_stage_duration_seconds_bucket{stage="probe",le="10"} 0' in text
+        assert 'ytdl_stage_duration_seconds_bucket{stage="probe",le="30"} 1' in text
+        assert 'ytdl_stage_duration_seconds_bucket{stage="probe",le="+Inf"} 1' in text
+        assert 'ytdl_stage_total{stage="merge",outcome="error"} 1' in text
+        assert 'ytdl_stage_bytes_total{stage="download"} 1024' in text
+        print("✅ Файл Prometheus совпадает с выводом по HTTP")
+
+        port = metrics.serve(0)
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=10) as response:
+                assert response.read().decode('utf-8') == metrics.prometheus_text()
+        finally:
+            metrics.close()
+        print(f"✅ /metrics на порту {port}")
+
+
+if __name__ == "__main__":
+    test_stage_spans()
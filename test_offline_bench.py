@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Тест офлайн-бенчмарка: поддельный yt-dlp и локальный сервер медиа (без сети)
+"""
+
+import sys
+import os
+import contextlib
+import io
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_offline import compare, run_bench
+from fake_ytdlp import output_path, render_progress
+from progress import PROGRESS_TEMPLATE, parse_ytdlp_progress
+
+
+def test_fake_ytdlp_progress():
+    """Строки прогресса поддельного yt-dlp разбираются так же, как настоящего"""
+    line = render_progress(PROGRESS_TEMPLATE, {'status': 'downloading', 'downloaded_bytes': 512,
+                                               'total_bytes': 1024, 'speed': 100.0, 'eta': 5})
+    event = parse_ytdlp_progress(line)
+    assert event['percent'] == 50.0 and event['speed'] == 100.0 and event['eta'] == 5, event
+    assert output_path('/tmp/%(title)s.%(ext)s', {'title': 'clip'}, {'ext': 'm4a'}) == '/tmp/clip.m4a'
+
+
+def test_offline_bench():
+    """Все пути скачивания проходят на локальном сервере, результаты машиночитаемы"""
+    print("🔍 Тестирование офлайн-бенчмарка...")
+    print("=" * 60)
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = run_bench(repeat=1, size_mb=1)
+    names = {result['name'] for result in report['results']}
+    for name in ('info.cold', 'info.memory_cache', 'size.lookup', 'download.progressive.throughput',
+                 'download.audio_only.job', 'download.hls_1.job', 'download.hls_4.job', 'queue.total'):
+        assert name in names, (name, report['skipped'])
+    skipped = {item['name'] for item in report['skipped']}
+    assert 'download.merge.job' in names or 'download.merge' in skipped, report['skipped']
+    assert report['downloader'] == 'fake' and report['schema'] == 1
+    for stage in ('info', 'formats', 'download', 'job'):
+        assert report['stages'][stage]['outcomes'].get('ok'), (stage, report['stages'])
+
+    rows = compare(report, report)
+    assert rows and all(row['change_pct'] == 0 and row['better'] for row in rows)
+    throughput = next(r['value'] for r in report['results'] if r['name'] == 'download.progressive.throughput')
+    print(f"✅ Метрик: {len(names)}, progressive {throughput:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    test_fake_ytdlp_progress()
+    test_offline_bench()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Тест разбора прогресса yt-dlp и FFmpeg (без сети)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from progress import FFmpegProgressParser, PROGRESS_TEMPLATE, parse_ytdlp_progress
+
+
+def test_ytdlp_progress():
+    """Строки --progress-template"""
+    print("🔍 Тестирование разбора прогресса yt-dlp...")
+    assert PROGRESS_TEMPLATE.startswith('download:[progress]')
+
+    event = parse_ytdlp_progress("[progress] downloading 1048576 4194304 NA 524288.5 6")
+    assert event['percent'] == 25.0 and event['total_bytes'] == 4194304
+    assert event['speed'] == 524288.5 and event['eta'] == 6
+
+    # Для фрагментов известна только оценка размера
+    event = parse_ytdlp_progress("[progress] downloading 1000 NA 4000.0 NA NA")
+    assert event['percent'] == 25.0 and event['speed'] is None
+
+    assert parse_ytdlp_progress("[download] Destination: video.mp4") is None
+    print("✅ Прогресс yt-dlp разбирается корректно")
+
+
+def test_ffmpeg_progress():
+    """Блоки -progress pipe:1"""
+    print("🔍 Тестирование разбора прогресса FFmpeg...")
+    parser = FFmpegProgressParser(duration=100)
+    lines = ["frame=10", "total_size=2048", "out_time_us=25000000", "speed=50x", "progress=continue"]
+    events = [parser.feed(line) for line in lines]
+    assert events[:-1] == [None] * 4
+    event = events[-1]
+    assert event['percent'] == 25.0 and event['eta'] == 1.5 and event['downloaded_bytes'] == 2048
+
+    event = [parser.feed(line) for line in ["out_time_us=N/A", "speed=N/A", "progress=end"]][-1]
+    assert event['status'] == 'finished' and event['percent'] == 100.0
+    print("✅ Прогресс FFmpeg разбирается корректно")
+
+
+if __name__ == "__main__":
+    test_ytdlp_progress()
+    test_ffmpeg_progress()
+    print("\n🎉 Тест разбора прогресса прошел успешно!")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Тест локального расчета размера форматов (без сети и без запуска yt-dlp)
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from format_selector import pick_audio
+from test_concurrent_streams import offline_downloader
+from test_formats_json import SAMPLE_INFO
+
+
+def test_size_estimate():
+    """filesize -> filesize_approx -> tbr × duration, сумма для video-only"""
+    print("🔍 Тестирование расчета размера...")
+    print("=" * 60)
+
+    with offline_downloader() as downloader:
+        formats = downloader.formats_from_info(SAMPLE_INFO)
+        duration = SAMPLE_INFO['duration']
+
+        assert downloader.estimate_download_size(formats, '251-drc', duration) == (3437753, True)
+        assert downloader.estimate_download_size(formats, '140', duration) == (3433514, False)
+        size, exact = downloader.estimate_download_size(formats, '18', duration)
+        assert size == int(500.2 * 1000 / 8 * duration) and not exact
+        print("✅ Порядок источников размера соблюдается")
+
+        # Video-only: видео плюс аудиодорожка, которую выберет объединение
+        video = next(f for f in formats if f['id'] == 'hls-1080p')
+        best_audio = pick_audio(formats, video)
+        video_size, _ = downloader.estimate_format_size(video, duration)
+        audio_size, _ = downloader.estimate_format_size(best_audio, duration)
+        assert downloader.estimate_download_size(formats, 'hls-1080p', duration)[0] == video_size + audio_size
+        assert downloader.estimate_download_size(formats, 'hls-1080p+251-drc', duration)[0] == video_size + 3437753
+        print(f"✅ Video-only: {downloader.describe_size((video_size + audio_size, False))} "
+              f"(аудио {best_audio['id']})")
+
+        assert downloader.describe_size((None, False)) == "Размер неизвестен"
+        assert downloader.estimate_download_size(formats, 'missing', duration) == (None, False)
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            downloader.estimate_download_size(formats, 'hls-1080p', duration)
+        per_call = (time.perf_counter() - start) / 1000
+        print(f"✅ Расчет занимает {per_call * 1e6:.1f} мкс")
+
+
+if __name__ == "__main__":
+    test_size_estimate()
+    print("\n🎉 Тест расчета размера прошел успешно!")
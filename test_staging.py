@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Тест промежуточного каталога задачи: атомарный перенос и копирование между устройствами
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from staging import STAGING_DIR_NAME, JobStaging, kernel_copy
+
+
+def write_random(path, size):
+    data = os.urandom(size)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return data
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_kernel_copy():
+    """Копия совпадает с исходным файлом при любом доступном способе"""
+    with tempfile.TemporaryDirectory() as tmp:
+        src, dst = os.path.join(tmp, 'src'), os.path.join(tmp, 'dst')
+        data = write_random(src, 3 * 1024 * 1024 + 17)
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            method = kernel_copy(s.fileno(), d.fileno(), len(data))
+        assert method in ('copy_file_range', 'sendfile', 'copy'), method
+        assert read(dst) == data
+        print(f"✅ Копирование: {method}")
+
+
+def test_same_device_rename():
+    """В пределах одной файловой системы файл переносится rename, общий каталог удаляется"""
+    print("🔍 Тестирование промежуточного каталога...")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as output_dir:
+        staging = JobStaging(output_dir, 'job1')
+        assert staging.path == os.path.join(output_dir, STAGING_DIR_NAME, 'job1')
+        staged = os.path.join(staging.path, 'clip.mp4')
+        data = write_random(staged, 4096)
+        write_random(os.path.join(output_dir, 'clip.mp4'), 10)  # старая версия заменяется
+
+        final = staging.finalize(staged)
+        assert final == os.path.join(output_dir, 'clip.mp4') and read(final) == data
+        assert staging.report()['method'] == 'rename' and staging.copied_bytes == 0
+        staging.cleanup()
+        assert os.listdir(output_dir) == ['clip.mp4'], os.listdir(output_dir)
+        print("✅ Перенос rename, в папке загрузок только готовый файл")
+
+
+def test_cross_device_copy():
+    """Каталог на другом устройстве (tmpfs): копия ядром, байты записаны дважды"""
+    shm = '/dev/shm'
+    with tempfile.TemporaryDirectory() as output_dir:
+        if not os.path.isdir(shm) or os.stat(shm).st_dev == os.stat(output_dir).st_dev:
+            print("⏭️  Пропущено: нет tmpfs на другом устройстве")
+            return
+        with tempfile.TemporaryDirectory(dir=shm) as root:
+            staging = JobStaging(output_dir, 'job2', root)
+            staged = os.path.join(staging.path, 'clip.webm')
+            data = write_random(staged, 2 * 1024 * 1024)
+
+            final = staging.finalize(staged)
+            assert read(final) == data and not os.path.exists(staged)
+            assert staging.method != 'rename' and staging.copied_bytes == len(data), staging.report()
+            assert os.listdir(output_dir) == ['clip.webm'], "временная копия должна быть переименована"
+            staging.cleanup()
+            assert os.path.isdir(root), "каталог YTDL_STAGING_DIR не удаляется"
+            print(f"✅ Между устройствами: {staging.method}, записано повторно {staging.copied_bytes} байт")
+
+
+if __name__ == "__main__":
+    test_kernel_copy()
+    test_same_device_rename()
+    test_cross_device_copy()
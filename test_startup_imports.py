@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Тест легкого импорта: модули без GUI не тянут PyQt5, yt_dlp и другие тяжелые зависимости
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_startup import check, measure_import, parse_importtime
+
+
+def test_parse_importtime():
+    """Разбор вывода python -X importtime"""
+    stderr = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       120 |        120 |   sqlite3\n"
+              "import time:       700 |      14186 | downloader_core\n")
+    assert parse_importtime(stderr, 'downloader_core') == (14.186, ['sqlite3', 'downloader_core'])
+
+
+def test_core_imports_are_light():
+    """Ядро, очередь, пакетный и консольный режим импортируются без GUI и тяжелых модулей"""
+    print("🔍 Тестирование времени импорта...")
+    print("=" * 60)
+    for module in ('downloader_core', 'batch_download', 'youtube_downloader'):
+        result = measure_import(module, repeat=1)
+        assert 'error' not in result, result
+        assert not result['forbidden'], f"{module} импортирует {result['forbidden']}"
+        # Бюджет проверяет bench_startup.py --check: в тестах время зависит от нагрузки машины
+        print(f"✅ {module}: {result['import_ms']:.1f} мс, модулей {result['modules']}")
+    assert check({'module': 'm', 'import_ms': 5, 'budget_ms': 1, 'forbidden': ['PyQt5']}) == [
+        'm: импортирует PyQt5', 'm: 5 мс > бюджета 1 мс']
+
+
+if __name__ == "__main__":
+    test_parse_importtime()
+    test_core_imports_are_light()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Тест потокового объединения: yt-dlp пишет потоки в FFmpeg по каналам, без временных файлов
+
+Поддельный yt-dlp и локальный сервер медиа (без сети); нужен FFmpeg с libx264.
+"""
+
+import sys
+import os
+import contextlib
+import io
+import json
+import shutil
+import subprocess
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_offline import ROOT, VIDEO_URL, MediaOrigin, build_info, build_media
+from downloader_core import YouTubeDownloader
+from tool_probe import probe_tools
+
+
+def merge_with_streaming(media_dir: str, work_dir: str, tools, container=None) -> dict:
+    """Скачивание video-only формата 137 с включенным потоковым объединением"""
+    with MediaOrigin(media_dir) as origin:
+        info_path = os.path.join(work_dir, 'info.json')
+        with open(info_path, 'w', encoding='utf-8') as f:
+            json.dump({VIDEO_URL: build_info(origin, media_dir)}, f)
+        os.environ.update({
+            'FAKE_YTDLP_INFO': info_path,
+            'YTDL_CACHE_DIR': os.path.join(work_dir, 'cache'),
+            'PYTHONPATH': ROOT,
+        })
+        downloader = YouTubeDownloader('subprocess', tools=dict(
+            tools, ytdlp={'command': f'{sys.executable} -m fake_ytdlp', 'version': 'fake'}))
+        downloader.stream_merge = True
+        output_dir = tempfile.mkdtemp(dir=work_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = downloader.download_video(VIDEO_URL, '137', output_dir, container=container)
+        result['files'] = sorted(os.listdir(output_dir))
+        return result
+
+
+def decodes(ffmpeg: str, path: str) -> bool:
+    result = subprocess.run([ffmpeg, '-v', 'error', '-xerror', '-i', path, '-f', 'null', '-'],
+                            capture_output=True, timeout=60)
+    return result.returncode == 0
+
+
+def test_stream_merge():
+    """Фрагментированный MP4 объединяется потоком; MP4 с индексом в конце - через временные файлы"""
+    print("🔍 Тестирование потокового объединения...")
+    print("=" * 60)
+    if os.name == 'nt':
+        print("⏭️  Пропущено: потоковое объединение работает через каналы POSIX")
+        return
+    tools = probe_tools(need_ytdlp=False)
+    work_dir = tempfile.mkdtemp(prefix='ytdl-stream-')
+    saved_env = dict(os.environ)
+    try:
+        media_dir = os.path.join(work_dir, 'media')
+        if not build_media(media_dir, 1, tools['ffmpeg']):
+            print("⏭️  Пропущено: нужен FFmpeg с libx264")
+            return
+
+        result = merge_with_streaming(media_dir, work_dir, tools)
+        assert result['success'] and result['merge_mode'] == 'stream', result['message']
+        assert result['files'] == ['bench clip.mp4'], "временных файлов быть не должно"
+        assert result['download_bytes'] > 0 and decodes(tools['ffmpeg']['path'], result['final_file'])
+        assert result['media_host'] == '127.0.0.1', "хост медиа - сервер потоков, а не страница видео"
+        print(f"✅ Потоком: {result['download_bytes']} байт, файлы в папке: {result['files']}")
+
+        # MP4 с индексом (moov) в конце не читается из канала: задача переходит на временные файлы
+        plain = os.path.join(media_dir, 'plain.mp4')
+        subprocess.run([tools['ffmpeg']['path'], '-y', '-v', 'error', '-i', os.path.join(media_dir, 'video.mp4'),
+                        '-c', 'copy', plain], check=True, timeout=60)
+        os.replace(plain, os.path.join(media_dir, 'video.mp4'))
+        result = merge_with_streaming(media_dir, work_dir, tools)
+        assert result['success'] and result['merge_mode'] == 'files', result['message']
+        assert result['files'] == ['bench clip.mp4']
+        assert decodes(tools['ffmpeg']['path'], result['final_file'])
+        print("✅ Нечитаемый из канала MP4 объединен через временные файлы")
+
+        # container= из политики задает контейнер итогового файла
+        result = merge_with_streaming(media_dir, work_dir, tools, container='mkv')
+        assert result['success'] and result['files'] == ['bench clip.mkv'], (result['message'], result['files'])
+        assert decodes(tools['ffmpeg']['path'], result['final_file'])
+        print("✅ Контейнер из политики: bench clip.mkv")
+    finally:
+        os.environ.clear()
+        os.environ.update(saved_env)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_stream_merge()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Тест проверки yt-dlp и FFmpeg с кэшем на диске (поддельные программы, без сети)
+"""
+
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tool_probe import ToolCache, probe_tools
+
+FAKE_FFMPEG = '''#!/bin/sh
+echo "$@" >> "{log}"
+case "$2" in
+  -version) echo "ffmpeg version 6.1.1 Copyright (c) 2000-2023 the FFmpeg developers" ;;
+  -codecs) printf 'Codecs:\\n D..... = Decoding supported\\n -------\\n DEA.L. aac   AAC\\n DEV.LS h264  H.264\\n' ;;
+  -muxers) printf 'File formats:\\n  E = Muxing supported\\n  --\\n  E matroska  Matroska\\n  E mov,mp4,m4a  MP4\\n' ;;
+esac
+'''
+FAKE_YTDLP = '''#!/bin/sh
+echo "$@" >> "{log}"
+echo 2024.12.13
+'''
+
+
+def write_script(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+    os.chmod(path, 0o755)
+
+
+def count_runs(log):
+    if not os.path.exists(log):
+        return 0
+    with open(log) as f:
+        return len(f.readlines())
+
+
+def test_tool_probe_cache():
+    """Первый запуск проверяет программы, повторный берет результат из кэша без запуска процессов"""
+    print("🔍 Тестирование проверки программ...")
+    print("=" * 60)
+    if os.name == 'nt':
+        print("⏭️  Пропущено: поддельные программы - shell-скрипты")
+        return
+
+    old_path = os.environ['PATH']
+    with tempfile.TemporaryDirectory() as tmp:
+        log = os.path.join(tmp, 'runs.log')
+        ffmpeg = os.path.join(tmp, 'ffmpeg')
+        write_script(ffmpeg, FAKE_FFMPEG.format(log=log))
+        write_script(os.path.join(tmp, 'yt-dlp'), FAKE_YTDLP.format(log=log))
+        os.environ['PATH'] = tmp + os.pathsep + old_path
+        try:
+            cache_path = os.path.join(tmp, 'tools.json')
+            cold = probe_tools(ToolCache(cache_path))
+            assert not cold['cached']
+            assert cold['ytdlp'] == {'command': 'yt-dlp', 'version': '2024.12.13'}, cold['ytdlp']
+            assert cold['ffmpeg']['version'] == '6.1.1'
+            assert cold['ffmpeg']['codecs'] == ['aac', 'h264']
+            assert cold['ffmpeg']['muxers'] == ['m4a', 'matroska', 'mov', 'mp4']
+            assert count_runs(log) == 4
+
+            warm = probe_tools(ToolCache(cache_path))
+            assert warm['cached'] and warm['ffmpeg'] == cold['ffmpeg'] and warm['ytdlp'] == cold['ytdlp']
+            assert count_runs(log) == 4, "повторный запуск не должен запускать программы"
+            print(f"✅ Холодный запуск {cold['probe_time']:.3f} сек, из кэша {warm['probe_time']:.4f} сек")
+
+            # Обновленная программа (другой mtime) проверяется заново
+            future = time.time() + 10
+            os.utime(ffmpeg, (future, future))
+            updated = probe_tools(ToolCache(cache_path))
+            assert not updated['cached'] and count_runs(log) == 7
+            print("✅ После обновления FFmpeg проверка выполнена заново")
+        finally:
+            os.environ['PATH'] = old_path
+
+
+def test_failed_probe_not_cached():
+    """Неудачная проверка не сохраняется: следующий запуск получает настоящий результат"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, 'tools.json')
+        ffmpeg_info = {'path': '/usr/bin/ffmpeg', 'version': '6.1.1', 'codecs': [], 'muxers': []}
+        assert ToolCache(cache_path).get_or_probe('ffmpeg', 'key', lambda: None) is None
+        cache = ToolCache(cache_path)
+        assert cache.get_or_probe('ffmpeg', 'key', lambda: ffmpeg_info) == ffmpeg_info and cache.misses == 1
+
+        warm = ToolCache(cache_path)
+        assert warm.get_or_probe('ffmpeg', 'key', lambda: None) == ffmpeg_info and warm.hits == 1
+
+        # None, сохраненный прежней версией, считается промахом
+        ToolCache(cache_path)._save({'ffmpeg|old': {'probed_at': 0, 'result': None}})
+        assert ToolCache(cache_path).get_or_probe('ffmpeg', 'old', lambda: ffmpeg_info) == ffmpeg_info
+    print("✅ Неудачная проверка не сохраняется в кэш")
+
+
+if __name__ == "__main__":
+    test_tool_probe_cache()
+    test_failed_probe_not_cached()
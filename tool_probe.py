@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Поиск и проверка внешних программ (yt-dlp, FFmpeg) с кэшем на диске
+
+Результат проверки (версия, кодеки и мультиплексоры FFmpeg) сохраняется
+в tools.json в каталоге кэша. Ключ записи - путь к программе, ее mtime и
+размер: после обновления программы проверка выполняется заново, а при
+обычном запуске не запускается ни одного процесса.
+"""
+
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from disk_cache import default_cache_dir
+from metrics import StageMetrics, default_metrics
+
+
+# Таймаут одного запуска программы при проверке (сек)
+PROBE_TIMEOUT = 10
+# Версия формата tools.json: при изменении старые записи игнорируются
+CACHE_VERSION = 1
+
+_cache_lock = threading.Lock()
+
+
+def _run(cmd: List[str]) -> Optional[str]:
+    """stdout команды или None, если она не запустилась или завершилась с ошибкой"""
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=PROBE_TIMEOUT,
+                                encoding='utf-8', errors='replace')
+    except (subprocess.TimeoutExpired, OSError):
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def _file_key(path: str) -> Optional[str]:
+    """Ключ кэша: путь, mtime и размер файла"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{os.path.realpath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+def _table_names(output: str) -> List[str]:
+    """Имена из таблиц ffmpeg -codecs/-muxers (строки после разделителя ' ---')"""
+    names = []
+    started = False
+    for line in output.splitlines():
+        if not started:
+            started = line.strip().startswith('--')
+            continue
+        parts = line.split()
+        if len(parts) >= 2:
+            # В -muxers несколько форматов могут быть перечислены через запятую: "E mov,mp4,m4a,..."
+            names.extend(parts[1].split(','))
+    return sorted(set(names))
+
+
+def probe_ffmpeg(path: str) -> Optional[Dict]:
+    """Версия FFmpeg, кодеки и мультиплексоры (None, если ffmpeg не запускается)"""
+    output = _run([path, '-hide_banner', '-version'])
+    if output is None:
+        return None
+    first_line = output.split('\n', 1)[0]
+    return {
+        'path': path,
+        'version': first_line.split()[2] if first_line.startswith('ffmpeg version') else first_line,
+        'version_line': first_line,
+        'codecs': _table_names(_run([path, '-hide_banner', '-codecs']) or ''),
+        'muxers': _table_names(_run([path, '-hide_banner', '-muxers']) or ''),
+    }
+
+
+def probe_ytdlp(command: str, cmd: List[str]) -> Optional[Dict]:
+    """Версия yt-dlp; command - строка для SubprocessEngine ('yt-dlp' или '<python> -m yt_dlp')"""
+    output = _run(cmd + ['--version'])
+    if output is None:
+        return None
+    return {'command': command, 'version': output.strip()}
+
+
+class ToolCache:
+    """Результаты проверки программ в JSON-файле, по ключу путь+mtime+размер"""
+
+    def __init__(self, path: Optional[str] = None, enabled: bool = True):
+        self.path = path or (os.path.join(default_cache_dir(), 'tools.json') if enabled else None)
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data.get('entries', {}) if data.get('version') == CACHE_VERSION else {}
+
+    def get_or_probe(self, name: str, key: Optional[str], probe) -> Optional[Dict]:
+        """Сохраненный результат для ключа или результат probe(), который сохраняется
+
+        Неудачная проверка (None: таймаут холодного запуска, временная ошибка) не
+        сохраняется и не берется из кэша - при следующем запуске программа проверяется заново.
+        """
+        if key is None or self.path is None:
+            self.misses += 1
+            return probe()
+        full_key = f"{name}|{key}"
+        with _cache_lock:
+            entries = self._load()
+            cached = entries.get(full_key, {}).get('result')
+            if cached is not None:
+                self.hits += 1
+                return cached
+        self.misses += 1
+        result = probe()
+        if result is None:
+            return None
+        with _cache_lock:
+            entries = self._load()
+            # Записи других версий той же программы больше не нужны
+            entries = {k: v for k, v in entries.items() if not k.startswith(f"{name}|")}
+            entries[full_key] = {'probed_at': time.time(), 'result': result}
+            self._save(entries)
+        return result
+
+    def _save(self, entries: Dict):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_VERSION, 'entries': entries}, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"⚠️  Предупреждение: не удалось сохранить проверку программ: {e}")
+
+
+def find_ytdlp(cache: ToolCache) -> Optional[Dict]:
+    """yt-dlp в PATH, иначе модуль yt_dlp текущего Python: {'command', 'version'}"""
+    path = shutil.which('yt-dlp')
+    if path:
+        info = cache.get_or_probe('yt-dlp', _file_key(path), lambda: probe_ytdlp('yt-dlp', [path]))
+        if info:
+            return info
+
+    # Модуль ищется без импорта: ключ - его version.py (перезаписывается при обновлении)
+    spec = importlib.util.find_spec('yt_dlp')
+    if spec is None or not spec.origin:
+        return None
+    version_file = os.path.join(os.path.dirname(spec.origin), 'version.py')
+    key = _file_key(version_file if os.path.exists(version_file) else spec.origin)
+    command = f"{sys.executable} -m yt_dlp"
+    return cache.get_or_probe('yt_dlp', key and f"{sys.executable}|{key}",
+                              lambda: probe_ytdlp(command, [sys.executable, '-m', 'yt_dlp']))
+
+
+def find_ffmpeg(cache: ToolCache) -> Optional[Dict]:
+    """FFmpeg в PATH: {'path', 'version', 'codecs', 'muxers'} или None"""
+    path = shutil.which('ffmpeg')
+    if not path:
+        return None
+    return cache.get_or_probe('ffmpeg', _file_key(path), lambda: probe_ffmpeg(path))
+
+
+def probe_tools(cache: Optional[ToolCache] = None, need_ytdlp: bool = True,
+                metrics: Optional[StageMetrics] = None) -> Dict:
+    """Проверка всех программ: {'ytdlp', 'ffmpeg', 'aria2c', 'probe_time', 'cached'}
+
+    Кэш на диске отключается через YTDL_DISK_CACHE=0 (тогда программы проверяются всегда).
+    Время проверки записывается в метрики этапа probe.
+    """
+    start = time.perf_counter()
+    if cache is None:
+        enabled = os.environ.get('YTDL_DISK_CACHE', '1') != '0'
+        try:
+            cache = ToolCache(enabled=enabled)
+        except OSError as e:
+            print(f"⚠️  Предупреждение: кэш проверки программ недоступен: {e}")
+            cache = ToolCache(enabled=False)
+    tools = {
+        'ytdlp': find_ytdlp(cache) if need_ytdlp else None,
+        'ffmpeg': find_ffmpeg(cache),
+        'aria2c': shutil.which('aria2c'),
+    }
+    tools['probe_time'] = time.perf_counter() - start
+    tools['cached'] = cache.misses == 0
+    (metrics or default_metrics()).record('probe', tools['probe_time'], cached=tools['cached'])
+    return tools